@@ -5,21 +5,16 @@ from sqlalchemy import select, func
 from fastapi import Query, Request
 from app.db import get_session, AutoCount, Controller, Season, Alert
 from app.main import templates, _parse_time
+from app import rollups, bucketing, storage
 
 def _auto_baseline(sess, tzname: str, days: int = 7) -> int:
     # 10th percentile of device_seen from last N days (robust floor)
     from datetime import timedelta, timezone
     now = datetime.now(timezone.utc)
     start = now - timedelta(days=days)
-    rows = sess.execute(
-        select(AutoCount.count_value)
-        .where(AutoCount.count_type=='device_seen', AutoCount.source=='baldrick', AutoCount.timestamp>=start)
-        .order_by(AutoCount.count_value.asc())
-    ).scalars().all()
-    if not rows:
-        return 0
-    idx = max(0, int(len(rows)*0.10)-1)
-    return int(rows[idx])
+    # SQLite picks the row; nothing but the one value comes back to Python
+    p10 = storage.low_percentile(sess, 'device_seen', 0.10, t0=start, source='baldrick')
+    return int(p10) if p10 is not None else 0
 
 def dashboard_local(request: Request,
     group: str = 'hour',                      # default to hour now
@@ -30,7 +25,6 @@ def dashboard_local(request: Request,
     corr: str = 'media'
 ):
     tzname = os.getenv('TIMEZONE','America/Chicago')
-    import pytz as _p; tz = _p.timezone(tzname)
 
     # Baseline settings
     mode = os.getenv('BALDRICK_BASELINE_MODE','manual').lower()
@@ -49,57 +43,16 @@ def dashboard_local(request: Request,
             baseline = baseline  # fallback to manual
 
     def series_for(ctype: str):
-        # Pull raw rows
-        q = select(AutoCount.timestamp, AutoCount.count_value, AutoCount.camera_name)\
-            .where(AutoCount.count_type == ctype)
-        if season:
-            q = q.where(AutoCount.season == season)
-        if df:
-            q = q.where(AutoCount.timestamp >= df)
-        if dt:
-            q = q.where(AutoCount.timestamp < dt)
-        if camera and ctype == 'vehicle':
-            q = q.where(AutoCount.camera_name == camera)
-        q = q.order_by(AutoCount.timestamp.asc())
-
-        rows = s.execute(q).all()
-
-        # Bucket in LOCAL time
-        buckets = {}
-        for ts_utc, val, camname in rows:
-            ts_local = ts_utc.astimezone(tz)
-            if group == 'min':
-                label = ts_local.strftime('%Y-%m-%d %H:%M')
-            elif group == 'day':
-                label = ts_local.strftime('%Y-%m-%d')
-            else:
-                label = ts_local.strftime('%Y-%m-%d %H:00')
-
-            if ctype == 'device_seen':
-                # subtract baseline but not below zero
-                v = max(int(val) - baseline, 0)
-                # we average instantaneous counts within bucket (smoother)
-                agg = buckets.get(label, {'sum':0,'n':0})
-                agg['sum'] += v
-                agg['n'] += 1
-                buckets[label] = agg
-            else:
-                # vehicles: sum
-                buckets[label] = buckets.get(label, 0) + int(val)
-
+        # Read local-time buckets from the rollups
+        grain = group if group in rollups.GRAINS else 'hour'
+        rows = rollups.query(s, grain, ctype, season=season, date_from=df, date_to=dt,
+                             camera=camera if ctype == 'vehicle' else '')
+        ts, totals, n = bucketing.rollup_arrays(rows)
         if ctype == 'device_seen':
-            labels = sorted(buckets.keys())
-            values = [ int(round(buckets[k]['sum']/max(buckets[k]['n'],1))) for k in labels ]
-        else:
-            labels = sorted(buckets.keys())
-            values = [ buckets[k] for k in labels ]
-
-        total = sum(values) if values else 0
-        peak_label, peak_count = ('—', 0)
-        if values:
-            idx = max(range(len(values)), key=lambda i: values[i])
-            peak_label, peak_count = labels[idx], values[idx]
-        return {'labels': labels, 'values': values, 'total': total, 'peak': {'label': peak_label, 'count': peak_count}}
+            # average instantaneous counts within bucket (smoother), minus baseline but not below zero
+            return bucketing.bucket_series(ts, totals, grain, tzname, how='mean', baseline=baseline, samples=n)
+        # vehicles: sum
+        return bucketing.bucket_series(ts, totals, grain, tzname, how='sum', samples=n)
 
     veh = series_for('vehicle')
     dev = series_for('device_seen')
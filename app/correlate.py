@@ -0,0 +1,88 @@
+"""Vehicle counts ↔ FPP "now playing" correlation.
+
+Each vehicle AutoCount row is attributed to the FPP segment playing at its
+timestamp, i.e. the last segment started at or before it (as-of join). Only
+the segments starting inside the vehicle window plus the one before it are
+loaded, and the join is a single searchsorted over preloaded arrays. Results
+are cached per query, keyed by the latest auto_counts / fpp_segments ids so
+new data invalidates them automatically.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+from sqlalchemy import select, func
+
+from app.db import AutoCount, FPPSegment
+
+UNKNOWN = '(unknown)'
+_CACHE_MAX = 64
+_cache = OrderedDict()
+_lock = Lock()
+
+
+def _dt64(values):
+    return np.array(values, dtype='datetime64[us]')
+
+
+def _fpp_window(sess, col, t0, t1):
+    """(start timestamps, labels) for segments starting in (t0, t1] plus the one playing at t0."""
+    prior = sess.execute(
+        select(FPPSegment.start_ts, col).where(FPPSegment.start_ts <= t0)
+        .order_by(FPPSegment.start_ts.desc()).limit(1)
+    ).all()
+    rows = sess.execute(
+        select(FPPSegment.start_ts, col).where(FPPSegment.start_ts > t0, FPPSegment.start_ts <= t1)
+        .order_by(FPPSegment.start_ts.asc())
+    ).all()
+    rows = prior + rows
+    return _dt64([r[0] for r in rows]), [r[1] for r in rows]
+
+
+def _compute(sess, group, season, date_from, date_to, camera):
+    q = select(AutoCount.timestamp, AutoCount.count_value).where(AutoCount.count_type == 'vehicle')
+    if season: q = q.where(AutoCount.season == season)
+    if date_from: q = q.where(AutoCount.timestamp >= date_from)
+    if date_to: q = q.where(AutoCount.timestamp < date_to)
+    if camera: q = q.where(AutoCount.camera_name == camera)
+    rows = sess.execute(q.order_by(AutoCount.timestamp.asc())).all()
+    if not rows:
+        return []
+    vts = _dt64([r[0] for r in rows])
+    cnt = np.array([int(r[1]) for r in rows], np.int64)
+
+    col = FPPSegment.playlist if group == 'playlist' else FPPSegment.media
+    t0, t1 = rows[0][0], rows[-1][0]
+    fts, flabels = _fpp_window(sess, col, t0, t1)
+
+    # as-of join: index of last segment started <= each vehicle timestamp (-1 = none yet)
+    idx = np.searchsorted(fts, vts, side='right') - 1
+    names = [UNKNOWN] + [lab or UNKNOWN for lab in flabels]
+    uniq, codes = np.unique(np.array(names, dtype=object), return_inverse=True)
+    sums = np.bincount(codes[idx + 1], weights=cnt, minlength=len(uniq))
+    res = [(str(uniq[i]), int(sums[i])) for i in np.flatnonzero(sums)]
+    return sorted(res, key=lambda x: x[1], reverse=True)
+
+
+def correlate(sess, group: str = 'media', season: str = '', date_from=None, date_to=None, camera: str = ''):
+    """[(label, vehicles)] ranked by vehicles; group is 'media' or 'playlist'."""
+    stamp = sess.execute(select(select(func.max(AutoCount.id)).scalar_subquery(),
+                                select(func.max(FPPSegment.id)).scalar_subquery())).one()
+    key = (group, season or '', date_from, date_to, camera or '')
+    with _lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == tuple(stamp):
+            _cache.move_to_end(key)
+            return hit[1]
+    res = _compute(sess, group, season, date_from, date_to, camera)
+    with _lock:
+        _cache[key] = (tuple(stamp), res)
+        _cache.move_to_end(key)
+        while len(_cache) > _CACHE_MAX:
+            _cache.popitem(last=False)
+    return res
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
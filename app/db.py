@@ -1,5 +1,6 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, func, Index, select
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Text, func, Index, select
+from sqlalchemy.orm import declarative_base, sessionmaker, Session
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.pool import NullPool
 from datetime import datetime, timezone
 import os
@@ -7,6 +8,29 @@ import argparse
 
 Base = declarative_base()
 
+class EpochSeconds(TypeDecorator):
+    """UTC instant stored as INTEGER epoch seconds.
+
+    Binds datetimes (naive = UTC) or numbers; loads naive UTC datetimes, the same
+    values SQLite's DateTime used to return, so ORM callers don't change.
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, float):
+            return int(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return datetime.fromtimestamp(int(value), timezone.utc).replace(tzinfo=None)
+
 # ---------- Models ----------
 class Controller(Base):
     __tablename__ = 'controllers'
@@ -19,6 +43,7 @@ class Controller(Base):
     last_rtt_ms = Column(Integer)
     last_checked = Column(DateTime(timezone=True))
     last_info_json = Column(Text)  # optional structured details (e.g., FPP now playing)
+    fpp_caps_json = Column(Text)   # FPP API paths this box answers + fields each supplies (see monitor_controllers)
 
 class Season(Base):
     __tablename__ = 'seasons'
@@ -33,7 +58,7 @@ class Season(Base):
 class AutoCount(Base):
     __tablename__ = 'auto_counts'
     id = Column(Integer, primary_key=True)
-    timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
+    timestamp = Column(EpochSeconds, nullable=False, index=True)  # UTC epoch seconds
     source = Column(String(64), nullable=False)          # 'opencv_tripline', 'baldrick', etc.
     camera_name = Column(String(128))                    # for vehicle counts
     count_type = Column(String(64), nullable=False)      # 'vehicle', 'device_seen'
@@ -43,6 +68,24 @@ class AutoCount(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 Index('ix_auto_counts_ct_ts', AutoCount.count_type, AutoCount.timestamp)
+# One Baldrick row per bucket; conflict target for the bulk upsert in app/ingest/baldrick.py
+ux_auto_counts_baldrick = Index('ux_auto_counts_baldrick', AutoCount.timestamp, AutoCount.count_type, AutoCount.source,
+                                unique=True, sqlite_where=AutoCount.source == 'baldrick')
+
+class AutoCountRollup(Base):
+    # Pre-aggregated auto_counts, maintained by the ingest writers (see app/rollups.py)
+    __tablename__ = 'auto_count_rollups'
+    id = Column(Integer, primary_key=True)
+    grain = Column(String(8), nullable=False)            # 'min', 'hour', 'day'
+    bucket_ts = Column(Integer, nullable=False)          # bucket start, UTC epoch seconds (hour/day aligned to local TIMEZONE)
+    count_type = Column(String(64), nullable=False)
+    camera_name = Column(String(128), nullable=False, default='')  # '' when not per-camera
+    season = Column(String(128), nullable=False, default='')       # '' when no season
+    total = Column(Integer, nullable=False, default=0)   # sum of count_value
+    samples = Column(Integer, nullable=False, default=0) # number of auto_counts rows in bucket
+
+Index('ux_rollups_key', AutoCountRollup.grain, AutoCountRollup.count_type, AutoCountRollup.season,
+      AutoCountRollup.camera_name, AutoCountRollup.bucket_ts, unique=True)
 
 class FPPStatus(Base):
     __tablename__ = 'fpp_status'
@@ -55,6 +98,30 @@ class FPPStatus(Base):
     media = Column(String(256))
     raw_json = Column(Text)
 
+class FPPSegment(Base):
+    # One row per run of identical (playlist, media, state) samples, see app/segments.py
+    __tablename__ = 'fpp_segments'
+    id = Column(Integer, primary_key=True)
+    start_ts = Column(DateTime(timezone=True), nullable=False, index=True)  # first sample (UTC)
+    end_ts = Column(DateTime(timezone=True), nullable=False)                # last sample (UTC)
+    hostname = Column(String(128))
+    version = Column(String(64))
+    state = Column(String(64))
+    playlist = Column(String(256))
+    media = Column(String(256))
+    samples = Column(Integer, default=1)
+
+class IngestState(Base):
+    # Per-source incremental fetch state (see app/ingest/baldrick.py)
+    __tablename__ = 'ingest_state'
+    id = Column(Integer, primary_key=True)
+    source = Column(String(64), unique=True, nullable=False)  # 'baldrick', ...
+    last_epoch = Column(Integer)          # high-water mark: newest line timestamp ingested
+    etag = Column(String(256))
+    last_modified = Column(String(64))
+    content_length = Column(Integer)      # bytes consumed so far, for Range requests
+    updated_at = Column(DateTime(timezone=True))
+
 class Alert(Base):
     __tablename__ = 'alerts'
     id = Column(Integer, primary_key=True)
@@ -71,14 +138,49 @@ DB_PATH = os.getenv('DB_PATH', DEFAULT_DB_PATH)
 # Ensure the directory exists
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
-# Use NullPool for SQLite on Pi (prevents QueuePool timeouts)
-engine = create_engine(
-    f"sqlite:///{DB_PATH}",
-    poolclass=NullPool,
-    connect_args={"check_same_thread": False, "timeout": 30},
-    future=True,
-    echo=False
-)
+# ---------- SQLite PRAGMA profile ----------
+# Applied on every new DBAPI connection (NullPool → every checkout). WAL lets the
+# API read while the scheduler writes; NORMAL is still crash-safe under WAL.
+PRAGMA_PROFILES = {
+    'default': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 64 * 1024 * 1024,
+                'cache_size': -16000, 'temp_store': 'MEMORY', 'busy_timeout': 30000},
+    'durable': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'mmap_size': 64 * 1024 * 1024,
+                'cache_size': -16000, 'temp_store': 'MEMORY', 'busy_timeout': 30000},
+    # SQLite defaults (rollback journal). WAL is stored in the file, so switch it back explicitly
+    'off': {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 30000},
+}
+
+def pragma_settings(profile: str | None = None, overrides: str | None = None) -> dict:
+    """Profile from SQLITE_PROFILE plus "name=value,..." overrides from SQLITE_PRAGMAS."""
+    profile = profile or os.getenv('SQLITE_PROFILE', 'default')
+    out = dict(PRAGMA_PROFILES.get(profile, PRAGMA_PROFILES['default']))
+    for item in (os.getenv('SQLITE_PRAGMAS', '') if overrides is None else overrides).split(','):
+        if '=' in item:
+            k, v = item.split('=', 1)
+            out[k.strip()] = v.strip()
+    return out
+
+PRAGMAS = pragma_settings()
+
+def _apply_pragmas(dbapi_con, _record):
+    cur = dbapi_con.cursor()
+    for name, value in PRAGMAS.items():
+        cur.execute(f"PRAGMA {name}={value}")
+    cur.close()
+
+def _make_engine(path: str):
+    # Use NullPool for SQLite on Pi (prevents QueuePool timeouts)
+    eng = create_engine(
+        f"sqlite:///{path}",
+        poolclass=NullPool,
+        connect_args={"check_same_thread": False, "timeout": 30},
+        future=True,
+        echo=False
+    )
+    event.listen(eng, 'connect', _apply_pragmas)
+    return eng
+
+engine = _make_engine(DB_PATH)
 SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
 
 def get_session():
@@ -88,14 +190,74 @@ def init_db(path: str | None = None):
     """Create/upgrade tables. If path is provided, creates there; else uses DB_PATH."""
     target = path or DB_PATH
     os.makedirs(os.path.dirname(target), exist_ok=True)
-    eng = create_engine(
-        f"sqlite:///{target}",
-        poolclass=NullPool,
-        connect_args={"check_same_thread": False, "timeout": 30},
-        future=True,
-        echo=False
-    )
+    eng = _make_engine(target)
     Base.metadata.create_all(eng)
+    _ensure_columns(eng)
+    _ensure_epoch_timestamps(eng)
+    _ensure_baldrick_unique(eng)
+    _ensure_rollups(eng)
+
+# Columns added to existing tables after their first release (create_all() won't add them)
+ADDED_COLUMNS = {'controllers': {'fpp_caps_json': 'TEXT'}}
+
+def _ensure_columns(eng):
+    with eng.begin() as con:
+        for table, cols in ADDED_COLUMNS.items():
+            have = {r[1] for r in con.exec_driver_sql(f"PRAGMA table_info({table})")}
+            for name, ddl in cols.items():
+                if name not in have:
+                    con.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+def _ensure_epoch_timestamps(eng):
+    # auto_counts.timestamp used to be DATETIME text; convert any text values in place.
+    # INTEGER sorts before TEXT in SQLite, so the indexed MAX() finds leftovers cheaply
+    with eng.begin() as con:
+        kind = con.exec_driver_sql("SELECT typeof(MAX(timestamp)) FROM auto_counts").scalar()
+        if kind != 'text':
+            return
+        n = con.exec_driver_sql(
+            "UPDATE auto_counts SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER) "
+            "WHERE typeof(timestamp) = 'text'"
+        ).rowcount
+    print(f"[db] converted {n} auto_counts timestamps to epoch seconds")
+
+def _ensure_baldrick_unique(eng):
+    # create_all() skips indexes on tables that already exist; older DBs may also
+    # hold duplicate Baldrick buckets, keep the newest row of each before indexing
+    with eng.begin() as con:
+        if con.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type='index' AND name='ux_auto_counts_baldrick'").first():
+            return
+        deleted = con.exec_driver_sql(
+            "DELETE FROM auto_counts WHERE source='baldrick' AND id NOT IN "
+            "(SELECT MAX(id) FROM auto_counts WHERE source='baldrick' GROUP BY timestamp, count_type)"
+        ).rowcount
+        ux_auto_counts_baldrick.create(con)
+    if deleted:
+        from app import rollups
+        with Session(eng) as s:
+            rollups.rebuild(s)
+            s.commit()
+        print(f"[db] removed {deleted} duplicate baldrick rows; rollups rebuilt")
+
+def _ensure_rollups(eng):
+    # dashboards and exports read auto_count_rollups; on a database from before the
+    # rollups existed the table starts empty, so backfill it once from auto_counts
+    with eng.connect() as con:
+        if con.exec_driver_sql("SELECT 1 FROM auto_count_rollups LIMIT 1").first() \
+                or not con.exec_driver_sql("SELECT 1 FROM auto_counts LIMIT 1").first():
+            return
+    from app import rollups
+    with Session(eng) as s:
+        res = rollups.rebuild(s)
+        s.commit()
+    print(f"[db] built rollups for existing counts: {res['minutes']} minutes, {res['rollups']} buckets")
+
+def maintenance(checkpoint: str = 'TRUNCATE') -> dict:
+    """Checkpoint the WAL back into the main file and let SQLite refresh planner stats."""
+    with engine.connect() as con:
+        busy, log, done = con.exec_driver_sql(f"PRAGMA wal_checkpoint({checkpoint})").one()
+        con.exec_driver_sql("PRAGMA optimize")
+    return {'busy': busy, 'wal_pages': log, 'checkpointed': done}
 
 # ---------- CLI ----------
 if __name__ == "__main__":
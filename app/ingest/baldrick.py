@@ -1,18 +1,22 @@
 import os, time
 from datetime import datetime, timezone
-from typing import Optional, Tuple
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional, Tuple
 
 import httpx
-from sqlalchemy import select, and_
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
 import pytz
 
-from app.db import get_session, AutoCount, Season
+from app.db import get_session, AutoCount, IngestState
 from app.utils import floor_bucket
+from app import rollups, seasons
 
 load_dotenv()
 TZ_DEFAULT = os.getenv("TIMEZONE", "America/Chicago")
 tz_local = pytz.timezone(TZ_DEFAULT)
+BATCH_BUCKETS = 5000  # buckets held in memory before an upsert batch
 
 def _parse_epoch_count_line(line: str) -> Optional[Tuple[datetime,int]]:
     parts = [p.strip() for p in line.split(",")]
@@ -34,56 +38,207 @@ def fetch_csv_text(url: str, timeout_s: int = 15) -> str:
         r.raise_for_status()
         return r.text
 
-def run_once(url: str, verbose: bool=False) -> dict:
-    text = fetch_csv_text(url)
-    if verbose:
-        print(f"[baldrick] fetched {len(text)} bytes")
+def _line_epoch(line: str) -> Optional[float]:
+    # just the leading epoch field, normalized to seconds
+    try:
+        n = float(line.split(",", 1)[0])
+    except ValueError:
+        return None
+    return n / 1000.0 if n > 1e12 else n
 
-    s = get_session()
-    season = s.query(Season).order_by(Season.start_date.desc()).first()
-    bucket = (season.bucket_minutes if season else 1) or 1
-    season_name = season.name if season else None
+def skip_to_watermark(lines: Iterable[str], watermark: Optional[float]) -> Iterator[str]:
+    """Drop lines at or below the watermark. The export is chronological, so only
+    the leading epoch field is looked at, and only until the first newer line."""
+    it = iter(lines)
+    if watermark is not None:
+        for ln in it:
+            ep = _line_epoch(ln)
+            if ep is not None and ep > watermark:
+                yield ln
+                break
+    yield from it
 
-    upserts = 0
-    scanned = 0
-    lines = [ln for ln in text.splitlines() if ln.strip()]
+def iter_lines(chunks: Iterable[bytes], state: dict, keep_tail: bool = True) -> Iterator[str]:
+    """Split a byte stream into lines without buffering the whole body.
+
+    state['content_length'] advances by each complete line, so the next Range
+    request starts on a line boundary. A trailing partial line is yielded only
+    when keep_tail (full bodies) and is never counted as consumed.
+    """
+    buf = b''
+    for chunk in chunks:
+        buf += chunk
+        start = 0
+        while True:
+            nl = buf.find(b'\n', start)
+            if nl < 0:
+                break
+            state['content_length'] = (state.get('content_length') or 0) + nl + 1 - start
+            yield buf[start:nl].decode('utf-8', errors='replace')
+            start = nl + 1
+        buf = buf[start:]
+    if buf and keep_tail:
+        yield buf.decode('utf-8', errors='replace')
+
+def _send(cli, url: str, headers: dict):
+    return cli.send(cli.build_request('GET', url, headers=headers), stream=True)
 
+@contextmanager
+def open_stream(url: str, state: dict, timeout_s: int = 15, verify: bool = True):
+    """Stream the CSV using the conditional/Range headers the saved state allows.
+
+    Yields (lines, new_state); lines is None when the board reports no change,
+    otherwise an iterator over the new lines (only the appended tail after a
+    206). new_state is complete once lines has been exhausted.
+    """
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    elif state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+    offset = int(state.get('content_length') or 0)
+    if offset:
+        headers['Range'] = f'bytes={offset}-'
+    with httpx.Client(timeout=timeout_s, verify=verify) as cli:
+        r = _send(cli, url, headers)
+        try:
+            if r.status_code == 304:
+                yield None, dict(state)
+                return
+            if r.status_code == 416:
+                total = r.headers.get('content-range', '').rpartition('/')[2]
+                if total.isdigit() and int(total) == offset:
+                    yield None, dict(state)  # nothing appended
+                    return
+                r.close()
+                r = _send(cli, url, {})    # export shrank (board reset): start over
+            elif r.status_code == 206 and not r.headers.get('content-range', '').startswith(f'bytes {offset}-'):
+                r.close()
+                r = _send(cli, url, {})
+            r.raise_for_status()
+            partial = r.status_code == 206
+            new_state = dict(state, etag=r.headers.get('etag'), last_modified=r.headers.get('last-modified'),
+                             content_length=offset if partial else 0)
+            yield iter_lines(r.iter_bytes(), new_state, keep_tail=not partial), new_state
+        finally:
+            r.close()
+
+def upsert_counts(s, counts: dict, season_name: Optional[str]) -> int:
+    """Bulk upsert {bucket_ts: raw count} as baldrick device_seen rows.
+
+    Existing values for the span are read in one range query; unchanged buckets
+    are skipped and the rest go out as one executemany INSERT ... ON CONFLICT.
+    Rollups are adjusted by the same deltas. Caller commits.
+    """
+    if not counts:
+        return 0
+    existing = {
+        ts: (val, sea) for ts, val, sea in s.execute(
+            select(AutoCount.timestamp, AutoCount.count_value, AutoCount.season).where(
+                AutoCount.source == 'baldrick', AutoCount.count_type == 'device_seen',
+                AutoCount.timestamp >= min(counts), AutoCount.timestamp <= max(counts))
+        ).all()
+    }
+    rows = []
+    pending = {}
+    for bucket_ts, cnt in counts.items():
+        old = existing.get(bucket_ts.replace(tzinfo=None))  # SQLite returns naive UTC
+        if old is None:
+            rollups.add(pending, bucket_ts, 'device_seen', cnt, season=season_name)
+        elif old[0] != cnt:
+            rollups.add(pending, bucket_ts, 'device_seen', cnt - int(old[0]), season=old[1], samples=0)
+        else:
+            continue
+        rows.append({'timestamp': bucket_ts, 'source': 'baldrick', 'count_type': 'device_seen',
+                     'count_value': cnt, 'season': season_name})
+    if rows:
+        stmt = sqlite_insert(AutoCount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['timestamp', 'count_type', 'source'],
+            index_where=AutoCount.source == 'baldrick',
+            set_={'count_value': stmt.excluded.count_value})  # overwrite with the latest raw value
+        s.execute(stmt, rows)
+        rollups.apply(s, pending)
+    return len(rows)
+
+def parse_lines(lines: Iterable[str]) -> Iterator[Tuple[datetime, int]]:
+    """(local timestamp, raw count) for each valid line."""
     for ln in lines:
-        scanned += 1
-        parsed = _parse_epoch_count_line(ln)
-        if not parsed:
+        if not ln.strip():
             continue
-        ts_local, cnt = parsed
-
-        # bucket based on LOCAL time, but store timestamp as UTC floor of that bucket
-        bucket_ts = floor_bucket(ts_local.astimezone(timezone.utc), bucket)
-
-        # Upsert per bucket
-        existing = s.execute(
-            select(AutoCount).where(
-                and_(AutoCount.timestamp == bucket_ts,
-                     AutoCount.count_type == 'device_seen',
-                     AutoCount.source == 'baldrick')
-            )
-        ).scalar_one_or_none()
-
-        if existing:
-            existing.count_value = int(cnt)  # overwrite with the latest raw value
-            s.add(existing)
-        else:
-            s.add(AutoCount(
-                timestamp=bucket_ts,
-                source='baldrick',
-                count_type='device_seen',
-                count_value=int(cnt),
-                season=season_name,
-            ))
-        upserts += 1
-        if upserts % 500 == 0:
-            s.commit()
+        parsed = _parse_epoch_count_line(ln)
+        if parsed:
+            yield parsed
+
+def ingest_lines(s, lines: Iterable[str], batch: int = BATCH_BUCKETS) -> dict:
+    """Parse and upsert CSV lines in the caller's transaction, batch buckets at a time.
+    Each line is bucketed and labelled by the season its timestamp falls in, so a
+    backfill spanning seasons (or outside all of them) lands where it belongs."""
+    season_name = None
+    scanned = 0
+    upserts = 0
+    buckets = 0
+    last_epoch = None
+    counts = {}
+    for ts_local, cnt in parse_lines(lines):
+        scanned += 1
+        last_epoch = max(last_epoch or 0, int(ts_local.timestamp()))
+        # bucket based on LOCAL time, but store timestamp as UTC floor of that bucket;
+        # later lines in the same bucket win
+        season = seasons.current(ts_local)
+        bucket_ts = floor_bucket(ts_local.astimezone(timezone.utc), season.bucket_minutes)
+        if counts and (season.name != season_name or (bucket_ts not in counts and len(counts) >= batch)):
+            upserts += upsert_counts(s, counts, season_name)
+            buckets += len(counts)
+            counts = {}
+        season_name = season.name
+        counts[bucket_ts] = int(cnt)
 
+    upserts += upsert_counts(s, counts, season_name)
+    buckets += len(counts)
+    return {"scanned": scanned, "upserts": upserts, "buckets": buckets, "last_epoch": last_epoch}
+
+def ingest_text(text: str, verbose: bool=False) -> dict:
+    s = get_session()
+    res = ingest_lines(s, text.splitlines())
+    s.commit()  # whole fetch in one transaction
+    if verbose:
+        print(f"[baldrick] {res['buckets']} buckets, {res['upserts']} new/changed")
+    return res
+
+def _state_row(s, source: str) -> IngestState:
+    st = s.execute(select(IngestState).where(IngestState.source == source)).scalar_one_or_none()
+    if st is None:
+        st = IngestState(source=source)
+        s.add(st)
+    return st
+
+def run_once(url: str, verbose: bool=False, full: bool=False, verify: bool=True) -> dict:
+    """Fetch only what is new since the last poll (per the saved ingest_state)."""
+    s = get_session()
+    st = _state_row(s, 'baldrick')
+    state = {} if full else {'etag': st.etag, 'last_modified': st.last_modified,
+                             'content_length': st.content_length}
+    with open_stream(url, state, verify=verify) as (lines, new_state):
+        if lines is None:
+            if verbose:
+                print("[baldrick] not modified")
+            return {"scanned": 0, "upserts": 0, "unchanged": True}
+        res = ingest_lines(s, skip_to_watermark(lines, None if full else st.last_epoch))
+    if verbose:
+        print(f"[baldrick] {res['scanned']} lines past watermark, consumed through byte {new_state['content_length']}")
+
+    # state commits together with the rows it describes
+    if res['last_epoch'] is not None:
+        st.last_epoch = max(st.last_epoch or 0, res['last_epoch'])
+    st.etag = new_state.get('etag')
+    st.last_modified = new_state.get('last_modified')
+    st.content_length = new_state.get('content_length')
+    st.updated_at = datetime.now(timezone.utc)
     s.commit()
-    return {"scanned": scanned, "upserts": upserts}
+    if verbose:
+        print(f"[baldrick] {res['buckets']} buckets, {res['upserts']} new/changed")
+    return res
 
 if __name__ == "__main__":
     import argparse
@@ -91,10 +246,11 @@ if __name__ == "__main__":
     ap = argparse.ArgumentParser()
     ap.add_argument("--url", default=url)
     ap.add_argument("--verbose", action="store_true")
+    ap.add_argument("--full", action="store_true", help="Ignore the saved watermark/ETag and re-read everything")
     args = ap.parse_args()
     if not args.url:
         print("[baldrick] Set BALDRICK_CSV_URL in .env or pass --url")
         raise SystemExit(2)
     t0 = time.time()
-    res = run_once(args.url, verbose=args.verbose)
+    res = run_once(args.url, verbose=args.verbose, full=args.full)
     print(f"[baldrick] done → scanned={res['scanned']} upserts={res['upserts']}")
@@ -1,55 +1,95 @@
-import httpx, csv, io
-from datetime import datetime, timezone
-from app.db import get_session, AutoCount, Season
+import httpx, csv, os
+from datetime import datetime, timedelta, timezone
+from app.db import get_session
 from app.config import load_config
 from app.utils import floor_bucket, to_local, in_show_hours
-from app.utils import floor_minute
+from app import rollups, seasons, storage
+
+BATCH = 1000  # finished buckets per flush
+# rows may arrive this far out of order; older buckets are finished
+SETTLE = timedelta(minutes=float(os.getenv('BALDRICK_CSV_SETTLE_MIN', '10')))
 
 def run(baldrick_csv_url: str):
     if not baldrick_csv_url:
         return {'skipped': 'no url configured'}
-    r = httpx.get(baldrick_csv_url, timeout=30)
-    r.raise_for_status()
-    buf = io.StringIO(r.text)
-    reader = csv.DictReader(buf)
     # Expect columns: timestamp/device_id/... (schema may vary)
     # We'll group by minute and count unique device_ids
     cfg = load_config()
-    by_minute = {}
     tzname = cfg.get('timezone','America/Chicago')
-    # Determine active season for now; if none, season stays None and we still log
+    # each row gets the season it falls in (bucket size, show hours, name); outside every season it still logs
     s = get_session()
-    now_utc = datetime.now(timezone.utc)
-    season = s.query(Season).filter(Season.start_date <= now_utc, Season.end_date > now_utc).first()
-    bucket = season.bucket_minutes if season else 1
-    show_start = season.show_start if season else '00:00'
-    show_end = season.show_end if season else '23:59'
-    for row in reader:
-        # Heuristic: try common header names
-        ts = row.get('timestamp') or row.get('time') or row.get('seen_at')
-        if not ts:
-            continue
+    # stream the body line by line; only buckets within SETTLE of the newest row keep their device sets,
+    # the rest are written BATCH at a time as the stream moves past them, so memory stays flat
+    open_buckets = {}   # bucket -> set of device ids
+    done = []           # finished (bucket, unique devices) waiting for the next flush
+    late = {}           # bucket -> device ids of rows that arrived after their bucket was finished
+    res = {'rows': 0, 'inserted_minutes': 0, 'late': 0}
+    cutoff = None  # epoch before which buckets are finished (newest bucket seen - SETTLE)
+    with httpx.stream('GET', baldrick_csv_url, timeout=30) as r:
+        r.raise_for_status()
+        for row in csv.DictReader(r.iter_lines()):
+            res['rows'] += 1
+            hit = _parse_row(row, tzname)
+            if hit is None:
+                continue
+            m, dev = hit
+            e = _epoch(m)
+            if cutoff is not None and e < cutoff:
+                # more than SETTLE behind: its bucket may already be written, so these
+                # devices get a row of their own for that bucket instead of being lost
+                res['late'] += 1
+                late.setdefault(m, set()).add(dev)
+                if len(late) >= BATCH:
+                    res['inserted_minutes'] += _write(s, [(b, len(d)) for b, d in late.items()])
+                    late = {}
+                continue
+            open_buckets.setdefault(m, set()).add(dev)
+            if cutoff is None or e - SETTLE.total_seconds() > cutoff:
+                cutoff = e - SETTLE.total_seconds()
+                for b in [b for b in open_buckets if _epoch(b) < cutoff]:
+                    done.append((b, len(open_buckets.pop(b))))
+                if len(done) >= BATCH:
+                    res['inserted_minutes'] += _write(s, done)
+                    done = []
+    done.extend((b, len(devices)) for b, devices in open_buckets.items())
+    done.extend((b, len(devices)) for b, devices in late.items())
+    res['inserted_minutes'] += _write(s, done)
+    s.commit()  # whole fetch in one transaction
+    if res['late']:
+        print(f"[baldrick] {res['late']} rows arrived more than {SETTLE} after newer ones; "
+              f"counted in separate rows for their buckets (raise BALDRICK_CSV_SETTLE_MIN if this is routine)")
+    return res
+
+def _epoch(m):
+    return (m if m.tzinfo else m.replace(tzinfo=timezone.utc)).timestamp()
+
+def _write(s, buckets):
+    pending = {}
+    for m, n in buckets:
+        storage.add_count(s, m, 'wifi_probe', 'device_seen', n,
+                          season=seasons.name_at(m), pending=pending)
+    rollups.apply(s, pending)
+    s.flush()
+    return len(buckets)
+
+def _parse_row(row, tzname):
+    """(bucket, device id) for a row in show hours, else None."""
+    # Heuristic: try common header names
+    ts = row.get('timestamp') or row.get('time') or row.get('seen_at')
+    if not ts:
+        return None
+    try:
+        dt = datetime.fromisoformat(ts.replace('Z','+00:00'))
+    except Exception:
+        # Try epoch seconds
         try:
-            dt = datetime.fromisoformat(ts.replace('Z','+00:00'))
+            dt = datetime.fromtimestamp(float(ts), tz=timezone.utc)
         except Exception:
-            # Try epoch seconds
-            try:
-                dt = datetime.fromtimestamp(float(ts), tz=timezone.utc)
-            except Exception:
-                continue
-        m = floor_bucket(dt, bucket)
-        # apply show-hours filter based on local time
-        local_dt = to_local(dt, tzname)
-        if not in_show_hours(local_dt, show_start, show_end):
-            continue
-        dev = row.get('device_id') or row.get('mac') or row.get('addr') or 'unknown'
-        by_minute.setdefault(m, set()).add(dev)
-    s = get_session()
-    total = 0
-    for m, devices in by_minute.items():
-        rec = AutoCount(timestamp=m, source='wifi_probe', camera_name=None,
-                        count_type='device_seen', count_value=len(devices),
-                        meta_json=None, season=season.name if season else None)
-        s.add(rec); total += 1
-    s.commit()
-    return {'inserted_minutes': total}
+            return None
+    season = seasons.current(dt)
+    m = floor_bucket(dt, season.bucket_minutes)
+    # apply show-hours filter based on local time
+    local_dt = to_local(dt, tzname)
+    if not in_show_hours(local_dt, season.show_start, season.show_end):
+        return None
+    return m, row.get('device_id') or row.get('mac') or row.get('addr') or 'unknown'
@@ -0,0 +1,96 @@
+"""Bulk AutoCount ingest for /ingest/autocount/batch.
+
+The request body is streamed and decoded record by record: NDJSON (one JSON
+object per line) or, when msgpack is installed, a msgpack stream of maps.
+Each record is validated against schemas.AutoCountIn straight from the raw
+bytes / decoded map (pydantic-core, no intermediate dicts for NDJSON).
+Validation happens while the body streams in; the valid records are then
+inserted in CHUNK-sized executemany calls inside one short transaction, so
+the write lock isn't held while a slow client uploads. Invalid records are
+skipped and reported by position. Each valid record is labelled with the
+season its timestamp falls in (seasons.name_at), like every other ingester.
+"""
+import os
+from typing import AsyncIterator, Iterator
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.db import get_session
+from app.schemas import AutoCountIn
+from app import seasons, storage
+
+try:
+    import msgpack
+except ImportError:  # optional: NDJSON works without it
+    msgpack = None
+
+CHUNK = 2000       # records per executemany
+MAX_ERRORS = 100   # per-record errors echoed back
+MAX_RECORDS = int(os.getenv('INGEST_BATCH_MAX_RECORDS', '100000'))
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+_adapter = TypeAdapter(AutoCountIn)
+
+
+def body_format(content_type: str) -> str:
+    ct = (content_type or '').split(';')[0].strip().lower()
+    if ct in MSGPACK_TYPES:
+        return 'msgpack'
+    if ct in NDJSON_TYPES or ct in ('', 'application/json', 'text/plain'):
+        return 'ndjson'
+    return ''
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buf = b''
+    async for chunk in chunks:
+        buf += chunk
+        *lines, buf = buf.split(b'\n')
+        for ln in lines:
+            if ln.strip():
+                yield ln
+    if buf.strip():
+        yield buf
+
+
+async def msgpack_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    unpacker = msgpack.Unpacker(raw=False, timestamp=3)  # msgpack timestamps -> datetime
+    async for chunk in chunks:
+        unpacker.feed(chunk)
+        for obj in unpacker:
+            yield obj
+
+
+def validate(rec, index: int, errors: list):
+    """Record -> insert dict, or None (error appended)."""
+    try:
+        m = _adapter.validate_json(rec) if isinstance(rec, (bytes, str)) else _adapter.validate_python(rec)
+    except ValidationError as e:
+        if len(errors) < MAX_ERRORS:
+            errors.append({'index': index, 'error': '; '.join(
+                f"{'.'.join(str(p) for p in err['loc']) or 'record'}: {err['msg']}" for err in e.errors())})
+        return None
+    row = m.model_dump()
+    row['season'] = seasons.name_at(row['timestamp'])
+    return row
+
+
+def chunks_of(rows: list, size: int = CHUNK) -> Iterator[list]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def insert(rows: list) -> int:
+    """All rows in one transaction (run it off the event loop)."""
+    s = get_session()
+    try:
+        n = sum(storage.insert_counts(s, part) for part in chunks_of(rows))
+        s.commit()
+        return n
+    except Exception:
+        s.rollback()
+        raise
+    finally:
+        s.close()
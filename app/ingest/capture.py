@@ -0,0 +1,125 @@
+"""Opening camera streams from the per-camera capture settings in config.yaml.
+
+substream_url   opened instead of rtsp_url when set, e.g. the UniFi Protect
+                low/medium quality RTSP link: a 640x360 substream is 9x fewer
+                pixels to decode than 1080p, 36x fewer than 4K.
+capture         opencv (default): cv2.VideoCapture with OpenCV's default backend
+                ffmpeg: OpenCV's FFmpeg backend; capture_options is passed as
+                  OPENCV_FFMPEG_CAPTURE_OPTIONS (demuxer/protocol options such
+                  as rtsp_transport;tcp - OpenCV does not hand them to the decoder)
+                gstreamer: capture_pipeline ({url} is replaced) opened with
+                  CAP_GSTREAMER; needs an OpenCV built with GStreamer
+                pyav: decode with PyAV (pip install av, optional), which can
+                  skip frames in the decoder (capture_skip: nonkey decodes
+                  keyframes only) and scale while converting to BGR
+                  (capture_width: 640, fast bilinear)
+capture_threads decoder threads (ffmpeg, pyav); 1 keeps several cameras on a Pi
+                from oversubscribing its cores.
+
+Everything returned has the cv2.VideoCapture interface the grabber uses
+(isOpened/read/get/release). min_contour_area and track_gate are in pixels of
+the frames actually decoded, so set them for the substream or capture_width.
+scripts/bench_capture.py measures decode throughput per option.
+"""
+import os
+import threading
+
+import cv2
+
+try:
+    import av
+except ImportError:  # optional: only for capture: pyav
+    av = None
+
+DEFAULT_PIPELINE = ('rtspsrc location={url} latency=0 ! decodebin ! videoconvert ! '
+                    'video/x-raw,format=BGR ! appsink drop=true max-buffers=1 sync=false')
+_env_lock = threading.Lock()  # OPENCV_FFMPEG_CAPTURE_OPTIONS is process-wide (thread mode)
+
+
+class PyAvCapture:
+    def __init__(self, url, skip=None, width=None, threads=None, options=None):
+        self.width = int(width) if width else None
+        self._c = None
+        self._pts_ms = 0.0
+        try:
+            self._c = av.open(url, options=options or {}, timeout=10)
+            self._s = self._c.streams.video[0]
+            if skip:
+                self._s.codec_context.skip_frame = str(skip).upper()
+            if threads:
+                self._s.codec_context.thread_count = int(threads)
+            self._s.thread_type = 'AUTO'
+            self._frames = self._c.decode(self._s)
+        except (av.error.FFmpegError, IndexError, OSError) as e:
+            print(f'[capture] pyav cannot open stream: {e}')
+            self.release()
+
+    def isOpened(self):
+        return self._c is not None
+
+    def _size(self):
+        cc = self._s.codec_context
+        if self.width and cc.width:
+            return self.width, round(cc.height * self.width / cc.width / 2) * 2
+        return cc.width, cc.height
+
+    def read(self):
+        if self._c is None:
+            return False, None
+        try:
+            f = next(self._frames)
+        except (StopIteration, av.error.FFmpegError):
+            return False, None
+        if f.time is not None:
+            self._pts_ms = f.time * 1000
+        if self.width:
+            w, h = self._size()
+            return True, f.to_ndarray(format='bgr24', width=w, height=h, interpolation='FAST_BILINEAR')
+        return True, f.to_ndarray(format='bgr24')
+
+    def get(self, prop):
+        if self._c is None:
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self._size()[0])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self._size()[1])
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self._s.average_rate or 0)
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self._pts_ms
+        return 0.0
+
+    def release(self):
+        if self._c is not None:
+            self._c.close()
+            self._c = None
+
+
+def open_capture(cam: dict):
+    """Capture for a camera config (substream_url or rtsp_url, capture backend)."""
+    url = cam.get('substream_url') or cam.get('rtsp_url')
+    kind = cam.get('capture', 'opencv')
+    threads = cam.get('capture_threads')
+    if kind == 'pyav':
+        if av is None:
+            print('[capture] capture: pyav needs PyAV (pip install av); using opencv')
+        else:
+            opts = dict(o.split(';', 1) for o in (cam.get('capture_options') or '').split('|') if ';' in o)
+            return PyAvCapture(url, cam.get('capture_skip'), cam.get('capture_width'), threads, opts)
+    if kind == 'gstreamer':
+        return cv2.VideoCapture((cam.get('capture_pipeline') or DEFAULT_PIPELINE).format(url=url), cv2.CAP_GSTREAMER)
+    if kind == 'ffmpeg':
+        params = [cv2.CAP_PROP_N_THREADS, int(threads)] if threads else []
+        with _env_lock:
+            old = os.environ.get('OPENCV_FFMPEG_CAPTURE_OPTIONS')
+            if cam.get('capture_options'):
+                os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = cam['capture_options']
+            try:
+                return cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+            finally:
+                if old is None:
+                    os.environ.pop('OPENCV_FFMPEG_CAPTURE_OPTIONS', None)
+                else:
+                    os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = old
+    return cv2.VideoCapture(url)
@@ -0,0 +1,132 @@
+"""Foreground detection for the tripline counters: frame -> car centroids.
+
+By default the whole frame goes through grayscale, MOG2, median blur and
+contours. With crop_to_roi (camera config) only the bounding box of
+roi_polygon is processed, and downscale: N shrinks that crop N times before
+background subtraction. min_contour_area and the ROI polygon are scaled to
+the processed image and centroids are mapped back to full-frame pixels, so
+the tripline and the tracker's distance gate keep their meaning.
+
+Geometry (crop box, binary ROI mask, scaled area) is set up from the first
+frame and again whenever the stream resolution changes, which also restarts
+the background model. Per frame the foreground mask is ANDed with the ROI
+mask before findContours, so blobs outside the ROI never become contours,
+and the area and centre-in-ROI checks run on arrays instead of a
+pointPolygonTest per contour.
+
+stage_s accumulates the seconds spent per stage (prep: crop/resize/gray,
+mog2, contours: blur/threshold/findContours/filtering) for the replay harness
+and the worker metrics.
+
+MotionGate is the cheap check in front of all that (motion_gate: true): every
+8th pixel of the ROI's bounding box (nearest-neighbour resize, ~50x cheaper
+than INTER_AREA), grayscale, absdiff against the previous checked frame; motion when the changed pixels add up to a quarter of
+min_contour_area (full-frame pixels).
+"""
+import time
+
+import cv2
+import numpy as np
+
+
+class Detector:
+    def __init__(self, cfg: dict):
+        self.min_area = int(cfg.get('min_contour_area', 1200))
+        self.roi = cfg.get('roi_polygon') or []
+        self.crop = bool(cfg.get('crop_to_roi', False)) and len(self.roi) >= 3
+        self.scale = max(1.0, float(cfg.get('downscale', 1) or 1))
+        self.shape = None
+        self.stage_s = {'prep': 0.0, 'mog2': 0.0, 'contours': 0.0}
+
+    def _setup(self, h, w):
+        self.shape = (h, w)
+        pts = np.array([(px * w, py * h) for px, py in self.roi], np.float32).reshape(-1, 2)
+        if self.crop:
+            x0, y0 = np.floor(pts.min(axis=0)).astype(int).clip(0)
+            x1, y1 = np.ceil(pts.max(axis=0)).astype(int)
+            x1, y1 = min(int(x1), w), min(int(y1), h)
+        else:
+            x0, y0, x1, y1 = 0, 0, w, h
+        self.box = (int(x0), int(y0), int(x1), int(y1))
+        self.size = (max(1, round((x1 - x0) / self.scale)), max(1, round((y1 - y0) / self.scale)))
+        self.roi_mask = None
+        if len(self.roi) >= 3:
+            self.roi_mask = np.zeros((self.size[1], self.size[0]), np.uint8)
+            cv2.fillPoly(self.roi_mask, [np.round((pts - (x0, y0)) / self.scale).astype(np.int32)], 255)
+        self.area = self.min_area / (self.scale * self.scale)
+        self.fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=64, detectShadows=True)
+
+    def __call__(self, frame):
+        """[(cx, cy)] in full-frame pixels."""
+        if frame.shape[:2] != self.shape:
+            self._setup(*frame.shape[:2])
+        t0 = time.perf_counter()
+        x0, y0, x1, y1 = self.box
+        img = frame[y0:y1, x0:x1]
+        if self.scale > 1:
+            img = cv2.resize(img, self.size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        t1 = time.perf_counter()
+        mask = self.fgbg.apply(gray)
+        t2 = time.perf_counter()
+        st = self.stage_s
+        st['prep'] += t1 - t0; st['mog2'] += t2 - t1
+        mask = cv2.medianBlur(mask, 5)
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)
+        if self.roi_mask is not None:
+            cv2.bitwise_and(mask, self.roi_mask, dst=mask)
+        cnts, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not cnts:
+            st['contours'] += time.perf_counter() - t2
+            return []
+        area = np.fromiter(map(cv2.contourArea, cnts), np.float64, len(cnts))
+        boxes = np.array([cv2.boundingRect(cnts[i]) for i in np.flatnonzero(area >= self.area)], np.int32).reshape(-1, 4)
+        cx, cy = boxes[:, 0] + boxes[:, 2] // 2, boxes[:, 1] + boxes[:, 3] // 2
+        if self.roi_mask is not None:
+            # bounding-box centre must be inside the ROI too (concave polygons)
+            keep = self.roi_mask[cy, cx] > 0
+            cx, cy = cx[keep], cy[keep]
+        fx = (x0 + cx * self.scale).astype(int)
+        fy = (y0 + cy * self.scale).astype(int)
+        st['contours'] += time.perf_counter() - t2
+        return list(zip(fx.tolist(), fy.tolist()))
+
+
+class MotionGate:
+    SCALE = 8
+    THRESHOLD = 20   # gray levels, above sensor noise
+
+    def __init__(self, cfg: dict):
+        self.roi = cfg.get('roi_polygon') or []
+        self.min_px = int(cfg.get('min_contour_area', 1200)) / 4 / (self.SCALE * self.SCALE)
+        self.shape = None
+        self.prev = None
+
+    def _setup(self, h, w):
+        self.shape = (h, w)
+        self.prev = None
+        self.box, self.mask = (0, 0, w, h), None
+        if len(self.roi) >= 3:
+            pts = np.array([(px * w, py * h) for px, py in self.roi], np.float32).reshape(-1, 2)
+            x0, y0 = np.floor(pts.min(axis=0)).astype(int).clip(0)
+            x1, y1 = np.ceil(pts.max(axis=0)).astype(int)
+            self.box = (int(x0), int(y0), min(int(x1), w), min(int(y1), h))
+        x0, y0, x1, y1 = self.box
+        self.size = (max(1, (x1 - x0) // self.SCALE), max(1, (y1 - y0) // self.SCALE))
+        if len(self.roi) >= 3:
+            self.mask = np.zeros((self.size[1], self.size[0]), np.uint8)
+            cv2.fillPoly(self.mask, [np.round((pts - (x0, y0)) / self.SCALE).astype(np.int32)], 255)
+
+    def __call__(self, frame) -> bool:
+        """True when something moved in the ROI since the previous call (and on the first frame)."""
+        if frame.shape[:2] != self.shape:
+            self._setup(*frame.shape[:2])
+        x0, y0, x1, y1 = self.box
+        small = cv2.cvtColor(cv2.resize(frame[y0:y1, x0:x1], self.size, interpolation=cv2.INTER_NEAREST), cv2.COLOR_BGR2GRAY)
+        prev, self.prev = self.prev, small
+        if prev is None:
+            return True
+        _, diff = cv2.threshold(cv2.absdiff(small, prev), self.THRESHOLD, 255, cv2.THRESH_BINARY)
+        if self.mask is not None:
+            cv2.bitwise_and(diff, self.mask, dst=diff)
+        return cv2.countNonZero(diff) >= self.min_px
@@ -0,0 +1,259 @@
+"""Push-based FPP status over MQTT (optional; needs paho-mqtt).
+
+FPP publishes player changes to an MQTT broker (Status/Control > MQTT) under
+[<prefix>/]falcon/player/<hostname>/:
+
+  status                     playing / idle / stopped ...
+  playlist/name/status       current playlist
+  playlist/sequence/status   current sequence (.fseq)
+  playlist/media/status      current media file (media-only entries)
+  version                    FPP version
+  fppd_status                full status JSON, every "MQTT frequency" seconds
+
+The listener keeps the merged now-playing details and records a transition
+into fpp_segments as soon as playlist/media/state changes, so a segment
+starts when the song did, not at the next 15s poll. FPP sends the fields of
+one transition as separate messages; changes within FPP_EVENTS_SETTLE_MS are
+recorded together, stamped with the first one.
+
+record_fpp_status() keeps running every 15s: while events are fresh (within
+FPP_EVENTS_STALE_S) it extends the open segment from the pushed state without
+touching HTTP, otherwise it polls the controller as before.
+
+FPP_MQTT_URL is mqtt://[user:pass@]host[:1883], mqtts://..., or ws:// / wss://
+for a broker's websocket listener (path from the URL, e.g. ws://pi:9001/mqtt).
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse, unquote
+
+from app import writer
+
+try:
+    import paho.mqtt.client as mqtt
+except ImportError:  # optional: polling works without it
+    mqtt = None
+
+MQTT_URL = os.getenv('FPP_MQTT_URL', '').strip()
+MQTT_TOPIC = os.getenv('FPP_MQTT_TOPIC', 'falcon/player/+/#')
+STALE_S = float(os.getenv('FPP_EVENTS_STALE_S', '120'))       # no events for this long -> poll again
+SETTLE_MS = int(os.getenv('FPP_EVENTS_SETTLE_MS', '250'))     # one transition's messages are recorded together
+
+FIELDS = {'status': 'state', 'playlist/name/status': 'playlist', 'playlist/sequence/status': 'sequence',
+          'playlist/media/status': 'media_file', 'version': 'version'}
+
+
+def parse_topic(topic: str):
+    """(hostname, suffix) for .../falcon/player/<host>/<suffix>, else (None, None)."""
+    parts = topic.split('/')
+    for i in range(len(parts) - 3):
+        if parts[i] == 'falcon' and parts[i + 1] == 'player':
+            return parts[i + 2], '/'.join(parts[i + 3:])
+    return None, None
+
+
+def _fppd_status(j: dict) -> dict:
+    # /api/fppd/status shape, as published on fppd_status
+    out = {}
+    if j.get('status_name'):
+        out['state'] = j['status_name']
+    pl = j.get('current_playlist')
+    if isinstance(pl, dict):
+        pl = pl.get('playlist')
+    if pl is not None:
+        out['playlist'] = pl
+    if 'current_sequence' in j:
+        out['sequence'] = j['current_sequence']
+    if 'current_song' in j:
+        out['media_file'] = j['current_song']
+    if j.get('version'):
+        out['version'] = j['version']
+    return out
+
+
+def _record(ts, details: dict):
+    # transitions are rare and someone is waiting on "what's playing": commit right away
+    return writer.submit_fpp(ts, details, urgent=True)
+
+
+def _key(d: dict):
+    return (d.get('state') or None, d.get('playlist') or None, d.get('media') or None)
+
+
+class FppListener:
+    def __init__(self, url: str = MQTT_URL, topic: str = MQTT_TOPIC, submit=_record,
+                 settle_ms: int = SETTLE_MS, stale_s: float = STALE_S, timers: bool = True):
+        self.url, self.topic, self.submit = url, topic, submit
+        self.settle_s = settle_ms / 1000.0
+        self.stale_s = stale_s
+        self.timers = timers      # False: settle by event timestamps only (replays)
+        self.client = None
+        self.connected = False
+        self.last_event = None    # monotonic
+        self._raw = {}
+        self._emitted = None      # key of the last recorded transition
+        self._since = None        # ts of the first unrecorded change
+        self._lock = threading.Lock()
+        self.stats = {'events': 0, 'ignored': 0, 'transitions': 0, 'dropped': 0, 'connects': 0}
+
+    @property
+    def details(self) -> dict:
+        d = {k: v for k, v in self._raw.items() if k in ('hostname', 'state', 'playlist', 'version')}
+        # sequence wins like in the polled merge; media-only entries fall back to the file
+        media = self._raw.get('sequence') or self._raw.get('media_file')
+        if media:
+            d['media'] = media
+        return d
+
+    def handle(self, topic: str, payload, ts: datetime = None) -> bool:
+        """Apply one message; True if it changed playlist/media/state."""
+        ts = ts or datetime.now(timezone.utc)
+        host, suffix = parse_topic(topic)
+        if isinstance(payload, (bytes, bytearray)):
+            payload = payload.decode('utf-8', 'replace')
+        if suffix == 'fppd_status':
+            try:
+                upd = _fppd_status(json.loads(payload))
+            except (ValueError, AttributeError):
+                upd = {}
+        elif suffix in FIELDS:
+            upd = {FIELDS[suffix]: payload.strip()}
+        else:
+            upd = {}
+        with self._lock:
+            self.last_event = time.monotonic()
+            if not upd:
+                self.stats['ignored'] += 1
+                return False
+            self.stats['events'] += 1
+            if self._since is not None and (ts - self._since).total_seconds() >= self.settle_s:
+                self._emit()
+            before = _key(self.details)
+            upd['hostname'] = host
+            self._raw.update(upd)
+            changed = _key(self.details) != before
+            if self._since is not None or _key(self.details) == self._emitted:
+                return changed  # already settling, or nothing new to record
+            self._since = ts
+            if self.settle_s <= 0:
+                self._emit()
+            elif self.timers:
+                t = threading.Timer(self.settle_s, self.emit)
+                t.daemon = True
+                t.start()
+            return True
+
+    def emit(self):
+        with self._lock:
+            self._emit()
+
+    def _emit(self):
+        if self._since is None:
+            return
+        since, self._since = self._since, None
+        key = _key(self.details)
+        if key == self._emitted:
+            return  # changed and changed back within the settle window
+        try:
+            self.submit(since, self.details)
+        except Exception as e:  # queue.Full: the next poll/heartbeat catches up
+            self.stats['dropped'] += 1
+            print(f'[fpp-events] transition not recorded: {e}')
+            return
+        self._emitted = key
+        self.stats['transitions'] += 1
+
+    def fresh(self) -> bool:
+        return self.last_event is not None and time.monotonic() - self.last_event < self.stale_s \
+            and (self.client is None or self.connected)
+
+    def snapshot(self):
+        """Pushed details for the 15s heartbeat, or None while a transition is settling."""
+        with self._lock:
+            return None if self._since is not None or not self._raw else self.details
+
+    # ---- MQTT ----
+    def start(self):
+        u = urlparse(self.url)
+        ws = u.scheme in ('ws', 'wss')
+        c = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, transport='websockets' if ws else 'tcp',
+                        client_id=f'glowsync-{os.getpid()}')
+        if ws:
+            c.ws_set_options(path=u.path or '/mqtt')
+        if u.scheme in ('mqtts', 'wss'):
+            c.tls_set()
+        if u.username:
+            c.username_pw_set(unquote(u.username), unquote(u.password or ''))
+        c.on_connect = self._on_connect
+        c.on_disconnect = self._on_disconnect
+        c.on_message = lambda _c, _u, msg: self.handle(msg.topic, msg.payload)
+        c.reconnect_delay_set(1, 60)
+        default_port = {'mqtts': 8883, 'ws': 80, 'wss': 443}.get(u.scheme, 1883)
+        c.connect_async(u.hostname, u.port or default_port, keepalive=30)
+        c.loop_start()
+        self.client = c
+        return self
+
+    def stop(self):
+        if self.client is not None:
+            self.client.loop_stop()
+            self.client.disconnect()
+        self.emit()
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties=None):
+        if reason_code.is_failure:
+            print(f'[fpp-events] broker refused connection: {reason_code}')
+            return
+        self.connected = True
+        self.stats['connects'] += 1
+        client.subscribe(self.topic)  # retained messages bring the current state right away
+        print(f'[fpp-events] subscribed to {self.topic}')
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties=None):
+        self.connected = False
+        print(f'[fpp-events] disconnected ({reason_code}); polling until events resume')
+
+    def metrics(self) -> dict:
+        return dict(self.stats, connected=self.connected, fresh=self.fresh(),
+                    last_event_age_s=None if self.last_event is None else round(time.monotonic() - self.last_event, 1))
+
+
+listener = None
+
+
+def start(url: str = None):
+    """Start the process-wide listener if FPP_MQTT_URL is set and paho-mqtt is installed."""
+    global listener
+    url = url or MQTT_URL
+    if not url:
+        return None
+    if mqtt is None:
+        print('[fpp-events] FPP_MQTT_URL set but paho-mqtt is not installed; polling only')
+        return None
+    if listener is None:
+        listener = FppListener(url).start()
+    return listener
+
+
+def stop():
+    if listener is not None:
+        listener.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description='Print FPP status transitions pushed over MQTT')
+    ap.add_argument('--url', default=MQTT_URL or 'mqtt://localhost:1883')
+    ap.add_argument('--topic', default=MQTT_TOPIC)
+    args = ap.parse_args()
+    if mqtt is None:
+        raise SystemExit('[fpp-events] pip install paho-mqtt')
+    FppListener(args.url, args.topic, submit=lambda ts, d: print(f'[fpp-events] {ts.isoformat()} {d}')).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
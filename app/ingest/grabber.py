@@ -0,0 +1,181 @@
+"""Frame grabbing and pacing for the camera counters.
+
+cap.read() inline in the processing loop lets the RTSP buffer fill while a
+frame is being processed, so every frame handled is older than the last one
+(latency grows) and the loop's sleep comes on top of the processing time
+(the rate falls below fps_target). Instead:
+
+- FrameGrabber drains the stream on its own thread and keeps only the newest
+  frame; a frame replaced before anyone took it counts as dropped.
+- Pacer wakes the loop on a fixed fps_target schedule, net of processing
+  time; when processing overruns a whole period the missed ticks are skipped
+  (counted as late) rather than bunched up.
+
+FrameGrabber also owns the stream's lifecycle: it opens the capture itself
+(open_cap), and when opening fails or reads keep failing it releases the
+capture and reopens it with exponential backoff (1s doubling to
+backoff_max_s, reset by the next good frame). A stream counts as stalled when
+no frame with a newer timestamp (CAP_PROP_POS_MSEC, where the backend has
+one) has arrived for stall_s: either frames stopped, or the camera keeps
+sending the same frozen one. A reader blocked inside cap.read() cannot
+notice that itself, so get() checks too and starts a fresh reader on a new
+capture; the old one exits, releasing its capture, once its read returns.
+health() gives state (connecting/streaming/backoff/stalled), stream fps,
+last-frame age and reconnects for /vision/cameras.
+"""
+import threading
+import time
+
+import cv2
+
+
+class FrameGrabber:
+    def __init__(self, open_cap, name: str = 'camera', retry_s: float = 0.4, stall_s: float = 10.0,
+                 backoff_max_s: float = 60.0, max_read_errors: int = 5):
+        self.open_cap, self.name, self.retry_s = open_cap, name, retry_s
+        self.stall_s, self.backoff_max_s, self.max_read_errors = stall_s, backoff_max_s, max_read_errors
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0          # frames grabbed so far
+        self._taken = 0        # seq of the last frame handed out
+        self._stop = False
+        self._gen = 0          # reader generation; a reader whose gen is old exits
+        self._backoff = 1.0
+        self._progress = None  # monotonic time of the last frame with a newer timestamp
+        self._mark = (time.monotonic(), 0)
+        self.state = 'connecting'
+        self.last_frame_at = None  # wall clock, for reporting
+        self.stats = {'grabbed': 0, 'dropped': 0, 'read_errors': 0, 'reconnects': 0, 'stalls': 0, 'repeated': 0}
+
+    def start(self):
+        self._spawn()
+        return self
+
+    def _spawn(self):
+        self._gen += 1
+        threading.Thread(target=self._run, args=(self._gen,), name=f'grab:{self.name}', daemon=True).start()
+
+    def _current(self, gen):
+        return not self._stop and gen == self._gen
+
+    def _wait_backoff(self, gen, why):
+        self.state = 'backoff'
+        print(f'[grab:{self.name}] {why}; reconnecting in {self._backoff:.0f}s')
+        with self._cond:
+            self._cond.wait_for(lambda: not self._current(gen), self._backoff)
+        self._backoff = min(self._backoff * 2, self.backoff_max_s)
+
+    def _run(self, gen):
+        cap, errors, last_pts = None, 0, None
+        while self._current(gen):
+            if cap is None:
+                self.state = 'connecting'
+                cap = self.open_cap()
+                if cap is None or not cap.isOpened():
+                    cap = None
+                    self._wait_backoff(gen, 'cannot open stream')
+                    if self._current(gen):
+                        self.stats['reconnects'] += 1
+                    continue
+                errors, last_pts = 0, None
+                self._progress = time.monotonic()  # stall clock starts at open
+            ok, frame = cap.read()  # releases the GIL while decoding
+            if not self._current(gen):
+                break  # replaced after a stall (or stopped) while blocked in read
+            if not ok:
+                self.stats['read_errors'] += 1
+                errors += 1
+                if errors >= self.max_read_errors:
+                    cap.release()
+                    cap = None
+                    self._wait_backoff(gen, f'{errors} read errors in a row')
+                    if self._current(gen):
+                        self.stats['reconnects'] += 1
+                else:
+                    time.sleep(self.retry_s)
+                continue
+            errors = 0
+            now = time.monotonic()
+            pts = cap.get(cv2.CAP_PROP_POS_MSEC) or None
+            if pts is not None and last_pts is not None and pts <= last_pts:
+                self.stats['repeated'] += 1  # frozen stream: same timestamp again
+                if now - self._progress > self.stall_s:
+                    self.stats['stalls'] += 1
+                    cap.release()
+                    cap = None
+                    self._wait_backoff(gen, f'frame timestamp stuck for {now - self._progress:.0f}s')
+                    if self._current(gen):
+                        self.stats['reconnects'] += 1
+                continue
+            last_pts = pts
+            self._backoff = 1.0
+            with self._cond:
+                if self._seq > self._taken:
+                    self.stats['dropped'] += 1  # previous one never processed
+                self._frame = frame
+                self._seq += 1
+                self._progress = now
+                self.last_frame_at = time.time()
+                self.state = 'streaming'
+                self.stats['grabbed'] += 1
+                self._cond.notify()
+        if cap is not None:
+            cap.release()
+
+    def _check_stall(self):
+        """Called with the lock held: replace a reader that has had no new frame for stall_s."""
+        if self.state == 'streaming' and self._progress is not None and time.monotonic() - self._progress > self.stall_s:
+            print(f'[grab:{self.name}] no frame for {time.monotonic() - self._progress:.0f}s; reopening')
+            self.state = 'stalled'
+            self.stats['stalls'] += 1
+            self.stats['reconnects'] += 1
+            self._progress = time.monotonic()
+            self._spawn()
+            self._cond.notify_all()
+
+    def get(self, timeout: float = 2.0):
+        """Newest frame not handed out yet; waits up to timeout, else None."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._taken or self._stop, timeout):
+                self._check_stall()
+                return None
+            if self._seq <= self._taken:
+                return None
+            self._taken = self._seq
+            return self._frame
+
+    def health(self) -> dict:
+        """state, stream fps since the previous call, last-frame age and the counters."""
+        now, grabbed = time.monotonic(), self.stats['grabbed']
+        fps = (grabbed - self._mark[1]) / (now - self._mark[0]) if now > self._mark[0] else 0.0
+        self._mark = (now, grabbed)
+        age = time.time() - self.last_frame_at if self.last_frame_at else None
+        return dict(self.stats, state=self.state, stream_fps=round(fps, 2),
+                    last_frame_at=self.last_frame_at, last_frame_age_s=round(age, 1) if age is not None else None)
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+
+
+class Pacer:
+    def __init__(self, fps: float):
+        self.period = 1.0 / fps if fps and fps > 0 else 0.0
+        self._next = None
+        self.late = 0
+
+    def wait(self):
+        """Sleep until the next tick (no-op when fps <= 0)."""
+        if not self.period:
+            return
+        now = time.monotonic()
+        if self._next is None:
+            self._next = now
+        elif now - self._next > self.period:
+            # overran by more than a tick: skip what was missed instead of catching up in a burst
+            self.late += int((now - self._next) // self.period)
+            self._next = now
+        elif self._next > now:
+            time.sleep(self._next - now)
+        self._next += self.period
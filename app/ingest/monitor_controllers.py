@@ -1,15 +1,63 @@
 from datetime import datetime, timezone
 from typing import Dict
 from app.db import get_session, Controller
-from icmplib import ping
+from icmplib import async_multiping, async_ping, async_resolve, is_ipv4_address, is_ipv6_address
+from icmplib.exceptions import SocketPermissionError
+import asyncio
 import httpx
 import json
+import os
+import threading
+import time
 
-def check_http(ip: str, paths):
+CONCURRENCY = int(os.getenv('MONITOR_CONCURRENCY', '16'))      # controllers probed at once
+DEADLINE_S = float(os.getenv('MONITOR_DEADLINE_S', '8'))       # per controller, all probes included
+BUDGET_S = float(os.getenv('MONITOR_BUDGET_S', '40'))          # whole run; stays under the 1-minute cron
+HTTP_TIMEOUT_S = float(os.getenv('MONITOR_HTTP_TIMEOUT_S', '3'))
+FPP_REDISCOVER_S = int(os.getenv('FPP_REDISCOVER_S', '3600'))  # re-probe all FPP paths at least this often
+
+# Try FPP API v5+ endpoints first, then older fppjson.php
+FPP_PATHS = [
+    '/api/system/status',                        # general system status
+    '/api/fppd/status',                          # fppd state
+    '/api/fppd/playlist',                        # current playlist
+    '/api/fppd/media',                            # current media/sequence
+    '/fppjson.php?command=getFPPDstatus',       # legacy
+    '/fppjson.php?command=getStatus'            # legacy
+]
+
+
+class _Loop:
+    """One background event loop + keep-alive AsyncClient shared by the monitor
+    and the 15s FPP sampler, so connections are reused between runs."""
+    def __init__(self):
+        self.loop = None
+        self.client = None
+        self._lock = threading.Lock()
+
+    def run(self, coro, timeout=None):
+        with self._lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name='monitor-loop', daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def http(self) -> httpx.AsyncClient:
+        # only called from inside the loop
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_TIMEOUT_S, connect=min(HTTP_TIMEOUT_S, 1.5)),
+                limits=httpx.Limits(max_connections=CONCURRENCY * 2, max_keepalive_connections=CONCURRENCY * 2))
+        return self.client
+
+_loop = _Loop()
+
+
+async def check_http_async(ip: str, paths) -> bool:
+    cli = _loop.http()
     for p in paths:
-        url = f'http://{ip}{p}'
         try:
-            r = httpx.get(url, timeout=3.0)
+            r = await cli.get(f'http://{ip}{p}')
             if r.status_code < 500:
                 return True
         except Exception:
@@ -17,125 +65,260 @@ def check_http(ip: str, paths):
     return False
 
 
-def fpp_now_playing(ip: str):
-    # Try FPP API v5+ endpoints first, then older fppjson.php
-    paths = [
-        '/api/system/status',                        # general system status
-        '/api/fppd/status',                          # fppd state
-        '/api/fppd/playlist',                        # current playlist
-        '/api/fppd/media',                            # current media/sequence
-        '/fppjson.php?command=getFPPDstatus',       # legacy
-        '/fppjson.php?command=getStatus'            # legacy
-    ]
+def _merge_fpp(info: dict, j):
+    # Heuristic merge of common fields across versions
+    if not isinstance(j, dict):
+        return
+    # state
+    state = j.get('state') or j.get('FPPDStatus') or j.get('fppd_state') or j.get('statusName')
+    if state: info['state'] = state
+    # playlist/media/song fields
+    for k in ['current_playlist', 'CurrentPlaylist', 'playlist', 'Playlist', 'playlistName']:
+        if k in j: info['playlist'] = j[k]
+    for k in ['media', 'sequence', 'Sequence', 'current_sequence', 'song', 'Song']:
+        if k in j: info['media'] = j[k]
+    # times
+    for k in ['elapsed', 'elapsed_ms', 'secondsElapsed']:
+        if k in j: info['elapsed'] = j[k]
+    for k in ['duration', 'secondsRemaining']:
+        if k in j: info['duration'] = j[k]
+    # hostname/version
+    for k in ['hostname','HostName']:
+        if k in j: info['hostname'] = j[k]
+    for k in ['fpp_version','version']:
+        if k in j: info['version'] = j[k]
+
+
+async def _get_json(ip: str, path: str):
+    try:
+        r = await _loop.http().get(f'http://{ip}{path}')
+        if r.status_code >= 500:
+            return None
+        return r.json()
+    except Exception:
+        return None
+
+
+async def fpp_now_playing_async(ip: str, paths=FPP_PATHS) -> dict:
+    # all paths at once; merged in path order so later (legacy) answers win as before
     info = {}
-    for p in paths:
-        url = f'http://{ip}{p}'
+    for j in await asyncio.gather(*(_get_json(ip, p) for p in paths)):
+        _merge_fpp(info, j)
+    return info
+
+
+async def fpp_discover(ip: str) -> tuple:
+    """Probe every FPP path; (details, caps). caps['paths'] is the smallest
+    subset giving the same merged answer: for each field, the last path that
+    supplied it (the one that won the full merge)."""
+    info, winner, fields = {}, {}, {}
+    for p, j in zip(FPP_PATHS, await asyncio.gather(*(_get_json(ip, p) for p in FPP_PATHS))):
+        got = {}
+        _merge_fpp(got, j)
+        if got:
+            fields[p] = sorted(got)
+            winner.update((k, p) for k in got)
+        _merge_fpp(info, j)
+    caps = {'paths': [p for p in FPP_PATHS if p in winner.values()], 'fields': fields,
+            'version': info.get('version'), 'at': int(time.time())}
+    return info, caps
+
+
+async def fpp_sample_async(ip: str, caps: dict = None) -> tuple:
+    """(details, new caps or None). Uses only the discovered paths; re-discovers
+    when caps are missing or older than FPP_REDISCOVER_S, when one of those
+    paths stops answering, or when the reported version changes (firmware)."""
+    if caps and caps.get('paths') and time.time() - caps.get('at', 0) < FPP_REDISCOVER_S:
+        js = await asyncio.gather(*(_get_json(ip, p) for p in caps['paths']))
+        if all(isinstance(j, dict) for j in js):
+            info = {}
+            for j in js:
+                _merge_fpp(info, j)
+            if info.get('version') == caps.get('version'):
+                return info, None
+    return await fpp_discover(ip)
+
+
+def check_http(ip: str, paths):
+    return _loop.run(check_http_async(ip, paths))
+
+
+def fpp_now_playing(ip: str):
+    return _loop.run(fpp_now_playing_async(ip))
+
+
+def fpp_sample(ctrl: Controller) -> dict:
+    """Now-playing details for an FPP controller via its cached capabilities;
+    refreshed caps are stored on the (caller's, uncommitted) Controller row."""
+    caps = json.loads(ctrl.fpp_caps_json) if ctrl.fpp_caps_json else None
+    info, new_caps = _loop.run(fpp_sample_async(ctrl.ip, caps))
+    if new_caps is not None:
+        ctrl.fpp_caps_json = json.dumps(new_caps)
+    return info
+
+
+async def _probe(c: Dict) -> Dict:
+    """HTTP side of one controller check (ping runs separately, for all at once)."""
+    out = {'http': False, 'details': None, 'caps': None}
+    if c['kind'] == 'falcon':
+        out['http'] = await check_http_async(c['ip'], ['/', '/index.html'])
+    elif c['kind'] == 'fpp':
+        # Try to capture Now Playing details for FPP; any answer there also proves HTTP is up
+        out['details'], out['caps'] = await fpp_sample_async(c['ip'], c.get('caps'))
+        out['http'] = bool(out['details']) or await check_http_async(
+            c['ip'], ['/api/system/status', '/fppjson.php?command=getFPPDstatus', '/'])
+    return out
+
+
+_icmp = {'ok': None}
+
+async def _icmp_allowed() -> bool:
+    # ICMP ping needs CAP_NET_RAW or ping_group_range; find out once instead of every run
+    if _icmp['ok'] is None:
         try:
-            r = httpx.get(url, timeout=3.0)
-            if r.status_code >= 500: 
-                continue
-            try:
-                j = r.json()
-            except Exception:
-                continue
-            # Heuristic merge of common fields across versions
-            if isinstance(j, dict):
-                # state
-                state = j.get('state') or j.get('FPPDStatus') or j.get('fppd_state') or j.get('statusName')
-                if state: info['state'] = state
-                # playlist/media/song fields
-                for k in ['current_playlist', 'CurrentPlaylist', 'playlist', 'Playlist', 'playlistName']:
-                    if k in j: info['playlist'] = j[k]
-                for k in ['media', 'sequence', 'Sequence', 'current_sequence', 'song', 'Song']:
-                    if k in j: info['media'] = j[k]
-                # times
-                for k in ['elapsed', 'elapsed_ms', 'secondsElapsed']:
-                    if k in j: info['elapsed'] = j[k]
-                for k in ['duration', 'secondsRemaining']:
-                    if k in j: info['duration'] = j[k]
-                # hostname/version
-                for k in ['hostname','HostName']:
-                    if k in j: info['hostname'] = j[k]
-                for k in ['fpp_version','version']:
-                    if k in j: info['version'] = j[k]
+            await async_ping('127.0.0.1', count=1, timeout=0.5, privileged=False)
+            _icmp['ok'] = True
+        except SocketPermissionError:
+            _icmp['ok'] = False
+            print('[monitor] ICMP not permitted, using HTTP checks only')
         except Exception:
+            _icmp['ok'] = True
+    return _icmp['ok']
+
+
+async def _resolve(name: str):
+    if is_ipv4_address(name) or is_ipv6_address(name):
+        return name
+    try:
+        return (await async_resolve(name))[0]
+    except Exception:
+        return None
+
+
+async def _ping_all(ips) -> Dict[str, int]:
+    """{ip: rtt_ms} for the hosts that answered, one multiping for the whole fleet."""
+    if not ips or not await _icmp_allowed():
+        return {}
+    # resolve first: a single bad name would otherwise fail the whole multiping
+    addrs = await asyncio.gather(*(_resolve(ip) for ip in ips))
+    targets = sorted({a for a in addrs if a})
+    try:
+        hosts = await async_multiping(targets, count=2, interval=0.2, timeout=1,
+                                      concurrent_tasks=CONCURRENCY, privileged=False)
+    except Exception:
+        return {}
+    by_addr = dict(zip(targets, hosts))
+    # avg_rtt is already in milliseconds
+    return {ip: int(by_addr[a].avg_rtt) for ip, a in zip(ips, addrs) if a and by_addr[a].packets_received > 0}
+
+
+async def run_async(ctrls, concurrency: int = CONCURRENCY, deadline_s: float = DEADLINE_S,
+                    budget_s: float = BUDGET_S) -> Dict[int, Dict]:
+    """Check all controllers concurrently; {id: {'status', 'rtt_ms', 'details'}}.
+    Controllers still unanswered when the budget runs out are left out."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(c):
+        async with sem:
+            try:
+                return c['id'], await asyncio.wait_for(_probe(c), deadline_s)
+            except asyncio.TimeoutError:
+                return c['id'], {'http': False, 'details': None, 'caps': None}
+
+    ping_task = asyncio.ensure_future(_ping_all(list({c['ip'] for c in ctrls})))
+    tasks = [asyncio.ensure_future(one(c)) for c in ctrls]
+    done, pending = await asyncio.wait(tasks + [ping_task], timeout=budget_s)
+    for t in pending:
+        t.cancel()
+    rtts = ping_task.result() if ping_task in done else {}
+    by_id = {c['id']: c for c in ctrls}
+    res = {}
+    for t in tasks:
+        if t not in done:
             continue
-    return info
+        cid, probe = t.result()
+        rtt = rtts.get(by_id[cid]['ip'])
+        res[cid] = {'status': 'online' if probe['http'] or rtt is not None else 'offline',
+                    'rtt_ms': rtt, 'details': probe['details'], 'caps': probe['caps']}
+    return res
 
 
 def run():
     s = get_session()
     ctrls = s.query(Controller).all()
+    t0 = time.monotonic()
+    res = _loop.run(run_async([{'id': c.id, 'ip': c.ip, 'kind': c.kind,
+                                'caps': json.loads(c.fpp_caps_json) if c.fpp_caps_json else None} for c in ctrls]))
+    now = datetime.now(timezone.utc)
     for c in ctrls:
-        status = 'offline'
-        rtt_ms = None
-        # ICMP ping (requires CAP_NET_RAW or sudo). If not allowed, fallback to HTTP-only.
-        try:
-            r = ping(c.ip, count=2, interval=0.2, timeout=1, privileged=False)
-            if r.packets_received>0:
-                rtt_ms = int(r.avg_rtt*1000)
-                status = 'online'
-        except Exception:
-            # ignore
-            pass
-        # HTTP probe per kind
-        if c.kind == 'falcon':
-            ok = check_http(c.ip, ['/', '/index.html'])
-            status = 'online' if ok or status=='online' else 'offline'
-        elif c.kind == 'fpp':
-            # Try to capture Now Playing details for FPP
-            details = fpp_now_playing(c.ip)
-            if details:
-                c.last_info_json = json.dumps(details)
-            ok = check_http(c.ip, ['/api/system/status', '/fppjson.php?command=getFPPDstatus', '/'])
-            status = 'online' if ok or status=='online' else 'offline'
+        r = res.get(c.id)
+        if r is None:
+            continue  # out of budget: keep the previous status
+        if r['details']:
+            c.last_info_json = json.dumps(r['details'])
+        if r['caps'] is not None:
+            c.fpp_caps_json = json.dumps(r['caps'])
         # Write back
-        c.last_status = status
-        c.last_rtt_ms = rtt_ms
-        c.last_checked = datetime.now(timezone.utc)
+        c.last_status = r['status']
+        c.last_rtt_ms = r['rtt_ms']
+        c.last_checked = now
         s.add(c)
     s.commit()
-    return {'checked': len(ctrls)}
+    return {'checked': len(res), 'skipped': len(ctrls) - len(res), 'seconds': round(time.monotonic() - t0, 2)}
 
 
 from app.db import get_session, Controller
-from app.db import FPPStatus as _FPPStatus
+from app import seasons, segments, writer
+from app.ingest import fpp_events
+import queue
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime, timezone as _tz
 
+FPP_WRITE_TIMEOUT_S = 5
+
 def record_fpp_status():
     s = get_session()
     fpp = s.query(Controller).filter(Controller.kind=='fpp').order_by(Controller.id.asc()).first()
     if not fpp:
         return {'skipped':'no fpp controller configured'}
-    details = fpp_now_playing(fpp.ip)
+    ev = fpp_events.listener
+    pushed = ev is not None and ev.fresh()
+    if pushed:
+        # transitions were recorded as they were pushed; this just extends the open segment
+        details = ev.snapshot()
+        if details is None:
+            return {'skipped': 'transition settling'}
+    else:
+        caps_before = fpp.fpp_caps_json
+        details = fpp_sample(fpp)
+        if fpp.fpp_caps_json != caps_before:
+            s.commit()  # (re)discovered endpoints
     if not details:
         return {'skipped':'no details'}
-    rec = _FPPStatus(
-        timestamp=datetime.now(_tz.utc),
-        hostname=details.get('hostname'),
-        version=details.get('version'),
-        state=details.get('state'),
-        playlist=details.get('playlist'),
-        media=details.get('media'),
-        raw_json=json.dumps(details)
-    )
-    s.add(rec); s.commit()
-    return {'ok': True, 'id': rec.id}
-
-
-from app.db import Alert as _Alert, Season as _Season
+    # extend the open segment in place; a new row only when playlist/media/state changes.
+    # Goes through the write-behind queue, urgent and waited on: check_fpp_alert runs
+    # right after this and has to see the segment as just sampled, not the previous one
+    try:
+        writer.submit_fpp(datetime.now(_tz.utc), details, urgent=True).result(timeout=FPP_WRITE_TIMEOUT_S)
+    except queue.Full:
+        return {'skipped': 'writer queue full'}
+    except FutureTimeout:
+        return {'ok': True, 'pending': True, 'source': 'push' if pushed else 'poll'}
+    return {'ok': True, 'source': 'push' if pushed else 'poll'}
+
+
+from app.db import Alert as _Alert
 from app.utils import to_local, in_show_hours
 def check_fpp_alert():
     s = get_session()
     fpp = s.query(Controller).filter(Controller.kind=='fpp').order_by(Controller.id.asc()).first()
     if not fpp: return
     # grab latest status
-    from app.db import FPPStatus as _FPPStatus
-    latest = s.query(_FPPStatus).order_by(_FPPStatus.timestamp.desc()).first()
+    latest = segments.latest(s)
     if not latest: return
-    now = latest.timestamp
+    now = latest.end_ts
     # show-hours window
-    season = s.query(_Season).filter(_Season.start_date <= now, _Season.end_date > now).first()
+    season = seasons.resolve(now)
     if season and not in_show_hours(to_local(now, 'America/Chicago'), season.show_start, season.show_end):
         return
     # if state not playing, open an alert if none active
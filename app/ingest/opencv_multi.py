@@ -1,114 +1,203 @@
-import cv2, time, json, threading
-import numpy as np
+"""Multi-camera tripline counter (config.yaml vision.cameras).
+
+VISION_WORKERS=process (default) runs every camera in its own process, so
+decode, MOG2 and tracking of one camera don't share the GIL with the others
+and a 4-camera Pi uses all of its cores. The parent supervises them:
+restarts a worker that dies (with backoff), receives the finished count
+buckets over a queue and submits them to the write-behind queue, and keeps
+per-camera FPS/CPU numbers in VISION_METRICS_PATH (served at /metrics/vision).
+VISION_WORKERS=thread keeps the old one-thread-per-camera mode.
+"""
+import time, json, threading, queue, os
+import multiprocessing as mp
 from datetime import datetime, timezone
-from app.db import get_session, AutoCount, Season
 from app.config import load_config
-from app.utils import floor_bucket, to_local, in_show_hours
+from app import seasons, writer
+from app.showtime import ShowClock
+from app.ingest.grabber import FrameGrabber, Pacer
+from app.ingest.engine import CountEngine
+from app.ingest.capture import open_capture
+
+WORKERS = os.getenv('VISION_WORKERS', 'process')       # process | thread
+METRICS_PATH = os.getenv('VISION_METRICS_PATH', 'data/vision_metrics.json')
+METRICS_S = float(os.getenv('VISION_METRICS_S', '5'))   # worker report / metrics file interval
+RESTART_MAX_S = 60                                      # restart backoff cap
 
-def _denorm(pt, W, H):
-    return int(pt[0]*W), int(pt[1]*H)
+def _submit(name, bucket, n, season):
+    try:
+        writer.submit_count(bucket, 'opencv_tripline', 'vehicle', n, camera_name=name, season=season)
+    except queue.Full:
+        print(f'[opencv:{name}] writer queue full, dropped {n} counts')
 
-def worker(cam, tzname):
+def worker(cam, tzname, emit=None, report=None):
+    """Count one camera. emit(bucket, n, season) gets each
+    finished bucket (default: straight to the writer); report(stats) gets
+    fps/cpu, the grabber's health (stream state, reconnects, last-frame age,
+    grabbed/dropped frames), late ticks and the motion gate's
+    active_pct/idle_skipped every METRICS_S."""
     name = cam.get('name') or 'camera'
-    url = cam['rtsp_url']
+    emit = emit or (lambda bucket, n, season: _submit(name, bucket, n, season))
     fps_target = int(cam.get('fps_target', 6))
-    min_area = int(cam.get('min_contour_area', 1200))
-    roi_poly = cam.get('roi_polygon', [])
-    tripline = cam.get('tripline', [])
-    cap = cv2.VideoCapture(url)
-    if not cap.isOpened():
-        print(f'[opencv:{name}] cannot open rtsp'); return
-    W = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH) or 1280)
-    H = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) or 720)
-    fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=64, detectShadows=True)
-    tracked = {}
-    counts_this_bucket = 0
-    last_bucket = None
-    s = get_session()
+    mark = (time.monotonic(), time.process_time(), 0, 0, 0)
+    # each finished bucket is labelled with the season it falls in
+    engine = CountEngine(cam, 1, emit=lambda bucket, n: emit(bucket, n, seasons.name_at(bucket)))
+    show = ShowClock(tzname)
+    open_grabber = lambda: FrameGrabber(lambda: open_capture(cam), name, stall_s=float(cam.get('stall_s', 10))).start()
+    grab = None
+    pacer = Pacer(fps_target)
 
-    def in_roi(cx, cy):
-        if not roi_poly: return True
-        poly = np.array([(int(px*W), int(py*H)) for px,py in roi_poly], np.int32)
-        return cv2.pointPolygonTest(poly, (cx,cy), False) >= 0
-
-    def crossed(prev, curr):
-        if len(tripline)!=2: return False
-        (x1,y1) = _denorm(tripline[0], W, H)
-        (x2,y2) = _denorm(tripline[1], W, H)
-        def side(x,y): return (y2 - y1)*(x - x1) - (x2 - x1)*(y - y1)
-        return side(*prev) * side(*curr) < 0
+    while True:
+        if report is not None and time.monotonic() - mark[0] >= METRICS_S:
+            # process_time is per process: in thread mode cpu_pct covers all cameras
+            wall, cpu = time.monotonic() - mark[0], time.process_time() - mark[1]
+            ticks = engine.ticks - mark[3]
+            # motion gate duty cycle over the interval: share of frames seen at the active rate
+            duty = round(100 * (engine.active - mark[4]) / ticks, 1) if engine.gate is not None and ticks else None
+            h, w = engine.detect.shape or (None, None)
+            health = grab.health() if grab is not None else {'state': 'closed', 'opens_at': show.until}
+            report(dict(health, frames=engine.frames, counts=engine.counts, late=pacer.late,
+                        fps=round((engine.frames - mark[2]) / wall, 2), cpu_pct=round(100 * cpu / wall, 1),
+                        active_pct=duty, idle_skipped=engine.skipped, width=w, height=h, at=time.time()))
+            mark = (time.monotonic(), time.process_time(), engine.frames, engine.ticks, engine.active)
+        if not show.is_open():
+            if grab is not None:
+                # closed: let go of the stream (no decoding all night) and hand in the last bucket
+                grab.stop(); grab = None
+                engine.flush()
+                print(f'[opencv:{name}] show closed; opens again in {(show.until - time.time()) / 60:.0f} min')
+            time.sleep(min(show.seconds_to_open(), METRICS_S) if report is not None else show.seconds_to_open())
+            continue
+        if grab is None:
+            # opens (and reopens, with backoff) the stream itself; a camera that is down is retried
+            grab = open_grabber()
+        pacer.wait()
+        frame = grab.get()
+        if frame is None: continue
+        engine.bucket_minutes = show.season.bucket_minutes
+        engine.process(frame, datetime.now(timezone.utc))
 
-    def current_season():
-        from datetime import timezone as _tz
-        now = datetime.now(_tz.utc)
-        return s.query(Season).filter(Season.start_date <= now, Season.end_date > now).first()
+# ---- process mode ----
+def _proc_main(cam, tzname, q, ppid):
+    name = cam.get('name') or 'camera'
+    def report(st):
+        if os.getppid() != ppid:
+            raise SystemExit(0)  # supervisor is gone
+        q.put(('metrics', name, st))
+    worker(cam, tzname, emit=lambda bucket, n, season: q.put(('count', name, bucket, n, season)), report=report)
 
-    season = current_season()
-    bucket_mins = season.bucket_minutes if season else 1
-    show_start = season.show_start if season else '00:00'
-    show_end = season.show_end if season else '23:59'
+def _write_metrics(metrics, path=None):
+    path = path or METRICS_PATH
+    tmp = f'{path}.tmp'
+    try:
+        with open(tmp, 'w') as f:
+            json.dump({'workers': WORKERS, 'at': time.time(), 'cameras': metrics}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f'[opencv] cannot write metrics: {e}')
 
-    while True:
-        ok, frame = cap.read()
-        if not ok: time.sleep(0.4); continue
-        now = datetime.now(timezone.utc)
-        if not in_show_hours(to_local(now, tzname), show_start, show_end):
-            time.sleep(1); continue
-        mb = floor_bucket(now, bucket_mins)
-        if last_bucket is None: last_bucket = mb
-        if mb != last_bucket:
-            if counts_this_bucket>0:
-                rec = AutoCount(timestamp=last_bucket, source='opencv_tripline',
-                                camera_name=name, count_type='vehicle',
-                                count_value=counts_this_bucket, meta_json=None,
-                                season=season.name if season else None)
-                s.add(rec); s.commit()
-            counts_this_bucket = 0; last_bucket = mb
+def read_metrics(path=None) -> dict:
+    """Last snapshot written by the supervisor ({} if none); 'stale' once it stops updating."""
+    try:
+        with open(path or METRICS_PATH) as f:
+            m = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    m['stale'] = time.time() - m.get('at', 0) > 6 * METRICS_S
+    return m
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        mask = fgbg.apply(gray)
-        mask = cv2.medianBlur(mask,5)
-        _,mask = cv2.threshold(mask,200,255,cv2.THRESH_BINARY)
-        cnts,_ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+HEALTH_KEYS = ('state', 'stream_fps', 'fps', 'reconnects', 'stalls', 'restarts', 'hung', 'read_errors', 'opens_at')
 
-        detections = []
-        for c in cnts:
-            if cv2.contourArea(c) < min_area: continue
-            x,y,w,h = cv2.boundingRect(c)
-            cx,cy = x+w//2, y+h//2
-            if not in_roi(cx,cy): continue
-            detections.append((cx,cy))
+def camera_health(path=None) -> dict:
+    """Per-camera stream health from the metrics snapshot, last-frame age as of now."""
+    m = read_metrics(path)
+    cams = {}
+    for name, c in (m.get('cameras') or {}).items():
+        h = {k: c.get(k) for k in HEALTH_KEYS if k in c}
+        h['alive'] = c.get('alive', False)
+        h['last_frame_age_s'] = round(time.time() - c['last_frame_at'], 1) if c.get('last_frame_at') else None
+        if m.get('stale') or not h['alive']:
+            h['state'] = 'down'
+        cams[name] = h
+    return {'workers': m.get('workers'), 'stale': m.get('stale', True), 'cameras': cams}
 
-        # nearest-neighbor tracking
-        new_tr = {}; used = set()
-        for tid,data in list(tracked.items()):
-            prev = data['pos']
-            best=None; bestd=1e9; idx=-1
-            for i,pt in enumerate(detections):
-                if i in used: continue
-                d=(pt[0]-prev[0])**2+(pt[1]-prev[1])**2
-                if d<bestd: bestd=d; best=pt; idx=i
-            if best is not None and bestd < 50**2:
-                new_tr[tid]={'pos':best,'counted':data['counted']}
-                used.add(idx)
-                if not data['counted'] and crossed(prev,best):
-                    new_tr[tid]['counted']=True; counts_this_bucket+=1
-        next_id = max(new_tr.keys())+1 if new_tr else 1
-        for i,pt in enumerate(detections):
-            if i in used: continue
-            new_tr[next_id]={'pos':pt,'counted':False}; next_id+=1
-        tracked=new_tr
-        if fps_target>0: time.sleep(max(0,1.0/fps_target))
+def supervise(cams, tzname, stop=None):
+    """One process per camera; restarts dead ones with backoff, forwards counts to the writer."""
+    ctx = mp.get_context('spawn')  # no forked OpenCV/FFmpeg or SQLite state in the children
+    q = ctx.Queue(maxsize=10000)
+    procs = {}
+    metrics = {}
+    for cam in cams:
+        name = cam.get('name') or 'camera'
+        procs[name] = {'cam': cam, 'proc': None, 'started': 0.0, 'backoff': 1.0, 'next': 0.0}
+        metrics[name] = {'restarts': 0, 'delivered': 0, 'alive': False}
+    last_write = 0.0
+    try:
+        while stop is None or not stop.is_set():
+            now = time.monotonic()
+            for name, w in procs.items():
+                p = w['proc']
+                if p is not None and p.exitcode is not None:
+                    # ran a while before dying: start over from a short delay
+                    w['backoff'] = 1.0 if now - w['started'] > RESTART_MAX_S else min(w['backoff'] * 2, RESTART_MAX_S)
+                    w['next'] = now + w['backoff']
+                    w['proc'] = None
+                    metrics[name].update(alive=False, last_exit=p.exitcode)
+                    print(f'[opencv:{name}] worker exited ({p.exitcode}); restarting in {w["backoff"]:.0f}s')
+                elif p is not None and now - w['started'] > 6 * METRICS_S and time.time() - metrics[name].get('at', 0) > 6 * METRICS_S:
+                    # alive but silent: its loop is stuck (e.g. inside the decoder); kill it, restarted above next round
+                    print(f'[opencv:{name}] worker sent no metrics for {6 * METRICS_S:.0f}s; terminating')
+                    metrics[name]['hung'] = metrics[name].get('hung', 0) + 1
+                    p.terminate()
+                if w['proc'] is None and now >= w['next']:
+                    p = ctx.Process(target=_proc_main, args=(w['cam'], tzname, q, os.getpid()),
+                                    name=f'opencv:{name}', daemon=True)
+                    p.start()
+                    if w['started']:
+                        metrics[name]['restarts'] += 1
+                    w.update(proc=p, started=now)
+                    metrics[name].update(alive=True, pid=p.pid)
+            try:
+                msg = q.get(timeout=1.0)
+            except queue.Empty:
+                msg = None
+            while msg is not None:
+                if msg[0] == 'count':
+                    _, name, bucket, n, season = msg
+                    _submit(name, bucket, n, season)
+                    metrics[name]['delivered'] += n
+                elif msg[0] == 'metrics':
+                    metrics[msg[1]].update(msg[2])
+                try:
+                    msg = q.get_nowait()
+                except queue.Empty:
+                    msg = None
+            if time.monotonic() - last_write >= METRICS_S:
+                _write_metrics(metrics)
+                last_write = time.monotonic()
+    finally:
+        for w in procs.values():
+            if w['proc'] is not None and w['proc'].is_alive():
+                w['proc'].terminate()
+    return metrics
 
 def run():
     cfg = load_config()
     cams = (cfg.get('vision',{}) or {}).get('cameras') or []
     tzname = cfg.get('timezone','America/Chicago')
     if not cams: return {'skipped':'no cameras configured'}
-    threads = []
+    if WORKERS == 'process':
+        return supervise(cams, tzname)
+    threads = {}
+    metrics = {}
     for cam in cams:
-        t=threading.Thread(target=worker, args=(cam,tzname), daemon=True)
-        t.start(); threads.append(t)
+        name = cam.get('name') or 'camera'
+        metrics[name] = {}
+        report = lambda st, name=name: metrics[name].update(st)
+        t=threading.Thread(target=worker, args=(cam,tzname), kwargs={'report': report}, daemon=True)
+        t.start(); threads[name] = t
     # Keep alive
     while True:
-        time.sleep(5)
+        time.sleep(METRICS_S)
+        for name, t in threads.items():
+            metrics[name]['alive'] = t.is_alive()
+        _write_metrics(metrics)
@@ -0,0 +1,212 @@
+"""Centroid tracking and tripline counting for the camera counters.
+
+tracker: hungarian (default) in the camera config matches tracks to
+detections optimally by distance from each track's constant-velocity
+prediction. Pairs that are unambiguous inside the gate are taken directly;
+only clusters of cars competing for the same detections go through the
+Hungarian solver (scipy's when installed). Tracks that miss a frame coast on their
+prediction for up to track_max_age frames instead of being dropped, so a car
+hidden behind another one keeps its identity (and its counted flag) rather
+than coming back as a new track. track_gate is the largest distance (px)
+between prediction and detection that still matches.
+tracker: nearest keeps the original greedy matcher and the original tripline
+rule; hungarian also counts a centroid landing exactly on the line.
+"""
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # optional: _hungarian below does the same for our small matrices
+    linear_sum_assignment = None
+
+_INFEASIBLE = 1e12
+
+
+def _denorm(pt, W, H):
+    return int(pt[0]*W), int(pt[1]*H)
+
+
+def tripline_crossed(tripline, W, H, strict: bool = False):
+    """crossed(prev, curr) for a normalized [[x1,y1],[x2,y2]] line in a WxH frame
+    (pixel coordinates computed once here, not per call). strict keeps the
+    original rule, where a centroid exactly on the line is on neither side."""
+    if len(tripline) != 2:
+        return lambda prev, curr: False
+    (x1, y1) = _denorm(tripline[0], W, H)
+    (x2, y2) = _denorm(tripline[1], W, H)
+    dx, dy = x2 - x1, y2 - y1
+    if strict:
+        return lambda prev, curr: (dy*(prev[0] - x1) - dx*(prev[1] - y1)) * (dy*(curr[0] - x1) - dx*(curr[1] - y1)) < 0
+    def crossed(prev, curr):
+        # a centroid exactly on the line counts as the positive side, so stepping onto it is a crossing
+        return (dy*(prev[0] - x1) - dx*(prev[1] - y1) < 0) != (dy*(curr[0] - x1) - dx*(curr[1] - y1) < 0)
+    return crossed
+
+
+class NearestTracker:
+    """Greedy nearest-neighbour tracks; a track is counted once when it crosses."""
+    strict_tripline = True  # counts exactly as before the hungarian tracker
+
+    def __init__(self, crossed, gate: float = 50):
+        self.crossed = crossed
+        self.gate2 = gate * gate
+        self.tracked = {}
+
+    def update(self, detections) -> int:
+        """Match this frame's centroids to the tracks; returns new crossings."""
+        n = 0
+        new_tr = {}; used = set()
+        for tid, data in self.tracked.items():
+            prev = data['pos']
+            best = None; bestd = 1e9; idx = -1
+            for i, pt in enumerate(detections):
+                if i in used: continue
+                d = (pt[0]-prev[0])**2 + (pt[1]-prev[1])**2
+                if d < bestd: bestd = d; best = pt; idx = i
+            if best is not None and bestd < self.gate2:
+                new_tr[tid] = {'pos': best, 'counted': data['counted']}
+                used.add(idx)
+                if not data['counted'] and self.crossed(prev, best):
+                    new_tr[tid]['counted'] = True; n += 1
+        # unmatched detections start new tracks
+        next_id = max(new_tr.keys()) + 1 if new_tr else 1
+        for i, pt in enumerate(detections):
+            if i in used: continue
+            new_tr[next_id] = {'pos': pt, 'counted': False}; next_id += 1
+        self.tracked = new_tr
+        return n
+
+
+def _hungarian(cost):
+    """Min-cost assignment (rows, cols) of a dense n x m matrix; O(n^2 m) with the
+    inner column loop in NumPy (shortest augmenting path with potentials)."""
+    n, m = cost.shape
+    if n > m:
+        cols, rows = _hungarian(cost.T)
+        order = np.argsort(rows)
+        return rows[order], cols[order]  # sorted by row, like scipy
+    u, v = np.zeros(n + 1), np.zeros(m + 1)
+    p = np.zeros(m + 1, np.int64)     # p[j]: row (1-based) assigned to column j, 0 = free
+    way = np.zeros(m + 1, np.int64)
+    for i in range(1, n + 1):
+        p[0], j0 = i, 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used
+            free[0] = False
+            cur = np.full(m + 1, np.inf)
+            cur[1:] = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (cur < minv)
+            minv[better] = cur[better]
+            way[better] = j0
+            cand = np.where(free, minv, np.inf)
+            j1 = int(np.argmin(cand))
+            delta = cand[j1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    cols = np.flatnonzero(p[1:])
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def assign(cost):
+    """(rows, cols) minimising total cost; scipy when installed."""
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    return _hungarian(cost)
+
+
+def _match(pred, det, gate2):
+    """Feasible (track, detection) index pairs minimising total squared distance.
+
+    Most tracks have a single detection inside the gate that no other track
+    wants; those pairs are taken directly in plain Python. Only ambiguous
+    clusters (cars close together) get a cost matrix and assign(), so a frame
+    of well-separated cars costs about what the greedy matcher does."""
+    cand = [[j for j, (x, y) in enumerate(det) if (x - px) ** 2 + (y - py) ** 2 <= gate2] for px, py in pred]
+    wanted = [0] * len(det)
+    for c in cand:
+        for j in c:
+            wanted[j] += 1
+    pairs, amb = [], []
+    for i, c in enumerate(cand):
+        if len(c) == 1 and wanted[c[0]] == 1:
+            pairs.append((i, c[0]))
+        elif c:
+            amb.append(i)
+    if amb:
+        cols = sorted({j for i in amb for j in cand[i]})
+        cost = np.full((len(amb), len(cols)), _INFEASIBLE)
+        for r, i in enumerate(amb):
+            for j in cand[i]:
+                c = cols.index(j)
+                cost[r, c] = (det[j][0] - pred[i][0]) ** 2 + (det[j][1] - pred[i][1]) ** 2
+        rows, cs = assign(cost)
+        pairs += [(amb[r], cols[c]) for r, c in zip(rows.tolist(), cs.tolist()) if cost[r, c] < _INFEASIBLE]
+    return pairs
+
+
+class HungarianTracker:
+    """Optimal assignment on predicted positions, with gating and track ageing."""
+    strict_tripline = False
+
+    def __init__(self, crossed, gate: float = 50, max_age: int = 3):
+        self.crossed = crossed
+        self.gate2 = gate * gate
+        self.max_age = max_age
+        # per track: [x, y, vx, vy, last_x, last_y, age, counted]; x, y is the last
+        # position (observed, or predicted while coasting), v is px per frame, last is
+        # the last observed position (crossings are tested from there), age counts
+        # frames since the last match. A few dozen tracks at most: plain lists beat
+        # NumPy's per-call overhead here
+        self.tracks = []
+
+    def update(self, detections) -> int:
+        """Match this frame's centroids to the tracks; returns new crossings."""
+        det = [(float(p[0]), float(p[1])) for p in detections]
+        pred = [(t[0] + t[2], t[1] + t[3]) for t in self.tracks]
+        matched_d = [False] * len(det)
+        matched_t = [False] * len(pred)
+        n = 0
+        for i, j in (_match(pred, det, self.gate2) if pred and det else ()):
+            t, (x, y) = self.tracks[i], det[j]
+            if not t[7] and self.crossed((t[4], t[5]), (x, y)):
+                t[7] = True
+                n += 1
+            # constant-velocity estimate, smoothed; a track's first match sets it outright
+            sx, sy = (x - t[4]) / (t[6] + 1), (y - t[5]) / (t[6] + 1)
+            if t[2] or t[3]:
+                sx, sy = 0.5 * t[2] + 0.5 * sx, 0.5 * t[3] + 0.5 * sy
+            t[:7] = [x, y, sx, sy, x, y, 0]
+            matched_t[i] = matched_d[j] = True
+        # unmatched tracks coast on their prediction until they are too old
+        kept = []
+        for t, p, hit in zip(self.tracks, pred, matched_t):
+            if not hit:
+                t[0], t[1] = p
+                t[6] += 1
+            if t[6] <= self.max_age:
+                kept.append(t)
+        kept += [[x, y, 0.0, 0.0, x, y, 0, False] for (x, y), hit in zip(det, matched_d) if not hit]
+        self.tracks = kept
+        return n
+
+
+def make_tracker(cfg: dict, crossed=None):
+    """Tracker selected by the camera config (tracker, track_gate, track_max_age)."""
+    gate = float(cfg.get('track_gate', 50))
+    if cfg.get('tracker', 'hungarian') == 'nearest':
+        return NearestTracker(crossed, gate=gate)
+    return HungarianTracker(crossed, gate=gate, max_age=int(cfg.get('track_max_age', 3)))
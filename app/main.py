@@ -11,9 +11,12 @@ from fastapi.templating import Jinja2Templates
 from typing import Optional
 from datetime import datetime
 from app.config import load_config
-from app.db import init_db, get_session, AutoCount, Controller, Season, Alert
+from app.db import init_db, get_session, AutoCount, Controller, Season, Alert, DB_PATH
+from app import rollups, bucketing, seasons, storage, writer, correlate as corr_engine
+from app.ingest import batch as ingest_batch, opencv_multi
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy import select, func
-import os, json
+import os, json, asyncio, queue
 group = 'min'
 
 # Basic auth for settings
@@ -27,36 +30,18 @@ init_db(cfg['db_path'])
 
 app = FastAPI(title='LightShow Visitor Tracker')
 
+@app.on_event('shutdown')
+def _flush_writer():
+    writer.stop()
+
 def get_current_season(now_utc):
-    s = get_session()
-    q = s.query(Season).order_by(Season.start_date.desc())
-    for season in q.all():
-        if season.start_date <= now_utc < season.end_date:
-            return season
-    return None
+    return seasons.resolve(now_utc)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 def await_correlate_like(sess, season, df, dt, camera):
-    from app.db import FPPStatus
-    q = select(AutoCount.timestamp, AutoCount.count_value, AutoCount.camera_name).where(AutoCount.count_type=='vehicle')
-    if season: q = q.where(AutoCount.season==season)
-    if df: q = q.where(AutoCount.timestamp >= df)
-    if dt: q = q.where(AutoCount.timestamp < dt)
-    if camera: q = q.where(AutoCount.camera_name==camera)
-    q = q.order_by(AutoCount.timestamp.asc())
-    rows = sess.execute(q).all()
-    q2 = select(FPPStatus.timestamp, FPPStatus.media).order_by(FPPStatus.timestamp.asc())
-    frows = sess.execute(q2).all()
-    res = {}
-    j=0
-    for ts, cnt, camname in rows:
-        while j+1 < len(frows) and frows[j+1][0] <= ts: j+=1
-        media = frows[j][1] if frows else '(unknown)'
-        if not media: media='(unknown)'
-        res[media] = res.get(media,0) + int(cnt)
-    return sorted(res.items(), key=lambda x:x[1], reverse=True)
+    return corr_engine.correlate(sess, 'media', season, df, dt, camera)
 
 ADMIN_USER = os.getenv("ADMIN_USERNAME", "admin")
 ADMIN_PASS = os.getenv("ADMIN_PASSWORD", "changeme")
@@ -104,6 +89,20 @@ def root():
 def health():
     return {'ok': True}
 
+@app.get('/metrics/writer')
+def writer_metrics():
+    return writer.metrics()
+
+@app.get('/metrics/vision')
+def vision_metrics():
+    # written by the camera supervisor in the scheduler process
+    return opencv_multi.read_metrics()
+
+@app.get('/vision/cameras')
+def vision_cameras():
+    # state (connecting/streaming/backoff/stalled/closed/down), fps, last-frame age, reconnects per camera
+    return opencv_multi.camera_health()
+
 def _parse_time(s):
     if not s: return None
     try:
@@ -121,13 +120,8 @@ def counts(type: str,
     df = _parse_time(date_from)
     dt = _parse_time(date_to)
     s = get_session()
-    q = select(func.strftime('%Y-%m-%d %H:%M', AutoCount.timestamp).label('minute'),
-               func.sum(AutoCount.count_value)).where(AutoCount.count_type==type)
-    if df: q = q.where(AutoCount.timestamp >= df)
-    if dt: q = q.where(AutoCount.timestamp < dt)
-    q = q.group_by('minute').order_by('minute')
-    rows = s.execute(q).all()
-    return {'type': type, 'series': [{'minute': r[0], 'count': int(r[1])} for r in rows]}
+    rows = rollups.query(s, 'min', type, date_from=df, date_to=dt)
+    return {'type': type, 'series': [{'minute': rollups.label(b, 'min', 'UTC'), 'count': t} for b, t, n in rows]}
 
 @app.get('/dashboard_old', response_class=HTMLResponse)
 def dashboard_old(
@@ -147,31 +141,11 @@ def dashboard_old(
 
     # Build series grouped by day/hour, with optional season/camera filters
     def series_for(ctype: str):
-        fmt = '%Y-%m-%d' if group == 'day' else '%Y-%m-%d %H:00'
-        q = select(
-            func.strftime(fmt, AutoCount.timestamp).label('bucket'),
-            func.sum(AutoCount.count_value)
-        ).where(AutoCount.count_type == ctype)
-
-        if season:
-            q = q.where(AutoCount.season == season)
-        if df:
-            q = q.where(AutoCount.timestamp >= df)
-        if dt:
-            q = q.where(AutoCount.timestamp < dt)
-        if camera and ctype == 'vehicle':
-            q = q.where(AutoCount.camera_name == camera)
-
-        q = q.group_by('bucket').order_by('bucket')
-        rows = s.execute(q).all()
-        labels = [r[0] for r in rows]
-        values = [int(r[1]) for r in rows]
-        total = sum(values) if values else 0
-        peak_label, peak_count = ('—', 0)
-        if values:
-            idx = max(range(len(values)), key=lambda i: values[i])
-            peak_label, peak_count = labels[idx], values[idx]
-        return {'labels': labels, 'values': values, 'total': total, 'peak': {'label': peak_label, 'count': peak_count}}
+        grain = 'day' if group == 'day' else 'hour'
+        rows = rollups.query(s, grain, ctype, season=season, date_from=df, date_to=dt,
+                             camera=camera if ctype == 'vehicle' else '')
+        ts, totals, n = bucketing.rollup_arrays(rows)
+        return bucketing.bucket_series(ts, totals, grain, rollups.TZ_NAME, samples=n)
 
     veh = series_for('vehicle')
     dev = series_for('device_seen')
@@ -196,29 +170,8 @@ def dashboard_old(
         select(Alert.timestamp, Alert.message).where(Alert.active == 1).order_by(Alert.timestamp.desc()).limit(5)
     ).all()
 
-    # Top media (reuse correlation logic)
-    def correlate_like(sess, season, df, dt, camera):
-        from app.db import FPPStatus
-        q = select(AutoCount.timestamp, AutoCount.count_value, AutoCount.camera_name).where(AutoCount.count_type == 'vehicle')
-        if season: q = q.where(AutoCount.season == season)
-        if df: q = q.where(AutoCount.timestamp >= df)
-        if dt: q = q.where(AutoCount.timestamp < dt)
-        if camera: q = q.where(AutoCount.camera_name == camera)
-        q = q.order_by(AutoCount.timestamp.asc())
-        rows = sess.execute(q).all()
-        q2 = select(FPPStatus.timestamp, FPPStatus.media).order_by(FPPStatus.timestamp.asc())
-        frows = sess.execute(q2).all()
-        res = {}
-        j = 0
-        for ts, cnt, camname in rows:
-            while j + 1 < len(frows) and frows[j + 1][0] <= ts:
-                j += 1
-            media = frows[j][1] if frows else '(unknown)'
-            if not media: media = '(unknown)'
-            res[media] = res.get(media, 0) + int(cnt)
-        return sorted(res.items(), key=lambda x: x[1], reverse=True)
-
-    top_media_pairs = correlate_like(s, season, df, dt, camera)[:10]
+    # Top media (shared correlation engine)
+    top_media_pairs = corr_engine.correlate(s, 'media', season, df, dt, camera)[:10]
     top_media = [{'label': k, 'count': v} for k, v in top_media_pairs]
 
     return templates.TemplateResponse('dashboard.html', {
@@ -243,14 +196,39 @@ async def ingest_autocount(payload: dict):
         return JSONResponse({'error':'missing fields'}, status_code=400)
     from dateutil.parser import isoparse
     ts = isoparse(payload['timestamp'])
-    s = get_session()
-    rec = AutoCount(timestamp=ts, source=payload['source'],
-                    camera_name=payload.get('camera_name'),
-                    count_type=payload['count_type'],
-                    count_value=int(payload['count_value']),
-                    meta_json=payload.get('meta_json'))
-    s.add(rec); s.commit()
-    return {'ok': True, 'id': rec.id}
+    try:
+        fut = writer.submit_count(ts, payload['source'], payload['count_type'], int(payload['count_value']),
+                                  camera_name=payload.get('camera_name'), meta_json=payload.get('meta_json'),
+                                  season=seasons.name_at(ts), timeout=0, urgent=True)
+    except queue.Full:
+        return JSONResponse({'error': 'busy'}, status_code=503, headers={'Retry-After': '1'})
+    # resolves once the writer thread has committed the batch this record landed in
+    return {'ok': True, 'id': await asyncio.wrap_future(fut)}
+
+@app.post('/ingest/autocount/batch')
+async def ingest_autocount_batch(request: Request):
+    # body: NDJSON (application/x-ndjson) or msgpack (application/msgpack) stream of AutoCountIn
+    fmt = ingest_batch.body_format(request.headers.get('content-type'))
+    if not fmt or (fmt == 'msgpack' and ingest_batch.msgpack is None):
+        return JSONResponse({'error': 'send application/x-ndjson' + (' or application/msgpack' if ingest_batch.msgpack else '')},
+                            status_code=415)
+    stream = request.stream()
+    records = ingest_batch.ndjson_records(stream) if fmt == 'ndjson' else ingest_batch.msgpack_records(stream)
+    rows, errors = [], []
+    received = 0
+    try:
+        async for rec in records:
+            row = ingest_batch.validate(rec, received, errors)
+            received += 1
+            if row is not None:
+                rows.append(row)
+            if received > ingest_batch.MAX_RECORDS:
+                return JSONResponse({'error': f'more than {ingest_batch.MAX_RECORDS} records'}, status_code=413)
+    except ValueError as e:  # corrupt msgpack stream
+        return JSONResponse({'error': f'bad body at record {received}: {type(e).__name__} {e}'.strip()}, status_code=400)
+    inserted = await run_in_threadpool(ingest_batch.insert, rows)
+    return {'ok': True, 'received': received, 'inserted': inserted, 'rejected': received - inserted,
+            'errors': errors}
 
 @app.get('/monitor', response_class=HTMLResponse)
 def monitor_page(request: Request, auth: bool = Depends(require_basic)):
@@ -306,6 +284,7 @@ def seasons_add(name: str = Form(...),
                     show_start=show_start.strip(), show_end=show_end.strip(),
                     bucket_minutes=int(bucket))
     s.add(season); s.commit()
+    seasons.invalidate()
     return RedirectResponse('/seasons', status_code=303)
 
 @app.get('/seasons/delete/{sid}')
@@ -314,13 +293,14 @@ def seasons_delete(sid: int, auth: bool = Depends(require_basic)):
     z = s.get(Season, sid)
     if z:
         s.delete(z); s.commit()
+        seasons.invalidate()
     return RedirectResponse('/seasons', status_code=303)
 
 @app.get('/storage', response_class=HTMLResponse)
 def storage_page(request: Request, auth: bool = Depends(require_basic)):
     s = get_session()
     seasons = s.query(Season).order_by(Season.start_date.desc()).all()
-    dbp = os.getenv('DB_PATH','data/tracker.db')
+    dbp = DB_PATH
     try:
         size_mb = round(os.path.getsize(dbp)/1048576, 2)
     except FileNotFoundError:
@@ -345,7 +325,10 @@ def purge(before: str = Form(''), season_name: str = Form(''), auth: bool = Depe
     deleted = 0
     for row in q.all():
         s.delete(row); deleted += 1
+    s.flush()
+    rollups.rebuild(s, season_name or None)
     s.commit()
+    corr_engine.clear_cache()
     # VACUUM
     s.execute('VACUUM')
     return RedirectResponse('/storage', status_code=303)
@@ -363,13 +346,11 @@ def export_xlsx(season: str, group: str = 'min', auth: bool = Depends(require_ba
     # Vehicles/devices sheets
     def write_sheet(ctype, name):
         ws2 = wb.add_worksheet(name)
-        fmt = '%Y-%m-%d' if group=='day' else '%Y-%m-%d %H:00'
-        q = select(func.strftime(fmt, AutoCount.timestamp).label('bucket'),
-                   func.sum(AutoCount.count_value)).where(AutoCount.count_type==ctype, AutoCount.season==season).group_by('bucket').order_by('bucket')
-        rows = s.execute(q).all()
+        grain = 'day' if group=='day' else 'hour'
+        rows = rollups.query(s, grain, ctype, season=season)
         ws2.write_row(0,0,['bucket','count'], fmt_h)
-        for i,(b,v) in enumerate(rows, start=1):
-            ws2.write(i,0,b); ws2.write(i,1,int(v))
+        for i,(b,v,n) in enumerate(rows, start=1):
+            ws2.write(i,0,rollups.label(b, grain)); ws2.write(i,1,v)
     write_sheet('vehicle','Vehicles')
     write_sheet('device_seen','Devices')
     wb.close()
@@ -379,35 +360,11 @@ def export_xlsx(season: str, group: str = 'min', auth: bool = Depends(require_ba
 
 @app.get('/correlate')
 def correlate(group: str = 'min', season: str = '', date_from: Optional[str] = None, date_to: Optional[str] = None):
-    # For each AutoCount bucket (vehicles), attach last-known FPPStatus at/before that timestamp, then group/sum.
+    # For each AutoCount bucket (vehicles), attach the FPP segment playing at that timestamp, then group/sum.
     df = _parse_time(date_from)
     dt = _parse_time(date_to)
     s = get_session()
-    # Build rows via Python (SQLite correlated subqueries are trickier without window functions)
-    q = select(AutoCount.timestamp, AutoCount.count_value).where(AutoCount.count_type=='vehicle')
-    if season:
-        q = q.where(AutoCount.season==season)
-    if df: q = q.where(AutoCount.timestamp >= df)
-    if dt: q = q.where(AutoCount.timestamp < dt)
-    q = q.order_by(AutoCount.timestamp.asc())
-    rows = s.execute(q).all()
-    # Preload FPP statuses
-    from app.db import FPPStatus
-    q2 = select(FPPStatus.timestamp, FPPStatus.playlist, FPPStatus.media).order_by(FPPStatus.timestamp.asc())
-    frows = s.execute(q2).all()
-    # Walk with pointer
-    res = {}
-    j = 0
-    for ts, cnt in rows:
-        while j+1 < len(frows) and frows[j+1][0] <= ts:
-            j += 1
-        label = None
-        if frows:
-            label = frows[j][1] if group=='playlist' else frows[j][2]
-        if not label: label = '(unknown)'
-        res[label] = res.get(label, 0) + int(cnt)
-    # Return as sorted list
-    ranked = sorted(([k,v] for k,v in res.items()), key=lambda x: x[1], reverse=True)
+    ranked = corr_engine.correlate(s, 'playlist' if group == 'playlist' else 'media', season, df, dt)
     return {'group': group, 'season': season, 'series': [{'label': k, 'count': v} for k,v in ranked]}
 
 from app.util_env import set_env_vars
@@ -496,7 +453,7 @@ def _default_window_minutes():
         return 60
 
 # --- GlowSync: clean /dashboard handler (last 60 minutes, per-minute) ---
-import os, sqlite3, datetime as dt, pytz
+import os, datetime as dt, pytz
 from fastapi import Request, Depends
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
@@ -504,9 +461,6 @@ from fastapi.templating import Jinja2Templates
 if 'templates' not in globals():
     templates = Jinja2Templates(directory="templates")
 
-def _gs_db_path() -> str:
-    return os.path.expanduser("~/glowsync/data/tracker.db")
-
 def _gs_last_window_utc(tzname: str, minutes: int = None):
     minutes = int(os.getenv('DEFAULT_WINDOW_MIN','60') or 60) if minutes is None else minutes
     tz = pytz.timezone(tzname or 'America/Chicago')
@@ -523,53 +477,18 @@ def dashboard(request: Request, auth: bool = Depends(require_basic)):
 
     # Time window (last N minutes, default 60)
     df_utc, to_utc, _ = _gs_last_window_utc(tzname)
-    df_iso, to_iso = df_utc.isoformat(), to_utc.isoformat()
-
-    # Query DB
-    dbp = _gs_db_path()
-    con = sqlite3.connect(dbp)
-    cur = con.cursor()
-    # Ensure table exists (idempotent)
-    cur.execute("""
-      CREATE TABLE IF NOT EXISTS AutoCount (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        count_type   TEXT NOT NULL,
-        source       TEXT NOT NULL,
-        timestamp    TEXT NOT NULL,
-        count_value  INTEGER NOT NULL,
-        camera_name  TEXT,
-        season       TEXT
-      )
-    """)
-
-    # Auto baseline if requested: 10th percentile of last 7 days
+
+    # Query DB (auto_counts via app.storage, epoch-second keys)
+    s = get_session()
     baseline = baseline_manual
     if baseline_mode == 'auto':
-        start7 = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=7)).isoformat()
-        cur.execute("""
-          SELECT count_value FROM AutoCount
-          WHERE count_type='device_seen'
-            AND source='baldrick'
-            AND timestamp >= ?
-          ORDER BY count_value ASC
-        """, (start7,))
-        vals = [r[0] for r in cur.fetchall()]
-        if vals:
-            idx = max(0, int(len(vals)*0.10)-1)
-            baseline = int(vals[idx])
-
-    # Pull last-window baldrick rows
-    cur.execute("""
-      SELECT timestamp, count_value
-      FROM AutoCount
-      WHERE count_type='device_seen'
-        AND source='baldrick'
-        AND timestamp >= ?
-        AND timestamp <  ?
-      ORDER BY timestamp ASC
-    """, (df_iso, to_iso))
-    rows = cur.fetchall()
-    con.close()
+        # Auto baseline: 10th percentile of last 7 days
+        start7 = dt.datetime.now(dt.timezone.utc) - dt.timedelta(days=7)
+        p10 = storage.low_percentile(s, 'device_seen', 0.10, t0=start7, source='baldrick')
+        if p10 is not None:
+            baseline = int(p10)
+    rows = [(dt.datetime.fromtimestamp(ts, dt.timezone.utc).isoformat(), v)
+            for ts, v in storage.series(s, 'device_seen', df_utc, to_utc, source='baldrick')]
 
     # Build series (Adjusted never below 0)
     labels, raw, adj = [], [], []
@@ -0,0 +1,147 @@
+"""Minute/hour/day rollups of auto_counts.
+
+Writers call add()/apply() (or record()) in the same session they insert
+AutoCount rows with, so the rollups commit atomically with the raw data.
+Hour and day buckets are aligned to the local TIMEZONE, so after changing the
+timezone run:  python -m app.rollups --rebuild
+"""
+import os
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import pytz
+from sqlalchemy import select, delete, func, type_coerce, Integer
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.db import AutoCount, AutoCountRollup
+
+GRAINS = ('min', 'hour', 'day')
+TZ_NAME = os.getenv('TIMEZONE', 'America/Chicago')
+
+
+def to_epoch(ts) -> int:
+    """datetime (naive = UTC, as stored by SQLite) or number -> int epoch seconds."""
+    if ts is None:
+        return None
+    if isinstance(ts, (int, float)):
+        return int(ts)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp())
+
+
+@lru_cache(maxsize=4096)
+def _day_start(tzname: str, y: int, m: int, d: int) -> int:
+    tz = pytz.timezone(tzname)
+    return int(tz.localize(datetime(y, m, d)).timestamp())
+
+
+def bucket_start(ts: int, grain: str, tzname: str = None) -> int:
+    """Start of the local-time bucket containing epoch ts, as epoch seconds."""
+    if grain == 'min':
+        return ts - ts % 60
+    loc = datetime.fromtimestamp(ts, pytz.timezone(tzname or TZ_NAME))
+    if grain == 'hour':
+        return ts - (loc.minute * 60 + loc.second)
+    return _day_start(tzname or TZ_NAME, loc.year, loc.month, loc.day)
+
+
+def add(pending: dict, ts, count_type: str, value: int, camera_name=None, season=None, samples: int = 1):
+    """Accumulate a delta for every grain into pending (flushed by apply())."""
+    ts = to_epoch(ts)
+    minute = ts - ts % 60
+    for grain in GRAINS:
+        key = (grain, bucket_start(minute, grain), count_type, camera_name or '', season or '')
+        tot, n = pending.get(key, (0, 0))
+        pending[key] = (tot + int(value), n + samples)
+    return pending
+
+
+def apply(sess, pending: dict) -> int:
+    """Upsert accumulated deltas in one executemany. Caller commits."""
+    if not pending:
+        return 0
+    stmt = sqlite_insert(AutoCountRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['grain', 'count_type', 'season', 'camera_name', 'bucket_ts'],
+        set_={'total': AutoCountRollup.total + stmt.excluded.total,
+              'samples': AutoCountRollup.samples + stmt.excluded.samples})
+    params = [{'grain': g, 'bucket_ts': b, 'count_type': ct, 'camera_name': cam, 'season': sea,
+               'total': tot, 'samples': n}
+              for (g, b, ct, cam, sea), (tot, n) in pending.items()]
+    sess.execute(stmt, params)
+    pending.clear()
+    return len(params)
+
+
+def record(sess, ts, count_type: str, value: int, camera_name=None, season=None, samples: int = 1):
+    return apply(sess, add({}, ts, count_type, value, camera_name, season, samples))
+
+
+def rebuild(sess, season: str = None) -> dict:
+    """Recompute rollups from auto_counts (all seasons, or just one). Caller commits."""
+    dq = delete(AutoCountRollup)
+    if season is not None:
+        dq = dq.where(AutoCountRollup.season == season)
+    sess.execute(dq)
+    # SQLite does the minute grouping; hour/day are derived from those rows in Python
+    minute = (type_coerce(AutoCount.timestamp, Integer) // 60 * 60).label('minute')
+    q = select(minute, AutoCount.count_type, AutoCount.camera_name, AutoCount.season,
+               func.sum(AutoCount.count_value), func.count()) \
+        .group_by('minute', AutoCount.count_type, AutoCount.camera_name, AutoCount.season)
+    if season is not None:
+        q = q.where(AutoCount.season == season)
+    pending = {}
+    n_rows = 0
+    for ts, ct, cam, sea, tot, n in sess.execute(q):
+        if ts is None:
+            continue
+        add(pending, int(ts), ct, int(tot or 0), cam, sea, int(n))
+        n_rows += 1
+    written = apply(sess, pending)
+    return {'minutes': n_rows, 'rollups': written}
+
+
+def query(sess, grain: str, count_type: str, season: str = '', camera: str = '',
+          date_from=None, date_to=None):
+    """[(bucket_ts, total, samples)] ordered by bucket, summed across cameras/seasons
+    unless filtered."""
+    R = AutoCountRollup
+    q = select(R.bucket_ts, func.sum(R.total), func.sum(R.samples)) \
+        .where(R.grain == grain, R.count_type == count_type)
+    if season:
+        q = q.where(R.season == season)
+    if camera:
+        q = q.where(R.camera_name == camera)
+    if date_from:
+        q = q.where(R.bucket_ts >= to_epoch(date_from))
+    if date_to:
+        q = q.where(R.bucket_ts < to_epoch(date_to))
+    q = q.group_by(R.bucket_ts).order_by(R.bucket_ts)
+    return [(int(b), int(t or 0), int(n or 0)) for b, t, n in sess.execute(q).all()]
+
+
+def label(bucket_ts: int, grain: str, tzname: str = None) -> str:
+    loc = datetime.fromtimestamp(bucket_ts, pytz.timezone(tzname or TZ_NAME))
+    if grain == 'min':
+        return loc.strftime('%Y-%m-%d %H:%M')
+    if grain == 'day':
+        return loc.strftime('%Y-%m-%d')
+    return loc.strftime('%Y-%m-%d %H:00')
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db import get_session, init_db
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rebuild", action="store_true", help="Backfill/rebuild rollups from auto_counts")
+    ap.add_argument("--season", default=None, help="Only rebuild this season")
+    args = ap.parse_args()
+    if not args.rebuild:
+        ap.print_help()
+        raise SystemExit(2)
+    init_db()
+    s = get_session()
+    res = rebuild(s, args.season)
+    s.commit()
+    print(f"[rollups] rebuilt → minutes={res['minutes']} rollups={res['rollups']}")
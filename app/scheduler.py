@@ -1,11 +1,14 @@
+import os, signal, sys
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
 from app.config import load_config
-from app.db import init_db
+from app.db import init_db, maintenance
+from app import writer
 from app.ingest.baldrick_csv import run as run_baldrick
 # from app.ingest.opencv_counter import run as run_counter
 from app.ingest.opencv_multi import run as run_multi
 from app.ingest.monitor_controllers import run as run_monitor, record_fpp_status
+from app.ingest import fpp_events
 
 cfg = load_config()
 init_db(cfg['db_path'])
@@ -18,6 +21,12 @@ def job_baldrick():
     except Exception as e:
         print('[baldrick] error', e)
 
+def job_db_maintenance():
+    try:
+        print('[db] maintenance', maintenance())
+    except Exception as e:
+        print('[db] maintenance error', e)
+
 def job_counter():
     pass  # single-camera loop not used when multi is configured
     print('[opencv] running stream loop... (Ctrl+C to stop if run manually)')
@@ -32,10 +41,20 @@ if __name__ == '__main__':
     sched.add_job(job_baldrick, CronTrigger.from_crontab(cfg['baldrick_poll_cron']), id='baldrick')
     sched.add_job(lambda: (print('[monitor] checking controllers...'), run_monitor()), 'cron', minute='*', id='monitor')
     sched.add_job(lambda: (print('[fpp] sampling now playing...'), record_fpp_status() or True) and (print('[fpp] checking alert...'), __import__('app.ingest.monitor_controllers').ingest.monitor_controllers.check_fpp_alert()), 'interval', seconds=15, id='fpp_status')
+    # WAL checkpoint + PRAGMA optimize (keeps the -wal file from growing on the SD card)
+    sched.add_job(job_db_maintenance, 'interval', minutes=int(os.getenv('DB_MAINTENANCE_MIN', '15')), id='db_maintenance')
     # Counter: run as "daemon" every boot via systemd -> separate service.
     # Here we leave it off, since it's a long-running loop.
     # also start multi-camera loop in foreground thread
     import threading
     threading.Thread(target=run_multi, daemon=True).start()
+    # FPP transitions pushed over MQTT when FPP_MQTT_URL is set; the 15s job keeps polling otherwise
+    fpp_events.start()
+    # systemd stops us with SIGTERM: exit normally so atexit drains the write-behind queue
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
     print('Scheduler starting...')
-    sched.start()
+    try:
+        sched.start()
+    finally:
+        fpp_events.stop()
+        writer.stop()
@@ -0,0 +1,108 @@
+"""Season resolution shared by the ingesters and views: which season a timestamp is in.
+
+All seasons are loaded once and flattened into non-overlapping intervals
+(where seasons overlap, the one that started last wins, as
+get_current_season always did), so resolving a timestamp is a bisect over
+the interval starts instead of a Season query, or a scan of every season,
+per call. That makes per-row lookups cheap enough for backfills: every
+bucket gets the season it falls in, not the one that is current now.
+
+/seasons/add and /seasons/delete call invalidate(). Other processes (the
+camera workers, the scheduler) reload when their copy is older than
+SEASONS_TTL_S, so a new season or changed show hours apply without a
+restart. Season dates are naive UTC in SQLite; naive timestamps are taken
+as UTC here too.
+"""
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from app.db import get_session, Season
+
+TTL_S = float(os.getenv('SEASONS_TTL_S', '60'))
+
+SeasonSpan = namedtuple('SeasonSpan', 'id name start end show_start show_end bucket_minutes')
+# outside every season: counted all day, 1-minute buckets, season None
+NO_SEASON = SeasonSpan(None, None, None, None, '00:00', '23:59', 1)
+
+_lock = threading.Lock()
+_index = None      # (interval starts as epoch seconds, SeasonSpan or None per interval)
+_loaded = 0.0      # monotonic time of the last load
+
+
+def _epoch(ts) -> float:
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def build(spans) -> tuple:
+    """Interval index over SeasonSpans: (starts, winner per interval)."""
+    spans = sorted(spans, key=lambda z: _epoch(z.start))
+    edges = sorted({_epoch(z.start) for z in spans} | {_epoch(z.end) for z in spans})
+    starts, owners = [], []
+    for e in edges:
+        owner = None
+        for z in spans:  # latest start containing e wins; spans are few
+            if _epoch(z.start) <= e < _epoch(z.end):
+                owner = z
+        if owners and owners[-1] is owner:
+            continue
+        starts.append(e)
+        owners.append(owner)
+    return starts, owners
+
+
+def _load():
+    s = get_session()
+    try:
+        rows = s.query(Season).all()
+        spans = [SeasonSpan(z.id, z.name, z.start_date, z.end_date, z.show_start or '00:00',
+                            z.show_end or '23:59', z.bucket_minutes or 1) for z in rows]
+    finally:
+        s.close()
+    return build(spans)
+
+
+def _current():
+    global _index, _loaded
+    index = _index
+    if index is None or time.monotonic() - _loaded > TTL_S:
+        with _lock:
+            if _index is None or time.monotonic() - _loaded > TTL_S:
+                _index, _loaded = _load(), time.monotonic()
+            index = _index
+    return index
+
+
+def invalidate():
+    """Drop the cached seasons; the next lookup reloads them."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def resolve(ts=None, default=None):
+    """SeasonSpan containing ts (datetime or epoch seconds; default now), else default."""
+    starts, owners = _current()
+    e = time.time() if ts is None else _epoch(ts)
+    i = bisect_right(starts, e) - 1
+    if i < 0 or owners[i] is None:
+        return default
+    return owners[i]
+
+
+def name_at(ts):
+    """Season name for a timestamp (None outside every season)."""
+    z = resolve(ts)
+    return z.name if z else None
+
+
+def current(now: datetime = None):
+    """Season in effect now, NO_SEASON outside every season."""
+    return resolve(now, NO_SEASON)
@@ -0,0 +1,136 @@
+"""Run-length-encoded FPP playback history.
+
+Instead of one fpp_status row per 15s sample, fpp_segments keeps one row per
+run of identical (playlist, media, state): the sampler extends the open
+segment's end_ts in place and only inserts when something changes (or after
+a gap in sampling). "What was playing at t" is the last segment started at
+or before t, which is the same answer the per-sample as-of join gave.
+
+Compact existing fpp_status history with:  python -m app.segments --migrate
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete, func
+
+from app.db import FPPSegment, FPPStatus
+
+# A sampling gap longer than this closes the open segment even if nothing changed
+MAX_GAP = timedelta(seconds=120)
+
+
+def _utc_naive(ts: datetime) -> datetime:
+    # SQLite hands DateTime back naive; keep everything naive UTC so comparisons work
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _key(state, playlist, media):
+    return (state or None, playlist or None, media or None)
+
+
+def latest(sess):
+    # by start, not id: migrate() can insert segments older than the live one
+    return sess.execute(select(FPPSegment).order_by(FPPSegment.start_ts.desc(), FPPSegment.id.desc())
+                        .limit(1)).scalar_one_or_none()
+
+
+def record(sess, ts: datetime, details: dict, open_seg=None):
+    """Extend the open segment or start a new one for a sample. Caller commits."""
+    ts = _utc_naive(ts)
+    seg = open_seg if open_seg is not None else latest(sess)
+    key = _key(details.get('state'), details.get('playlist'), details.get('media'))
+    if seg is not None and _key(seg.state, seg.playlist, seg.media) == key \
+            and seg.end_ts <= ts and ts - seg.end_ts <= MAX_GAP:
+        seg.end_ts = ts
+        seg.samples = (seg.samples or 0) + 1
+        return seg
+    return _start(sess, ts, details, key)
+
+
+def _start(sess, ts, details, key):
+    seg = FPPSegment(start_ts=ts, end_ts=ts, hostname=details.get('hostname'),
+                     version=details.get('version'), state=key[0], playlist=key[1], media=key[2],
+                     samples=1)
+    sess.add(seg)
+    return seg
+
+
+def at(sess, ts: datetime):
+    """Segment playing at ts (last one started at or before it), or None."""
+    return sess.execute(
+        select(FPPSegment).where(FPPSegment.start_ts <= _utc_naive(ts))
+        .order_by(FPPSegment.start_ts.desc()).limit(1)
+    ).scalar_one_or_none()
+
+
+def overlapping(sess, t0: datetime, t1: datetime):
+    """Segments intersecting [t0, t1], oldest first."""
+    return sess.execute(
+        select(FPPSegment).where(FPPSegment.start_ts <= _utc_naive(t1), FPPSegment.end_ts >= _utc_naive(t0))
+        .order_by(FPPSegment.start_ts.asc())
+    ).scalars().all()
+
+
+def _fold(sess, rows, batch):
+    """Fold (timestamp, hostname, version, state, playlist, media) rows, oldest
+    first, into a fresh chain of segments. Returns (samples, last timestamp)."""
+    seg, n, last = None, 0, None
+    for ts, host, ver, state, playlist, media in rows:
+        d = {'hostname': host, 'version': ver, 'state': state, 'playlist': playlist, 'media': media}
+        seg = record(sess, ts, d, seg) if seg is not None else _start(sess, _utc_naive(ts), d, _key(state, playlist, media))
+        n, last = n + 1, ts
+        if n % batch == 0:
+            sess.flush()
+    sess.flush()
+    return n, last
+
+
+def migrate(sess, keep_samples: bool = False, batch: int = 5000) -> dict:
+    """Fold fpp_status samples into fpp_segments, then drop the folded ones
+    unless keep_samples.
+
+    Only samples outside the span the segments already cover are folded:
+    older than the first segment (history from before the upgrade, when the
+    sampler has already started a segment) or newer than the last one. Samples
+    inside that span are left in place (counted as kept). Safe to re-run.
+    Caller commits."""
+    first = sess.execute(select(func.min(FPPSegment.start_ts))).scalar()
+    last_end = sess.execute(select(func.max(FPPSegment.end_ts))).scalar()
+    before = sess.execute(select(func.count(FPPSegment.id))).scalar()
+    cols = (FPPStatus.timestamp, FPPStatus.hostname, FPPStatus.version,
+            FPPStatus.state, FPPStatus.playlist, FPPStatus.media)
+    ranges = [FPPStatus.timestamp.isnot(None)] if first is None else \
+        [FPPStatus.timestamp < first, FPPStatus.timestamp > last_end]
+    n = 0
+    for cond in ranges:
+        rows = sess.execute(select(*cols).where(cond).order_by(FPPStatus.timestamp.asc())).all()
+        folded, last = _fold(sess, rows, batch)
+        n += folded
+        if folded and not keep_samples:
+            # exactly what was folded: same range, nothing sampled after the read
+            sess.execute(delete(FPPStatus).where(cond, FPPStatus.timestamp <= last))
+    after = sess.execute(select(func.count(FPPSegment.id))).scalar()
+    kept = sess.execute(select(func.count(FPPStatus.id))).scalar()
+    return {'samples': n, 'segments': after - before, 'kept': kept}
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db import get_session, init_db
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--migrate", action="store_true", help="Compact fpp_status history into fpp_segments")
+    ap.add_argument("--keep-samples", action="store_true", help="Leave fpp_status rows in place")
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return space")
+    args = ap.parse_args()
+    if not args.migrate:
+        ap.print_help()
+        raise SystemExit(2)
+    init_db()
+    s = get_session()
+    res = migrate(s, keep_samples=args.keep_samples)
+    s.commit()
+    if args.vacuum:
+        with s.bind.connect() as con:
+            con.exec_driver_sql('VACUUM')
+    print(f"[segments] migrated → samples={res['samples']} segments={res['segments']} kept={res['kept']}")
@@ -0,0 +1,107 @@
+"""Show-hours calendar: when the show opens and closes, as UTC instants.
+
+Each local day gets one window from the show_start/show_end of the season in
+effect that day (seasons.current, NO_SEASON outside every season). A window
+whose end is not after its start runs past midnight into the next day, and
+both ends are localized on their own calendar day, so the window is right
+across DST changes (a 17:00-00:30 show is 8.5 hours on a normal night, the
+clocks' change included on the night it happens). Windows that touch
+(show_end == next day's show_start, e.g. an all-day 00:00-00:00) merge.
+
+ShowClock is what the camera loops use instead of calling to_local() and
+in_show_hours() on every frame: it keeps whether the show is open and until
+when (as a time.monotonic() deadline), so the per-frame check is one float
+comparison, and the calendar is only consulted at the next open/close (or
+after seasons.TTL_S, so season edits still apply). Outside show hours
+seconds_to_open() tells a worker how long it can sleep.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from datetime import time as dtime
+from functools import lru_cache
+
+import pytz
+
+from app import seasons
+
+LOOKAHEAD_DAYS = 14  # beyond this with no window the show is treated as closed until then
+
+
+def _hhmm(s):
+    h, m = map(int, s.split(':'))
+    return dtime(h, m)
+
+
+def _instant(tz, day, hhmm) -> float:
+    # is_dst=False: a time skipped by spring-forward lands just after the gap, an ambiguous one on standard time
+    return tz.normalize(tz.localize(datetime.combine(day, _hhmm(hhmm)), is_dst=False)).timestamp()
+
+
+@lru_cache(maxsize=64)
+def _window(tzname, day, show_start, show_end):
+    tz = pytz.timezone(tzname)
+    end_day = day + timedelta(days=1) if _hhmm(show_end) <= _hhmm(show_start) else day
+    return _instant(tz, day, show_start), _instant(tz, end_day, show_end)
+
+
+def window(day, tzname):
+    """(open, close) epoch seconds of the show that starts on local date day."""
+    tz = pytz.timezone(tzname)
+    noon = tz.localize(datetime.combine(day, dtime(12, 0)))
+    z = seasons.current(noon)
+    return _window(tzname, day, z.show_start, z.show_end)
+
+
+def state_at(ts: float, tzname: str):
+    """(open?, epoch seconds until which that holds) at epoch ts."""
+    tz = pytz.timezone(tzname)
+    day = datetime.fromtimestamp(ts, timezone.utc).astimezone(tz).date() - timedelta(days=1)
+    for i in range(LOOKAHEAD_DAYS + 2):
+        o, c = window(day + timedelta(days=i), tzname)
+        if ts < o:
+            return False, o
+        if ts < c:
+            # merge windows that touch the next day's
+            for j in range(i + 1, i + 1 + LOOKAHEAD_DAYS):
+                o2, c2 = window(day + timedelta(days=j), tzname)
+                if o2 > c:
+                    break
+                c = max(c, c2)
+            return True, c
+    return False, ts + LOOKAHEAD_DAYS * 86400
+
+
+def is_open_at(ts, tzname: str) -> bool:
+    """Show hours check for a datetime or epoch seconds (ingest paths, not per frame)."""
+    if isinstance(ts, datetime):
+        ts = (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+    return state_at(ts, tzname)[0]
+
+
+class ShowClock:
+    """Open/closed for one loop; recomputed only at the next transition."""
+
+    def __init__(self, tzname: str):
+        self.tzname = tzname
+        self.season = seasons.NO_SEASON
+        self._open = False
+        self._until = 0.0    # time.monotonic() deadline of the current state
+        self.until = 0.0     # same, epoch seconds (for logs/metrics)
+
+    def _refresh(self):
+        now, mono = time.time(), time.monotonic()
+        self._open, self.until = state_at(now, self.tzname)
+        self.season = seasons.current(now)
+        # re-check at the transition, or sooner if seasons may have been edited
+        self._until = mono + min(self.until - now, seasons.TTL_S)
+
+    def is_open(self) -> bool:
+        if time.monotonic() >= self._until:
+            self._refresh()
+        return self._open
+
+    def seconds_to_open(self) -> float:
+        """0 while open, else seconds until the next open (or the next re-check)."""
+        if self.is_open():
+            return 0.0
+        return max(0.0, self._until - time.monotonic())
@@ -0,0 +1,184 @@
+"""Count storage: the auto_counts table in DB_PATH, and nothing else.
+
+Timestamps are INTEGER UTC epoch seconds (app.db.EpochSeconds). ORM code keeps
+working with datetimes; readers that only need numbers (charts, baselines)
+use the helpers here, which select the raw epochs and skip datetime building.
+
+Older installs also have a raw-sqlite "AutoCount" table (ISO text timestamps,
+written by the old scripts/sync_baldrick.py and read by /dashboard). Fold it
+into auto_counts once with:  python -m app.storage --migrate
+"""
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+from sqlalchemy import select, insert, func, type_coerce, Integer
+
+from app.db import AutoCount, IngestState, DB_PATH
+from app import rollups
+
+LEGACY_DB_PATH = os.path.expanduser('~/glowsync/data/tracker.db')
+LEGACY_TABLE = 'AutoCount'
+
+# auto_counts.timestamp as plain integers (no datetime conversion on the way out)
+EPOCH = type_coerce(AutoCount.timestamp, Integer)
+
+
+def add_count(sess, ts, source: str, count_type: str, value: int, camera_name=None, season=None,
+              meta_json=None, pending: dict = None) -> AutoCount:
+    """Insert one auto_counts row plus its rollup deltas, applied right away or
+    accumulated into pending for a later rollups.apply(). Caller commits."""
+    rec = AutoCount(timestamp=ts, source=source, camera_name=camera_name, count_type=count_type,
+                    count_value=int(value), season=season, meta_json=meta_json)
+    sess.add(rec)
+    if pending is None:
+        rollups.record(sess, ts, count_type, int(value), camera_name, season)
+    else:
+        rollups.add(pending, ts, count_type, int(value), camera_name, season)
+    return rec
+
+
+def insert_counts(sess, records) -> int:
+    """Bulk-insert count dicts (timestamp, source, count_type, count_value and
+    optional camera_name/season/meta_json) in one executemany, plus rollups.
+    Caller commits."""
+    if not records:
+        return 0
+    pending = {}
+    for r in records:
+        rollups.add(pending, r['timestamp'], r['count_type'], int(r['count_value']),
+                    r.get('camera_name'), r.get('season'))
+    sess.execute(insert(AutoCount), records)
+    rollups.apply(sess, pending)
+    return len(records)
+
+
+def _filtered(q, count_type, source, t0, t1):
+    q = q.where(AutoCount.count_type == count_type)
+    if source:
+        q = q.where(AutoCount.source == source)
+    if t0 is not None:
+        q = q.where(AutoCount.timestamp >= t0)
+    if t1 is not None:
+        q = q.where(AutoCount.timestamp < t1)
+    return q
+
+
+def series(sess, count_type: str, t0=None, t1=None, source: str = None):
+    """[(epoch, count_value)] in [t0, t1), oldest first. t0/t1 are datetimes or epochs."""
+    q = _filtered(select(EPOCH, AutoCount.count_value), count_type, source, t0, t1)
+    return [(int(ts), int(v)) for ts, v in sess.execute(q.order_by(AutoCount.timestamp.asc())).all()]
+
+
+def low_percentile(sess, count_type: str, pct: float, t0=None, source: str = None):
+    """count_value at the pct-th percentile (lower rank) since t0, or None if no rows."""
+    n = sess.execute(_filtered(select(func.count()), count_type, source, t0, None)).scalar()
+    if not n:
+        return None
+    q = _filtered(select(AutoCount.count_value), count_type, source, t0, None)
+    return sess.execute(q.order_by(AutoCount.count_value.asc())
+                        .offset(max(0, int(n * pct) - 1)).limit(1)).scalar()
+
+
+def _legacy_epoch(ts) -> int:
+    dt = datetime.fromisoformat(str(ts).replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def _legacy_rows(con, where: str, cols: str, batch: int):
+    # keyset pages, so no read transaction stays open while the session writes
+    # (the legacy table usually lives in the same file)
+    last = 0
+    while True:
+        rows = con.execute(f"SELECT id, {cols} FROM {LEGACY_TABLE} WHERE id > ? AND ({where}) "
+                           "ORDER BY id LIMIT ?", (last, batch)).fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        for r in rows:
+            yield r[1:]
+
+
+def merge_legacy(sess, path: str = None, batch: int = 5000) -> dict:
+    """Copy rows of the legacy AutoCount table into auto_counts.
+
+    Baldrick rows go through the regular bulk upsert (minute buckets, latest
+    value wins), everything else is inserted as-is; rollups follow along.
+    Caller commits, then calls drop_legacy().
+    """
+    from app.ingest import baldrick
+    path = path or LEGACY_DB_PATH
+    if not os.path.exists(path):
+        return {'baldrick': 0, 'other': 0, 'missing': True}
+    con = sqlite3.connect(path)
+    try:
+        if not con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (LEGACY_TABLE,)).fetchone():
+            return {'baldrick': 0, 'other': 0, 'missing': True}
+        is_baldrick = "source='baldrick' AND count_type='device_seen'"
+        rows = _legacy_rows(con, is_baldrick, 'timestamp, count_value', batch)
+        res = baldrick.ingest_lines(sess, (f'{_legacy_epoch(ts)},{v}' for ts, v in rows))
+
+        other = 0
+        pending = {}
+        rows = _legacy_rows(con, f'NOT ({is_baldrick})', 'timestamp, source, camera_name, count_type, count_value, season', batch)
+        for ts, src, cam, ct, v, sea in rows:
+            add_count(sess, _legacy_epoch(ts), src, ct, v, cam, sea, pending=pending)
+            other += 1
+            if other % batch == 0:
+                sess.flush()
+                rollups.apply(sess, pending)
+        sess.flush()
+        rollups.apply(sess, pending)
+    finally:
+        con.close()
+
+    # the old sync kept its own watermark; the shared 'baldrick' state takes over
+    st = baldrick._state_row(sess, 'baldrick')
+    marks = [st.last_epoch, res['last_epoch']]
+    old = sess.execute(select(IngestState).where(IngestState.source == 'baldrick_sync')).scalar_one_or_none()
+    if old is not None:
+        marks.append(old.last_epoch)
+        sess.delete(old)
+    st.last_epoch = max([m for m in marks if m is not None], default=None)
+    return {'baldrick': res['scanned'], 'buckets': res['buckets'], 'other': other, 'missing': False}
+
+
+def drop_legacy(path: str = None):
+    """DROP the legacy table (and its indexes) once its rows are merged and committed."""
+    path = path or LEGACY_DB_PATH
+    if not os.path.exists(path):
+        return
+    con = sqlite3.connect(path)
+    try:
+        con.execute(f"DROP TABLE IF EXISTS {LEGACY_TABLE}")
+        if con.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='ingest_state'").fetchone():
+            con.execute("DELETE FROM ingest_state WHERE source='baldrick_sync'")
+        con.commit()
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.db import get_session, init_db
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--migrate", action="store_true", help="Merge the legacy AutoCount table into auto_counts")
+    ap.add_argument("--legacy-db", default=LEGACY_DB_PATH, help="DB file holding the legacy table")
+    ap.add_argument("--keep-legacy", action="store_true", help="Leave the legacy table in place")
+    args = ap.parse_args()
+    if not args.migrate:
+        ap.print_help()
+        raise SystemExit(2)
+    init_db()
+    s = get_session()
+    res = merge_legacy(s, args.legacy_db)
+    s.commit()
+    if res['missing']:
+        print(f"[storage] no {LEGACY_TABLE} table in {args.legacy_db}; nothing to merge")
+        raise SystemExit(0)
+    if not args.keep_legacy:
+        drop_legacy(args.legacy_db)
+    print(f"[storage] merged → baldrick={res['baldrick']} (buckets={res['buckets']}) other={res['other']} "
+          f"into {DB_PATH}{'' if args.keep_legacy else '; legacy table dropped'}")
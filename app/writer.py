@@ -0,0 +1,212 @@
+"""In-process write-behind queue for the small, frequent ingest writes.
+
+Camera bucket flushes, the 15s FPP sampler and /ingest/autocount used to
+commit one tiny transaction each, all fighting for the SQLite write lock.
+They now submit() to a bounded queue instead. A single writer thread drains
+it every WRITER_FLUSH_MS (or as soon as WRITER_BATCH_MAX items are waiting)
+and applies the whole batch, including rollups, in one transaction.
+
+- backpressure: submit() blocks while the queue is full and raises queue.Full
+  after WRITER_PUT_TIMEOUT_S
+- durability: submit() returns a Future resolved after the commit, for
+  callers that need to wait (the HTTP endpoint); urgent=True skips the rest
+  of the flush window and commits what is already queued (group commit)
+- shutdown: stop() (also registered with atexit) drains and commits what's left
+- metrics(): queue depth, batch sizes and commit latency
+
+Bulk jobs (Baldrick polls, migrations) keep their own single transaction.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from app.db import get_session
+from app import rollups, segments, storage
+
+QUEUE_MAX = int(os.getenv('WRITER_QUEUE_MAX', '10000'))
+FLUSH_MS = int(os.getenv('WRITER_FLUSH_MS', '500'))
+BATCH_MAX = int(os.getenv('WRITER_BATCH_MAX', '2000'))
+PUT_TIMEOUT_S = float(os.getenv('WRITER_PUT_TIMEOUT_S', '5'))
+
+_STOP = object()
+
+
+def _count(sess, ctx, kw):
+    return storage.add_count(sess, pending=ctx['pending'], **kw)
+
+
+def _fpp(sess, ctx, kw):
+    # samples in one batch share the open segment instead of re-querying it
+    ctx['open_seg'] = segments.record(sess, kw['ts'], kw['details'], ctx.get('open_seg'))
+    return ctx['open_seg']
+
+
+HANDLERS = {'count': _count, 'fpp': _fpp}
+
+
+class WriteBehind:
+    def __init__(self, maxsize=QUEUE_MAX, flush_ms=FLUSH_MS, batch_max=BATCH_MAX, put_timeout=PUT_TIMEOUT_S):
+        self.q = queue.Queue(maxsize=maxsize)
+        self.flush_s = flush_ms / 1000.0
+        self.batch_max = batch_max
+        self.put_timeout = put_timeout
+        self._thread = None
+        self._lock = threading.Lock()
+        self._registered = False
+        self._lat = deque(maxlen=512)
+        self.stats = {'submitted': 0, 'written': 0, 'failed': 0, 'rejected': 0, 'batches': 0,
+                      'max_depth': 0, 'max_batch': 0, 'last_commit_ms': 0.0, 'max_commit_ms': 0.0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+                if not self._registered:
+                    atexit.register(self.stop)
+                    self._registered = True
+        return self
+
+    def submit(self, kind: str, timeout: float = None, urgent: bool = False, **kw) -> Future:
+        """Queue one write; blocks while full (backpressure), queue.Full after
+        timeout (default put_timeout; 0 = fail fast). urgent (someone awaits the
+        Future) commits the current batch without waiting out the flush window."""
+        if kind not in HANDLERS:
+            raise ValueError(f'unknown write kind {kind!r}')
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        fut = Future()
+        try:
+            self.q.put((kind, kw, fut, urgent), timeout=self.put_timeout if timeout is None else timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats['rejected'] += 1
+            raise
+        with self._lock:
+            self.stats['submitted'] += 1
+            self.stats['max_depth'] = max(self.stats['max_depth'], self.q.qsize())
+        return fut
+
+    def flush(self, timeout: float = None) -> bool:
+        """Block until everything submitted so far is committed (or failed)."""
+        if self._thread is None or not self._thread.is_alive():
+            return self.q.empty()
+        marker = Future()
+        self.q.put((None, None, marker, True))
+        try:
+            marker.result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def stop(self, timeout: float = 30):
+        """Drain and commit what's queued, then end the writer thread."""
+        t = self._thread
+        if t is None or not t.is_alive():
+            return
+        self.q.put((_STOP, None, None, True))
+        t.join(timeout)
+
+    def metrics(self) -> dict:
+        lat = sorted(self._lat)
+        return dict(self.stats, depth=self.q.qsize(), capacity=self.q.maxsize,
+                    p50_commit_ms=round(lat[len(lat) // 2], 2) if lat else 0.0,
+                    p95_commit_ms=round(lat[int(len(lat) * 0.95)], 2) if lat else 0.0)
+
+    # ---- writer thread ----
+    def _take_batch(self):
+        # linger up to flush_s to coalesce; once an urgent item is in, only take
+        # what's already queued (group commit: arrivals during a commit share the next one)
+        batch = [self.q.get()]
+        urgent = batch[0][3]
+        deadline = time.monotonic() + self.flush_s
+        while len(batch) < self.batch_max and batch[-1][0] is not _STOP:
+            left = 0 if urgent else deadline - time.monotonic()
+            try:
+                batch.append(self.q.get(timeout=left) if left > 0 else self.q.get_nowait())
+            except queue.Empty:
+                break
+            urgent = urgent or batch[-1][3]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            stop = batch[-1][0] is _STOP
+            writes = [b for b in batch if b[0] in HANDLERS]
+            if writes:
+                self._write(writes)
+            for kind, _, fut, _ in batch:
+                if kind is None:
+                    fut.set_result(True)  # flush() marker
+            if stop:
+                return
+
+    def _apply(self, items):
+        t0 = time.perf_counter()
+        sess = get_session()
+        try:
+            ctx = {'pending': {}}
+            results = [HANDLERS[kind](sess, ctx, kw) for kind, kw, _, _ in items]
+            sess.flush()
+            rollups.apply(sess, ctx['pending'])
+            results = [getattr(r, 'id', None) for r in results]
+            sess.commit()
+        except Exception:
+            sess.rollback()
+            raise
+        finally:
+            sess.close()
+        ms = (time.perf_counter() - t0) * 1000
+        self._lat.append(ms)
+        self.stats['last_commit_ms'] = round(ms, 2)
+        self.stats['max_commit_ms'] = round(max(self.stats['max_commit_ms'], ms), 2)
+        return results
+
+    def _write(self, items):
+        try:
+            results = self._apply(items)
+        except Exception as e:
+            if len(items) == 1:
+                self.stats['failed'] += 1
+                print(f'[writer] dropped {items[0][0]} write: {e}')
+                items[0][2].set_exception(e)
+                return
+            # one bad record shouldn't sink the batch: retry them one by one
+            for it in items:
+                self._write([it])
+            return
+        self.stats['batches'] += 1
+        self.stats['written'] += len(items)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(items))
+        for (_, _, fut, _), res in zip(items, results):
+            fut.set_result(res)
+
+
+writer = WriteBehind()
+
+
+def submit_count(ts, source: str, count_type: str, value: int, camera_name=None, season=None,
+                 meta_json=None, timeout: float = None, urgent: bool = False) -> Future:
+    return writer.submit('count', timeout=timeout, urgent=urgent, ts=ts, source=source, count_type=count_type, value=value,
+                         camera_name=camera_name, season=season, meta_json=meta_json)
+
+
+def submit_fpp(ts, details: dict, urgent: bool = False) -> Future:
+    return writer.submit('fpp', urgent=urgent, ts=ts, details=details)
+
+
+def flush(timeout: float = None) -> bool:
+    return writer.flush(timeout)
+
+
+def stop(timeout: float = 30):
+    writer.stop(timeout)
+
+
+def metrics() -> dict:
+    return writer.metrics()
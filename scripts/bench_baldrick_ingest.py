@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Rows/sec of the Baldrick ingest: old per-line SELECT loop vs bulk upsert.
+
+Runs against a throwaway SQLite file (never the real tracker.db).
+Usage: python scripts/bench_baldrick_ingest.py [--lines 50000]
+"""
+import argparse, os, shutil, sys, tempfile, time
+
+tmpdir = tempfile.mkdtemp(prefix='glowsync-bench-')
+os.environ['DB_PATH'] = os.path.join(tmpdir, 'bench.db')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import timezone  # noqa: E402
+from sqlalchemy import select, and_, delete  # noqa: E402
+from app.db import init_db, get_session, AutoCount, AutoCountRollup  # noqa: E402
+from app.ingest import baldrick  # noqa: E402
+from app.utils import floor_bucket  # noqa: E402
+
+
+def synthetic_csv(n, start=1761955200, step=30):
+    return '\n'.join(f'{start + i * step},{(i * 7) % 43}' for i in range(n)) + '\n'
+
+
+def legacy_loop(text):
+    # the per-line loop run_once used before the bulk path
+    s = get_session()
+    upserts = 0
+    for ln in [ln for ln in text.splitlines() if ln.strip()]:
+        parsed = baldrick._parse_epoch_count_line(ln)
+        if not parsed:
+            continue
+        ts_local, cnt = parsed
+        bucket_ts = floor_bucket(ts_local.astimezone(timezone.utc), 1)
+        existing = s.execute(select(AutoCount).where(and_(
+            AutoCount.timestamp == bucket_ts, AutoCount.count_type == 'device_seen',
+            AutoCount.source == 'baldrick'))).scalar_one_or_none()
+        if existing:
+            existing.count_value = int(cnt); s.add(existing)
+        else:
+            s.add(AutoCount(timestamp=bucket_ts, source='baldrick', count_type='device_seen', count_value=int(cnt)))
+        upserts += 1
+        if upserts % 500 == 0:
+            s.commit()
+    s.commit()
+
+
+def wipe():
+    s = get_session()
+    s.execute(delete(AutoCount)); s.execute(delete(AutoCountRollup)); s.commit()
+
+
+def timed(label, fn, text, n):
+    t0 = time.perf_counter()
+    fn(text)
+    dt = time.perf_counter() - t0
+    print(f'[bench] {label:<28} {dt:7.2f} s  {n / dt:10.0f} lines/s')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--lines', type=int, default=50000)
+    args = ap.parse_args()
+    init_db()
+    text = synthetic_csv(args.lines)
+    print(f'[bench] {args.lines} lines, {len(text)} bytes, db={os.environ["DB_PATH"]}')
+
+    timed('legacy loop (first fetch)', legacy_loop, text, args.lines)
+    timed('legacy loop (re-fetch)', legacy_loop, text, args.lines)
+    wipe()
+    timed('bulk upsert (first fetch)', baldrick.ingest_text, text, args.lines)
+    timed('bulk upsert (re-fetch)', baldrick.ingest_text, text, args.lines)
+    shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Peak RSS of the Baldrick ingests: buffered (r.text + splitlines) vs streaming,
+plus baldrick_csv.run() on a timestamp/device_id export of the same length.
+
+Serves synthetic CSV exports of increasing size from a local HTTP server and
+runs each ingest in a fresh subprocess against a throwaway SQLite file, so
+ru_maxrss reflects only that run. Streaming should stay flat as the CSV grows.
+Usage: python scripts/bench_baldrick_memory.py [--sizes 50000,200000,800000]
+"""
+import argparse, http.server, os, resource, shutil, subprocess, sys, tempfile, threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+START = 1761955200
+
+
+def _line(i):
+    return f'{START + i * 30},{(i * 7) % 43}\n'.encode()
+
+
+def _csv_line(i):
+    # device export: a few probes per minute, header on the first line
+    return b'timestamp,device_id\n' if i == 0 else f'{START + i * 15},dev{(i * 7) % 43}\n'.encode()
+
+
+class CsvHandler(http.server.BaseHTTPRequestHandler):
+    # generates the export on the fly so the server itself holds no body
+    def log_message(self, *a):
+        pass
+
+    def do_GET(self):
+        path = self.path.strip('/').split('?')[0]
+        line = _csv_line if path.startswith('csv/') else _line
+        n = int(path.rsplit('/', 1)[-1] or 0)
+        self.send_response(200)
+        self.send_header('Content-Length', str(sum(len(line(i)) for i in range(n))))
+        self.end_headers()
+        chunk = []
+        for i in range(n):
+            chunk.append(line(i))
+            if len(chunk) == 4096:
+                self.wfile.write(b''.join(chunk)); chunk = []
+        self.wfile.write(b''.join(chunk))
+
+
+def child(mode, url):
+    sys.path.insert(0, ROOT)
+    from app.db import init_db, get_session
+    from app.ingest import baldrick, baldrick_csv
+    init_db()
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if mode == 'buffered':
+        text = baldrick.fetch_csv_text(url, timeout_s=300)
+        lines = [ln for ln in text.splitlines() if ln.strip()]
+        s = get_session()
+        res = baldrick.ingest_lines(s, lines, batch=len(lines) + 1)
+        s.commit()
+    elif mode == 'csv':
+        res = baldrick_csv.run(url)
+    else:
+        res = baldrick.run_once(url, full=True)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{res.get("scanned", res.get("rows"))} {base} {peak}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', default='50000,200000,800000')
+    ap.add_argument('--child', nargs=2, metavar=('MODE', 'URL'), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child(*args.child)
+        raise SystemExit(0)
+
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), CsvHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    print(f'[bench] {"lines":>9} {"mode":<9} {"peak MB":>8} {"growth MB":>10}')
+    for n in [int(x) for x in args.sizes.split(',')]:
+        for mode in ('buffered', 'stream', 'csv'):
+            tmpdir = tempfile.mkdtemp(prefix='glowsync-bench-')
+            env = dict(os.environ, DB_PATH=os.path.join(tmpdir, 'bench.db'))
+            path = f'csv/{n}' if mode == 'csv' else n
+            out = subprocess.run([sys.executable, __file__, '--child', mode, f'http://127.0.0.1:{srv.server_port}/{path}'],
+                                 env=env, capture_output=True, text=True, check=True).stdout.split()
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            scanned, base, peak = map(int, out[-3:])
+            print(f'[bench] {n:>9} {mode:<9} {peak / 1024:8.1f} {(peak - base) / 1024:10.1f}')
+    srv.shutdown()
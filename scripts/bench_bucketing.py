@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Compare the old per-row astimezone()/strftime() bucketing with app.bucketing.
+
+Usage: python scripts/bench_bucketing.py [--days 60] [--group hour]
+"""
+import argparse, os, sys, time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytz
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import bucketing  # noqa: E402
+
+FMT = {'min': '%Y-%m-%d %H:%M', 'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d'}
+
+
+def per_row(ts, vals, group, tzname, baseline):
+    tz = pytz.timezone(tzname)
+    buckets = {}
+    for t, v in zip(ts.tolist(), vals.tolist()):
+        label = datetime.fromtimestamp(t, timezone.utc).astimezone(tz).strftime(FMT[group])
+        agg = buckets.get(label, {'sum': 0, 'n': 0})
+        agg['sum'] += max(v - baseline, 0); agg['n'] += 1
+        buckets[label] = agg
+    labels = sorted(buckets)
+    return labels, [int(round(buckets[k]['sum'] / buckets[k]['n'])) for k in labels]
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--days', type=int, default=60)
+    ap.add_argument('--group', default='hour', choices=['min', 'hour', 'day'])
+    ap.add_argument('--tz', default=os.getenv('TIMEZONE', 'America/Chicago'))
+    args = ap.parse_args()
+
+    start = int(datetime(2025, 10, 1, tzinfo=timezone.utc).timestamp())
+    ts = np.arange(start, start + args.days * 86400, 30, dtype=np.int64)  # Baldrick ~30s samples
+    vals = np.random.default_rng(1).integers(0, 60, len(ts))
+    print(f'[bench] {len(ts)} rows, group={args.group}, tz={args.tz}')
+
+    t0 = time.perf_counter()
+    labels, values = per_row(ts, vals, args.group, args.tz, 10)
+    t1 = time.perf_counter()
+    bucketing.tz_transitions(args.tz)  # warm the transition cache, as a running server would
+    t2 = time.perf_counter()
+    res = bucketing.bucket_series(ts, vals, args.group, args.tz, how='mean', baseline=10)
+    t3 = time.perf_counter()
+
+    assert res['labels'] == labels and res['values'] == values, 'results differ'
+    print(f'[bench] per-row : {(t1 - t0) * 1000:8.1f} ms')
+    print(f'[bench] numpy   : {(t3 - t2) * 1000:8.1f} ms  ({(t1 - t0) / max(t3 - t2, 1e-9):.0f}x)')
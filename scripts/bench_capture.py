@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Decode throughput per capture option (app.ingest.capture), on local files.
+
+Every option decodes the same clip flat out through open_capture() and reports
+frames delivered, frames/s and CPU ms per second of video, which is what a
+camera costs at its native rate. Without --clip a 1080p H.264 "main stream"
+(keyframe every 2s, like most cameras) and a 640x360 "substream" of the same
+scene are encoded with PyAV; with --clip/--substream your own recordings are
+used. pyav options are skipped when PyAV is not installed, gstreamer when
+OpenCV was built without it.
+Usage: python scripts/bench_capture.py [--clip main.mp4 --substream sub.mp4] [--seconds 20]
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from app.ingest import capture  # noqa: E402
+
+FPS = 15
+
+
+def encode(path, seconds, w, h):
+    """H.264 clip of cars crossing a noisy street (PyAV/libx264)."""
+    out = capture.av.open(path, 'w')
+    s = out.add_stream('libx264', rate=FPS)
+    s.width, s.height, s.pix_fmt = w, h, 'yuv420p'
+    s.options = {'g': str(2 * FPS), 'preset': 'veryfast', 'tune': 'zerolatency'}
+    rng = np.random.default_rng(5)
+    bg = cv2.GaussianBlur(rng.integers(30, 110, (h, w, 3), dtype=np.uint8), (0, 0), 2)
+    for i in range(int(seconds * FPS)):
+        f = bg.copy()
+        for lane, v in ((0, 0.004), (1, -0.003)):
+            x = int(((i * v) % 1.2 - 0.1) * w)
+            y = int(h * (0.5 + 0.14 * lane))
+            cv2.rectangle(f, (x, y), (x + w // 9, y + h // 12), (200, 190, 180), -1)
+        f = np.clip(f.astype(np.int16) + rng.integers(-4, 5, f.shape, dtype=np.int16), 0, 255).astype(np.uint8)
+        for p in s.encode(capture.av.VideoFrame.from_ndarray(f, format='bgr24')):
+            out.mux(p)
+    for p in s.encode():
+        out.mux(p)
+    out.close()
+
+
+def decode(cam, video_s):
+    """(frames, shape, frames/s, cpu ms per video second) or None if it cannot open."""
+    cap = capture.open_capture(cam)
+    if not cap.isOpened():
+        return None
+    n, shape = 0, None
+    t0, c0 = time.perf_counter(), time.process_time()
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        n, shape = n + 1, frame.shape
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    cap.release()
+    return n, shape, n / wall if wall else 0.0, cpu * 1000 / video_s
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clip', help='main stream recording (default: synthetic 1080p H.264)')
+    ap.add_argument('--substream', help='low-res recording of the same scene')
+    ap.add_argument('--seconds', type=float, default=20, help='synthetic clip length')
+    args = ap.parse_args()
+    main, sub, video_s = args.clip, args.substream, args.seconds
+    if main:
+        cap = cv2.VideoCapture(main)
+        video_s = cap.get(cv2.CAP_PROP_FRAME_COUNT) / (cap.get(cv2.CAP_PROP_FPS) or FPS)
+        cap.release()
+    else:
+        if capture.av is None:
+            raise SystemExit('[bench] the synthetic clips need PyAV (pip install av); or pass --clip')
+        tmp = tempfile.mkdtemp(prefix='glowsync-capture-')
+        main, sub = os.path.join(tmp, 'main.mp4'), os.path.join(tmp, 'sub.mp4')
+        encode(main, video_s, 1920, 1080)
+        encode(sub, video_s, 640, 360)
+
+    options = [('opencv', {}), ('ffmpeg threads=1', {'capture': 'ffmpeg', 'capture_threads': 1}),
+               ('gstreamer', {'capture': 'gstreamer', 'capture_pipeline': 'filesrc location={url} ! decodebin ! videoconvert ! '
+                                                                         'video/x-raw,format=BGR ! appsink sync=false'})]
+    if capture.av is not None:
+        options += [('pyav', {'capture': 'pyav'}), ('pyav width=640', {'capture': 'pyav', 'capture_width': 640}),
+                    ('pyav nonkey', {'capture': 'pyav', 'capture_skip': 'nonkey'})]
+    if sub:
+        options += [('substream opencv', {'substream_url': sub}),
+                    ('substream pyav', {'capture': 'pyav', 'substream_url': sub} if capture.av is not None else None)]
+    print(f'[bench] {video_s:g}s of video; cpu = ms of CPU per second of video (1000 = one core)')
+    print(f'[bench] {"option":<18} {"frames":>6} {"size":>10} {"fps":>7} {"cpu":>7}')
+    for label, extra in options:
+        if extra is None:
+            continue
+        r = decode(dict(extra, rtsp_url=main), video_s)
+        if r is None:
+            print(f'[bench] {label:<18} (not available)')
+            continue
+        n, shape, fps, cpu = r
+        size = f'{shape[1]}x{shape[0]}' if shape else '-'
+        print(f'[bench] {label:<18} {n:6d} {size:>10} {fps:7.0f} {cpu:7.0f}')
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""FPP now-playing sampling: probing every known path vs the discovered subset.
+
+A fake FPP 7 box answers the /api/* paths with JSON and 404s the legacy
+fppjson.php ones (what a modern FPP does). Each request costs --latency
+seconds server-side, like a Pi on busy Wi-Fi.
+Usage: python scripts/bench_fpp_discovery.py [--samples 50] [--latency 0.02]
+"""
+import argparse, http.server, json, os, sys, threading, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app.ingest import monitor_controllers as mc  # noqa: E402
+
+HITS = {'n': 0}
+ANSWERS = {
+    '/api/system/status': {'fppd': 'running', 'HostName': 'fpp-bench', 'version': '7.4'},
+    '/api/fppd/status': {'status_name': 'playing', 'current_playlist': {'playlist': 'Main'},
+                         'current_sequence': 'song.fseq', 'seconds_elapsed': 12},
+    '/api/fppd/playlist': {'playlist': 'Main'},
+    '/api/fppd/media': {'sequence': 'song.fseq'},
+}
+
+
+def server(latency):
+    class H(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        def log_message(self, *a):
+            pass
+        def do_GET(self):
+            HITS['n'] += 1
+            time.sleep(latency)
+            j = ANSWERS.get(self.path)
+            body = json.dumps(j).encode() if j else b'<html>not found</html>'
+            self.send_response(200 if j else 404)
+            self.send_header('Content-Length', str(len(body))); self.end_headers()
+            self.wfile.write(body)
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), H)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return f'127.0.0.1:{srv.server_port}'
+
+
+def measure(label, fn, samples):
+    HITS['n'] = 0
+    t0 = time.perf_counter()
+    for _ in range(samples):
+        info = fn()
+    dt = (time.perf_counter() - t0) / samples * 1000
+    print(f'[bench] {label:<22} {HITS["n"] / samples:5.1f} req/sample {dt:8.1f} ms/sample  {info}')
+    return info
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--samples', type=int, default=50)
+    ap.add_argument('--latency', type=float, default=0.02, help='server-side delay per request (s)')
+    args = ap.parse_args()
+    ip = server(args.latency)
+    full = measure('all paths', lambda: mc._loop.run(mc.fpp_now_playing_async(ip)), args.samples)
+    _, caps = mc._loop.run(mc.fpp_discover(ip))
+    print(f'[bench] discovered paths: {caps["paths"]}')
+    cached = measure('cached capabilities', lambda: mc._loop.run(mc.fpp_sample_async(ip, caps))[0], args.samples)
+    print(f'[bench] same answer: {full == cached}')
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Effective rate and frame age: inline cap.read() + sleep vs FrameGrabber + Pacer.
+
+A fake live camera delivers --src-fps frames into an unbounded FIFO (what the
+RTSP/FFmpeg buffer does until it overflows); "processing" takes --proc-ms.
+Frame age is how old a frame is when processing starts.
+Usage: python scripts/bench_frame_pacing.py [--seconds 20] [--src-fps 30] [--fps-target 6] [--proc-ms 60]
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np  # noqa: E402
+from app.ingest.grabber import FrameGrabber, Pacer  # noqa: E402
+
+
+class LiveSource:
+    def __init__(self, fps):
+        self.fps, self.t0, self.next = fps, time.monotonic(), 0
+
+    def read(self):
+        due = self.t0 + self.next / self.fps
+        if due > time.monotonic():
+            time.sleep(due - time.monotonic())
+        frame = np.full((4,), self.next, np.int64)
+        self.next += 1
+        return True, frame
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 0.0
+
+    def release(self):
+        pass
+
+    def captured_at(self, frame):
+        return self.t0 + int(frame[0]) / self.fps
+
+
+def inline(src, seconds, fps_target, proc_s):
+    ages, end = [], time.monotonic() + seconds
+    while time.monotonic() < end:
+        ok, frame = src.read()
+        ages.append(time.monotonic() - src.captured_at(frame))
+        time.sleep(proc_s)
+        time.sleep(1.0 / fps_target)
+    return ages, {}
+
+
+def grabbed(src, seconds, fps_target, proc_s):
+    grab, pacer = FrameGrabber(lambda: src).start(), Pacer(fps_target)
+    ages, end = [], time.monotonic() + seconds
+    while time.monotonic() < end:
+        pacer.wait()
+        frame = grab.get()
+        if frame is None:
+            continue
+        ages.append(time.monotonic() - src.captured_at(frame))
+        time.sleep(proc_s)
+    grab.stop()
+    return ages, dict(grab.stats, late=pacer.late)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--seconds', type=float, default=20)
+    ap.add_argument('--src-fps', type=float, default=30)
+    ap.add_argument('--fps-target', type=float, default=6)
+    ap.add_argument('--proc-ms', type=float, default=60)
+    args = ap.parse_args()
+    print(f'[bench] source {args.src_fps:g} fps, target {args.fps_target:g} fps, processing {args.proc_ms:g} ms/frame')
+    for label, fn in (('inline read+sleep', inline), ('grabber+pacer', grabbed)):
+        ages, stats = fn(LiveSource(args.src_fps), args.seconds, args.fps_target, args.proc_ms / 1000)
+        print(f'[bench] {label:<18} {len(ages) / args.seconds:5.2f} fps  age avg={np.mean(ages) * 1000:7.0f} ms '
+              f'max={max(ages) * 1000:7.0f} ms  {stats}')
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Wall time of one controller-monitor pass: serial blocking probes vs run_async.
+
+Simulates a fleet against local HTTP servers: healthy FPP/Falcon boxes, slow
+ones (answer after --slow seconds) and dead ones (port closed). ICMP is
+skipped for the serial baseline and usually unavailable unprivileged anyway.
+Usage: python scripts/bench_monitor.py [--fleet 30] [--slow 2.5]
+"""
+import argparse, http.server, json, os, socket, sys, threading, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import httpx  # noqa: E402
+from app.ingest import monitor_controllers as mc  # noqa: E402
+
+
+def server(delay):
+    class H(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        def log_message(self, *a):
+            pass
+        def do_GET(self):
+            time.sleep(delay)
+            body = json.dumps({'status_name': 'playing', 'current_playlist': {'playlist': 'Main'},
+                               'current_sequence': 'song.fseq', 'fpp_version': '7.0'}).encode()
+            self.send_response(200); self.send_header('Content-Length', str(len(body))); self.end_headers()
+            self.wfile.write(body)
+    srv = http.server.ThreadingHTTPServer(('127.0.0.1', 0), H)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return f'127.0.0.1:{srv.server_port}'
+
+
+def dead():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0)); return f'127.0.0.1:{s.getsockname()[1]}'
+
+
+def serial(ctrls):
+    # the pre-async shape of run(): one controller at a time, one blocking request per path
+    def get(ip, p):
+        try:
+            return httpx.get(f'http://{ip}{p}', timeout=3.0)
+        except Exception:
+            return None
+    for c in ctrls:
+        if c['kind'] == 'fpp':
+            for p in mc.FPP_PATHS:
+                get(c['ip'], p)
+            paths = ['/api/system/status', '/fppjson.php?command=getFPPDstatus', '/']
+        else:
+            paths = ['/', '/index.html']
+        for p in paths:
+            r = get(c['ip'], p)
+            if r is not None and r.status_code < 500:
+                break
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--fleet', type=int, default=30)
+    ap.add_argument('--slow', type=float, default=2.5, help='response delay of the slow controllers')
+    args = ap.parse_args()
+    fast, slow = server(0), server(args.slow)
+    ctrls = []
+    for i in range(args.fleet):
+        ip = [fast, fast, slow, dead()][i % 4]
+        ctrls.append({'id': i, 'ip': ip, 'kind': 'fpp' if i % 2 else 'falcon'})
+    print(f'[bench] {args.fleet} controllers: half fast, quarter slow ({args.slow}s), quarter dead')
+    t0 = time.perf_counter(); serial(ctrls); dt = time.perf_counter() - t0
+    print(f'[bench] serial blocking        {dt:7.2f} s')
+    t0 = time.perf_counter(); res = mc._loop.run(mc.run_async(ctrls)); dt = time.perf_counter() - t0
+    online = sum(r['status'] == 'online' for r in res.values())
+    print(f'[bench] run_async (x{mc.CONCURRENCY}, {mc.DEADLINE_S:.0f}s deadline) {dt:7.2f} s  online={online}/{len(res)}')
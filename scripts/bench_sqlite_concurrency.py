@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Writer throughput while dashboards hammer the DB, per SQLite PRAGMA profile.
+
+One writer process commits small ingest transactions (one auto_counts row +
+rollups, like a camera bucket flush) while N reader processes loop over
+dashboard-style queries. Each profile gets its own throwaway SQLite file.
+Usage: python scripts/bench_sqlite_concurrency.py [--seconds 10] [--readers 4] [--profiles off,default]
+"""
+import argparse, os, shutil, subprocess, sys, tempfile, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def seed(rows):
+    from datetime import datetime, timedelta, timezone
+    from app.db import init_db, get_session
+    from app import storage, rollups
+    init_db()
+    s = get_session()
+    t0 = datetime.now(timezone.utc) - timedelta(minutes=rows)
+    pending = {}
+    for i in range(rows):
+        storage.add_count(s, t0 + timedelta(minutes=i), 'baldrick', 'device_seen', (i * 7) % 43, pending=pending)
+        if i % 5000 == 0:
+            s.flush(); rollups.apply(s, pending)
+    rollups.apply(s, pending)
+    s.commit()
+
+
+def writer(seconds):
+    from datetime import datetime, timezone
+    from app.db import get_session
+    from app import storage
+    lat = []
+    end = time.perf_counter() + seconds
+    errors = 0
+    while time.perf_counter() < end:
+        t = time.perf_counter()
+        s = get_session()
+        try:
+            storage.add_count(s, datetime.now(timezone.utc), 'opencv_tripline', 'vehicle', 1, camera_name='bench')
+            s.commit()
+            lat.append(time.perf_counter() - t)
+        except Exception:
+            s.rollback(); errors += 1
+        finally:
+            s.close()
+    lat.sort()
+    p95 = lat[int(len(lat) * 0.95)] * 1000 if lat else 0
+    print(f'{len(lat)} {errors} {p95:.2f} {max(lat) * 1000 if lat else 0:.2f}')
+
+
+def reader(seconds):
+    from datetime import datetime, timedelta, timezone
+    from app.db import get_session
+    from app import storage, rollups
+    n = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        s = get_session()
+        now = datetime.now(timezone.utc)
+        storage.series(s, 'device_seen', now - timedelta(days=1), now, source='baldrick')
+        rollups.query(s, 'hour', 'device_seen', date_from=now - timedelta(days=7))
+        storage.low_percentile(s, 'device_seen', 0.10, t0=now - timedelta(days=7), source='baldrick')
+        s.close()
+        n += 1
+    print(n)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--seconds', type=float, default=10)
+    ap.add_argument('--readers', type=int, default=4)
+    ap.add_argument('--rows', type=int, default=50000, help='seeded auto_counts rows')
+    ap.add_argument('--profiles', default='off,default')
+    ap.add_argument('--role', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.role:
+        sys.path.insert(0, ROOT)
+        {'seed': lambda: seed(args.rows), 'writer': lambda: writer(args.seconds),
+         'reader': lambda: reader(args.seconds)}[args.role]()
+        raise SystemExit(0)
+
+    print(f'[bench] {args.readers} readers, {args.seconds:.0f}s, {args.rows} seeded rows')
+    print(f'[bench] {"profile":<9} {"commits/s":>10} {"errors":>7} {"p95 ms":>8} {"max ms":>8} {"reads/s":>8}')
+    for profile in args.profiles.split(','):
+        tmpdir = tempfile.mkdtemp(prefix='glowsync-bench-')
+        env = dict(os.environ, DB_PATH=os.path.join(tmpdir, 'bench.db'), SQLITE_PROFILE=profile)
+        cmd = [sys.executable, __file__, '--seconds', str(args.seconds), '--rows', str(args.rows), '--role']
+        subprocess.run(cmd + ['seed'], env=env, check=True, capture_output=True)
+        procs = [subprocess.Popen(cmd + ['reader'], env=env, stdout=subprocess.PIPE, text=True)
+                 for _ in range(args.readers)]
+        w = subprocess.Popen(cmd + ['writer'], env=env, stdout=subprocess.PIPE, text=True)
+        commits, errors, p95, worst = w.communicate()[0].split()
+        reads = sum(int(p.communicate()[0].split()[0]) for p in procs)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        print(f'[bench] {profile:<9} {int(commits) / args.seconds:10.0f} {errors:>7} {float(p95):8.2f} '
+              f'{float(worst):8.2f} {reads / args.seconds:8.1f}')
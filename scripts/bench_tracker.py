@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Tracker CPU and count accuracy on synthetic dense traffic (detections only, no video).
+
+Cars drive along --lanes lanes (alternating direction, no overtaking) across
+a 1280x720 frame and over a vertical tripline. Each frame the "detector" misses a car with --miss probability,
+adds pixel noise and a few false positives, and merges cars in adjacent
+lanes that overlap on screen into one blob (occlusion). Truth is the number
+of cars whose centre passes the tripline.
+Usage: python scripts/bench_tracker.py [--frames 3000] [--lanes 2,4,8] [--miss 0.1]
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np  # noqa: E402
+from app.ingest.tracker import NearestTracker, HungarianTracker, tripline_crossed  # noqa: E402
+
+W, H, LINE_X = 1280, 720, 640
+
+
+def scene(frames, lanes, miss, seed=11):
+    """([detections per frame], true crossings, mean cars on screen)."""
+    rng = np.random.default_rng(seed)
+    ys = np.linspace(H * 0.3, H * 0.7, lanes)
+    # two-way street: lanes alternate direction; cars in a lane keep its pace (no overtaking)
+    speeds = rng.uniform(12, 28, lanes) * np.where(np.arange(lanes) % 2 == 0, 1, -1)
+    cars, out, truth, on_screen = [], [], 0, 0
+    for _ in range(frames):
+        for k, y in enumerate(ys):
+            start = -70.0 if speeds[k] > 0 else W + 70.0
+            if rng.random() < 0.04 and all(abs(c[0] - start) > 200 for c in cars if c[1] == y):
+                cars.append([start, y, float(speeds[k] * rng.uniform(0.97, 1.03))])
+        dets = []
+        for c in cars:
+            before = c[0] < LINE_X
+            c[0] += c[2]
+            truth += before != (c[0] < LINE_X)
+        cars = [c for c in cars if -80 <= c[0] <= W + 80]
+        on_screen += len(cars)
+        visible = sorted(c[:2] for c in cars if 0 <= c[0] < W and rng.random() >= miss)
+        while visible:
+            x, y = visible.pop(0)
+            # adjacent-lane cars overlapping on screen come out as one blob
+            near = [p for p in visible if abs(p[0] - x) < 110 and abs(p[1] - y) < 70]
+            for p in near:
+                visible.remove(p)
+            xs, yy = [x] + [p[0] for p in near], [y] + [p[1] for p in near]
+            dets.append((int(np.mean(xs) + rng.normal(0, 3)), int(np.mean(yy) + rng.normal(0, 3))))
+        for _ in range(rng.poisson(0.3)):
+            dets.append((int(rng.uniform(0, W)), int(rng.uniform(0, H))))
+        rng.shuffle(dets)
+        out.append(dets)
+    return out, truth, on_screen / frames
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--frames', type=int, default=3000)
+    ap.add_argument('--lanes', default='2,4,8')
+    ap.add_argument('--miss', type=float, default=0.1, help='per-frame detection miss probability')
+    ap.add_argument('--gate', type=float, default=50)
+    args = ap.parse_args()
+    print(f'[bench] {args.frames} frames, miss={args.miss}, gate={args.gate:g}px')
+    print(f'[bench] {"lanes":>5} {"cars":>5} {"truth":>6} {"tracker":<10} {"us/frame":>9} {"count":>6} {"error":>7}')
+    for lanes in (int(x) for x in args.lanes.split(',')):
+        frames, truth, cars = scene(args.frames, lanes, args.miss)
+        for label, trk in (('nearest', NearestTracker(None, gate=args.gate)),
+                           ('hungarian', HungarianTracker(None, gate=args.gate, max_age=3))):
+            trk.crossed = tripline_crossed([[0.5, 0.0], [0.5, 1.0]], W, H, strict=trk.strict_tripline)
+            count, t0 = 0, time.process_time()
+            for dets in frames:
+                count += trk.update(dets)
+            us = (time.process_time() - t0) * 1e6 / len(frames)
+            print(f'[bench] {lanes:5d} {cars:5.1f} {truth:6d} {label:<10} {us:9.1f} {count:6d} '
+                  f'{(count - truth) / truth * 100:6.1f}%')
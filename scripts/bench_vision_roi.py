@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Counting accuracy vs CPU per processing mode: full frame, ROI crop, ROI crop + downscale.
+
+Runs Detector + make_tracker (exactly what the camera workers run) over
+recorded clips, timing only detection and tracking (not decode). Without
+--clip a synthetic 1280x720 street is generated with a known number of cars
+crossing the tripline, plus motion outside the ROI (a swaying tree) that
+the ROI has to filter out.
+Usage: python scripts/bench_vision_roi.py [--clip a.mp4 --clip b.mp4 --camera NAME --truth N] [--downscale 2,3,4]
+"""
+import argparse, os, sys, tempfile, time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from app.ingest.detect import Detector  # noqa: E402
+from app.ingest.tracker import make_tracker, tripline_crossed  # noqa: E402
+
+SCENE = {'roi_polygon': [[0.05, 0.42], [0.95, 0.42], [0.95, 0.8], [0.05, 0.8]],
+         'tripline': [[0.5, 0.35], [0.5, 0.85]], 'min_contour_area': 2500}
+
+
+def street_frames(seconds=90, fps=10, w=1280, h=720, seed=7, gap=(2.5, 6)):
+    """Yields (frame, cars that have crossed x = w/2 so far); a car every gap seconds."""
+    rng = np.random.default_rng(seed)
+    bg = cv2.GaussianBlur(rng.integers(30, 110, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+    cv2.rectangle(bg, (0, int(h * 0.45)), (w, int(h * 0.78)), (55, 55, 60), -1)  # road
+    cars, t_next, truth = [], 3.0, 0
+    for i in range(int(seconds * fps)):
+        t = i / fps
+        if t >= t_next and t < seconds - 8:
+            lane = int(rng.integers(0, 2))
+            speed = float(rng.uniform(15, 35)) * (1 if lane == 0 else -1)
+            x = -160.0 if speed > 0 else w + 20.0
+            cars.append({'x': x, 'y': int(h * (0.5 if lane == 0 else 0.64)), 'v': speed,
+                         'c': tuple(int(c) for c in rng.integers(150, 255, 3))})
+            t_next = t + float(rng.uniform(*gap))
+        f = bg.copy()
+        sway = int(40 * np.sin(t * 2.1))
+        cv2.circle(f, (200 + sway, 120), 70, (40, 120, 40), -1)  # tree, outside the ROI
+        for c in cars:
+            before = c['x'] + 70 < w / 2
+            c['x'] += c['v']
+            if before != (c['x'] + 70 < w / 2):
+                truth += 1
+            cv2.rectangle(f, (int(c['x']), c['y']), (int(c['x']) + 140, c['y'] + 60), c['c'], -1)
+        cars = [c for c in cars if -200 < c['x'] < w + 60]
+        noise = rng.integers(-6, 7, f.shape, dtype=np.int16)
+        yield np.clip(f.astype(np.int16) + noise, 0, 255).astype(np.uint8), truth
+
+
+def synthetic_clip(path, seconds=90, fps=10, w=1280, h=720, seed=7):
+    """Write the clip; returns how many cars cross x = w/2."""
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (w, h))
+    truth = 0
+    for frame, truth in street_frames(seconds, fps, w, h, seed):
+        out.write(frame)
+    out.release()
+    return truth
+
+
+def run(clips, cfg):
+    """(count, cpu ms per frame) over all clips."""
+    count, cpu, frames = 0, 0.0, 0
+    for clip in clips:
+        cap = cv2.VideoCapture(clip)
+        detect, tracker = Detector(cfg), None
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if tracker is None:
+                tracker = make_tracker(cfg)
+                tracker.crossed = tripline_crossed(cfg.get('tripline', []), frame.shape[1], frame.shape[0],
+                                                   strict=tracker.strict_tripline)
+            t0 = time.process_time()
+            count += tracker.update(detect(frame))
+            cpu += time.process_time() - t0
+            frames += 1
+        cap.release()
+    return count, cpu * 1000 / max(1, frames)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clip', action='append', help='recorded clip (repeatable); default: synthetic')
+    ap.add_argument('--camera', help='config.yaml camera whose roi/tripline/min_contour_area to use')
+    ap.add_argument('--truth', type=int, help='true crossings in the clips (default: the full-frame count)')
+    ap.add_argument('--downscale', default='2,3,4')
+    args = ap.parse_args()
+    cfg = dict(SCENE)
+    if args.clip:
+        clips = args.clip
+        from app.config import load_config
+        vision = load_config()['vision']
+        cam = next((c for c in vision.get('cameras') or [] if c.get('name') == args.camera), None) if args.camera else vision
+        cfg = {k: cam[k] for k in ('roi_polygon', 'tripline', 'min_contour_area', 'tracker', 'track_gate', 'track_max_age') if cam and cam.get(k)}
+        truth = args.truth
+    else:
+        clips = [os.path.join(tempfile.mkdtemp(prefix='glowsync-roi-'), 'street.avi')]
+        truth = synthetic_clip(clips[0])
+        print(f'[bench] synthetic clip: {truth} cars cross the tripline')
+    if not cfg.get('roi_polygon') or not cfg.get('tripline'):
+        raise SystemExit('[bench] the camera needs roi_polygon and tripline')
+
+    modes = [('full frame', {}), ('roi crop', {'crop_to_roi': True})]
+    modes += [(f'roi crop /{f}', {'crop_to_roi': True, 'downscale': float(f)}) for f in args.downscale.split(',')]
+    print(f'[bench] {"mode":<14} {"ms/frame":>9} {"cpu":>6} {"count":>6} {"error":>7}')
+    base = None
+    for label, extra in modes:
+        count, ms = run(clips, dict(cfg, **extra))
+        base = base or ms
+        truth = truth if truth is not None else count
+        err = (count - truth) / truth * 100 if truth else 0.0
+        print(f'[bench] {label:<14} {ms:9.2f} {ms / base * 100:5.0f}% {count:6d} {err:6.1f}%')
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Camera pipeline throughput: one thread per camera vs one process per camera.
+
+Every camera reads the same synthetic clip (cars crossing a tripline) with
+fps_target 0, so each worker runs flat out; the numbers are frames/s summed
+over cameras and CPU% as reported to the supervisor. With N cores the
+process mode should approach N x the thread mode once cameras >= cores.
+Usage: python scripts/bench_vision_workers.py [--cameras 4] [--seconds 15] [--modes thread,process]
+"""
+import argparse, json, os, subprocess, sys, tempfile, threading, time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def make_clip(path, frames=3000, w=640, h=360, fps=30):
+    import cv2
+    import numpy as np
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (w, h))
+    rng = np.random.default_rng(1)
+    bg = rng.integers(40, 80, (h, w, 3), dtype=np.uint8)
+    for i in range(frames):
+        f = bg.copy()
+        for lane, speed in ((0, 7), (1, -5)):
+            x = (i * speed) % (w + 120) - 60
+            y = 120 + lane * 110
+            cv2.rectangle(f, (int(x), y), (int(x) + 70, y + 40), (200, 200, 220), -1)
+        out.write(f)
+    out.release()
+
+
+def cams(n, clip):
+    return [{'name': f'cam{i}', 'rtsp_url': clip, 'fps_target': 0, 'min_contour_area': 400,
+             'tripline': [[0.5, 0.0], [0.5, 1.0]]} for i in range(n)]
+
+
+def role(mode, n, clip, seconds):
+    from app.db import init_db
+    from app.ingest import opencv_multi as om
+    init_db()
+    if mode == 'process':
+        stop = threading.Event()
+        threading.Timer(seconds, stop.set).start()
+        metrics = om.supervise(cams(n, clip), 'UTC', stop=stop)
+    else:
+        metrics = {}
+        for cam in cams(n, clip):
+            threading.Thread(target=om.worker, args=(cam, 'UTC'), daemon=True,
+                             kwargs={'report': lambda st, name=cam['name']: metrics.__setitem__(name, st)}).start()
+        time.sleep(seconds)
+    print(json.dumps(metrics), flush=True)
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--cameras', type=int, default=4)
+    ap.add_argument('--seconds', type=float, default=15)
+    ap.add_argument('--modes', default='thread,process')
+    ap.add_argument('--role', help=argparse.SUPPRESS)
+    ap.add_argument('--clip', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.role:
+        sys.path.insert(0, ROOT)
+        role(args.role, args.cameras, args.clip, args.seconds)
+
+    tmp = tempfile.mkdtemp(prefix='glowsync-vision-')
+    clip = os.path.join(tmp, 'clip.avi')
+    make_clip(clip)
+    env = dict(os.environ, DB_PATH=os.path.join(tmp, 'bench.db'), VISION_METRICS_S='1',
+               VISION_METRICS_PATH=os.path.join(tmp, 'metrics.json'))
+    print(f'[bench] {args.cameras} cameras, {args.seconds:.0f}s, {os.cpu_count()} cores')
+    print(f'[bench] {"mode":<8} {"frames/s":>9} {"per cam":>8} {"cpu %":>7}')
+    for mode in args.modes.split(','):
+        out = subprocess.run([sys.executable, __file__, '--role', mode, '--clip', clip, '--cameras', str(args.cameras),
+                              '--seconds', str(args.seconds)], env=env, capture_output=True, text=True, cwd=ROOT)
+        metrics = json.loads(out.stdout.strip().splitlines()[-1])
+        fps = sum(m.get('fps', 0) for m in metrics.values())
+        # thread mode: every camera reports the same whole-process CPU
+        cpu = max(m.get('cpu_pct', 0) for m in metrics.values()) if mode == 'thread' else \
+            sum(m.get('cpu_pct', 0) for m in metrics.values())
+        print(f'[bench] {mode:<8} {fps:9.1f} {fps / max(1, len(metrics)):8.1f} {cpu:7.0f}')
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Ingest writes/sec: one commit per write vs the write-behind queue (app/writer.py).
+
+N producer threads (think cameras + FPP sampler + HTTP posts) each write M
+count rows. Runs against a throwaway SQLite file (never the real tracker.db).
+Usage: python scripts/bench_writer.py [--producers 8] [--writes 300]
+"""
+import argparse, os, shutil, sys, tempfile, threading, time
+
+tmpdir = tempfile.mkdtemp(prefix='glowsync-bench-')
+os.environ['DB_PATH'] = os.path.join(tmpdir, 'bench.db')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import datetime, timedelta, timezone  # noqa: E402
+from app.db import init_db, get_session  # noqa: E402
+from app import storage, writer  # noqa: E402
+
+T0 = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+
+def direct(k, n):
+    # what each camera thread / request did before: its own transaction per write
+    s = get_session()
+    for i in range(n):
+        storage.add_count(s, T0 + timedelta(minutes=i), 'opencv_tripline', 'vehicle', 1, camera_name=f'direct{k}')
+        s.commit()
+
+
+def queued(k, n):
+    for i in range(n):
+        writer.submit_count(T0 + timedelta(minutes=i), 'opencv_tripline', 'vehicle', 1, camera_name=f'queued{k}')
+
+
+def timed(label, fn, producers, n):
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=fn, args=(k, n)) for k in range(producers)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    writer.flush()
+    dt = time.perf_counter() - t0
+    print(f'[bench] {label:<16} {dt:7.2f} s  {producers * n / dt:10.0f} writes/s')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--producers', type=int, default=8)
+    ap.add_argument('--writes', type=int, default=300, help='writes per producer')
+    args = ap.parse_args()
+    init_db()
+    timed('commit per write', direct, args.producers, args.writes)
+    timed('write-behind', queued, args.producers, args.writes)
+    m = writer.metrics()
+    print(f"[bench] batches={m['batches']} max_batch={m['max_batch']} "
+          f"p50={m['p50_commit_ms']}ms p95={m['p95_commit_ms']}ms max_depth={m['max_depth']}")
+    writer.stop()
+    shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Load test: records/sec through /ingest/autocount vs /ingest/autocount/batch.
+
+Starts the API with uvicorn on a throwaway SQLite file, then posts the same
+synthetic records one per request (from --concurrency threads) and in
+NDJSON / msgpack batches of --batch records.
+Usage: python scripts/load_ingest_batch.py [--records 2000] [--batch 1000] [--concurrency 8]
+"""
+import argparse, json, os, shutil, socket, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+T0 = datetime(2025, 12, 1, tzinfo=timezone.utc)
+
+
+def records(n, source):
+    return [{'timestamp': (T0 + timedelta(seconds=i)).isoformat(), 'source': source,
+             'camera_name': f'edge{i % 4}', 'count_type': 'vehicle', 'count_value': 1 + i % 3} for i in range(n)]
+
+
+def wait_up(base):
+    for _ in range(100):
+        try:
+            if httpx.get(f'{base}/health').status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise SystemExit('[load] server did not start')
+
+
+def single(base, recs, concurrency):
+    with httpx.Client(base_url=base) as cli, ThreadPoolExecutor(concurrency) as ex:
+        codes = list(ex.map(lambda r: cli.post('/ingest/autocount', json=r).status_code, recs))
+    return sum(c == 200 for c in codes)
+
+
+def batched(base, recs, size, fmt):
+    ok = 0
+    with httpx.Client(base_url=base, timeout=120) as cli:
+        for i in range(0, len(recs), size):
+            part = recs[i:i + size]
+            if fmt == 'msgpack':
+                import msgpack
+                body, ct = b''.join(msgpack.packb(r) for r in part), 'application/msgpack'
+            else:
+                body, ct = ('\n'.join(json.dumps(r) for r in part) + '\n').encode(), 'application/x-ndjson'
+            ok += cli.post('/ingest/autocount/batch', content=body, headers={'content-type': ct}).json()['inserted']
+    return ok
+
+
+def timed(label, fn, n):
+    t0 = time.perf_counter()
+    ok = fn()
+    dt = time.perf_counter() - t0
+    print(f'[load] {label:<24} {ok:>7}/{n} ok  {dt:7.2f} s  {n / dt:9.0f} records/s')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--records', type=int, default=2000)
+    ap.add_argument('--batch', type=int, default=1000)
+    ap.add_argument('--concurrency', type=int, default=8)
+    args = ap.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix='glowsync-load-')
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0)); port = sock.getsockname()[1]
+    env = dict(os.environ, DB_PATH=os.path.join(tmpdir, 'load.db'))
+    srv = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app.main:app', '--port', str(port), '--log-level', 'warning'],
+                           cwd=ROOT, env=env)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        wait_up(base)
+        n = args.records
+        timed(f'single x{args.concurrency} threads', lambda: single(base, records(n, 'single'), args.concurrency), n)
+        timed(f'batch ndjson /{args.batch}', lambda: batched(base, records(n * 10, 'ndjson'), args.batch, 'ndjson'), n * 10)
+        try:
+            import msgpack  # noqa: F401
+            timed(f'batch msgpack /{args.batch}', lambda: batched(base, records(n * 10, 'msgpack'), args.batch, 'msgpack'), n * 10)
+        except ImportError:
+            print('[load] msgpack not installed, skipping')
+    finally:
+        srv.terminate(); srv.wait()
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Replay recorded FPP MQTT events into the push listener (app.ingest.fpp_events).
+
+Default: events go straight into FppListener.handle() on a simulated clock,
+with the 15s heartbeat interleaved, and the resulting fpp_segments (throwaway
+DB) are compared with what 15s polling would have recorded: which sequences
+it misses and how late it sees each start.
+
+--broker embedded runs the same fixture over real MQTT through a minimal
+in-process stand-in broker (no mosquitto needed); --broker mqtt://host:1883
+uses a real one. Both report publish -> committed latency per transition.
+Needs paho-mqtt for the broker modes.
+Usage: python scripts/replay_fpp_events.py [--fixture F] [--broker embedded|URL] [--speed 10]
+"""
+import argparse, asyncio, json, os, sys, tempfile, threading, time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(prefix='glowsync-fpp-'), 'replay.db'))
+from app.db import init_db, get_session  # noqa: E402
+from app import segments, writer  # noqa: E402
+from app.ingest import fpp_events  # noqa: E402
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'fpp_events.jsonl')
+POLL_S = 15
+
+
+# ---- stand-in broker ----
+def _varint(n):
+    out = bytearray()
+    while True:
+        b, n = n % 128, n // 128
+        out.append(b | (128 if n else 0))
+        if not n:
+            return bytes(out)
+
+
+def _publish_packet(topic, payload, retain=False):
+    t = topic.encode()
+    body = len(t).to_bytes(2, 'big') + t + payload
+    return bytes([0x30 | int(retain)]) + _varint(len(body)) + body
+
+
+def _match(flt, topic):
+    f, t = flt.split('/'), topic.split('/')
+    for i, part in enumerate(f):
+        if part == '#':
+            return True
+        if i >= len(t) or (part != '+' and part != t[i]):
+            return False
+    return len(f) == len(t)
+
+
+class StandinBroker:
+    """Just enough MQTT 3.1.1 for replays: CONNECT, SUBSCRIBE, PUBLISH (QoS 0/1 in,
+    delivered at QoS 0), retained messages, PINGREQ, DISCONNECT."""
+
+    def __init__(self):
+        self.subs, self.retained = {}, {}
+        self.port = None
+        ready = threading.Event()
+        threading.Thread(target=lambda: asyncio.run(self._serve(ready)), daemon=True).start()
+        ready.wait(5)
+
+    async def _serve(self, ready):
+        srv = await asyncio.start_server(self._client, '127.0.0.1', 0)
+        self.port = srv.sockets[0].getsockname()[1]
+        ready.set()
+        async with srv:
+            await srv.serve_forever()
+
+    async def _client(self, reader, w):
+        try:
+            while True:
+                head = (await reader.readexactly(1))[0]
+                n, mult = 0, 1
+                while True:
+                    b = (await reader.readexactly(1))[0]
+                    n += (b & 127) * mult
+                    mult *= 128
+                    if not b & 128:
+                        break
+                body = await reader.readexactly(n)
+                kind = head >> 4
+                if kind == 1:  # CONNECT
+                    w.write(b'\x20\x02\x00\x00')
+                elif kind == 8:  # SUBSCRIBE
+                    i, filters = 2, []
+                    while i < len(body):
+                        ln = int.from_bytes(body[i:i + 2], 'big')
+                        filters.append(body[i + 2:i + 2 + ln].decode())
+                        i += 3 + ln
+                    self.subs.setdefault(w, []).extend(filters)
+                    w.write(bytes([0x90]) + _varint(2 + len(filters)) + body[:2] + bytes(len(filters)))
+                    for topic, payload in self.retained.items():
+                        if any(_match(f, topic) for f in filters):
+                            w.write(_publish_packet(topic, payload, retain=True))
+                elif kind == 3:  # PUBLISH
+                    ln = int.from_bytes(body[:2], 'big')
+                    topic, i = body[2:2 + ln].decode(), 2 + ln
+                    if (head >> 1) & 3:
+                        w.write(b'\x40\x02' + body[i:i + 2])  # PUBACK
+                        i += 2
+                    payload = body[i:]
+                    if head & 1:
+                        if payload:
+                            self.retained[topic] = payload
+                        else:
+                            self.retained.pop(topic, None)  # empty retained publish clears it
+                    for sub, filters in list(self.subs.items()):
+                        if any(_match(f, topic) for f in filters):
+                            sub.write(_publish_packet(topic, payload))
+                elif kind == 12:  # PINGREQ
+                    w.write(b'\xd0\x00')
+                elif kind == 14:  # DISCONNECT
+                    break
+                await w.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subs.pop(w, None)
+            w.close()
+
+
+# ---- replays ----
+def load(path):
+    with open(path) as f:
+        return [json.loads(ln) for ln in f if ln.strip()]
+
+
+def truth(events):
+    # every settled change, straight from the events: [(t, key)]
+    out = []
+    ev = fpp_events.FppListener(submit=lambda ts, d: out.append((ts, fpp_events._key(d))), timers=False)
+    base = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    for e in events:
+        ev.handle(e['topic'], e['payload'], base + timedelta(seconds=e['t']))
+    ev.emit()
+    return [((ts - base).total_seconds(), k) for ts, k in out]
+
+
+def runs(transitions):
+    # collapse to runs of distinct keys: [(start, key)]
+    out = []
+    for t, k in transitions:
+        if not out or out[-1][1] != k:
+            out.append((t, k))
+    return out
+
+
+def compare(label, true_runs, seen_runs, end):
+    seen = {}
+    for t, k in seen_runs:
+        seen.setdefault(k, []).append(t)
+    missed, late = [], []
+    for i, (t, k) in enumerate(true_runs):
+        t_end = true_runs[i + 1][0] if i + 1 < len(true_runs) else end
+        hit = [s for s in seen.get(k, []) if t - 1 <= s < t_end]
+        if hit:
+            late.append(hit[0] - t)
+        else:
+            missed.append(k[2] or k[0])
+    avg = sum(late) / len(late) if late else 0
+    print(f'[replay] {label:<10} segments={len(seen_runs):3d} missed={len(missed)} '
+          f'start error avg={avg:5.2f}s max={max(late, default=0):5.2f}s  {missed if missed else ""}')
+
+
+def db_segments(base, speed=1.0):
+    # [(seconds since base in fixture time, key)]
+    base = base.astimezone(timezone.utc).replace(tzinfo=None)
+    s = get_session()
+    rows = segments.overlapping(s, base - timedelta(days=1), base + timedelta(days=1))
+    s.close()
+    return [((r.start_ts - base).total_seconds() * speed, (r.state, r.playlist, r.media)) for r in rows]
+
+
+def direct(events):
+    base = datetime.now(timezone.utc).replace(microsecond=0)
+    ev = fpp_events.FppListener(timers=False)
+    end = events[-1]['t'] + POLL_S
+    beats = [k * POLL_S for k in range(int(end // POLL_S) + 1)]
+    items = sorted([(e['t'], 0, e) for e in events] + [(b, 1, None) for b in beats], key=lambda x: (x[0], x[1]))
+    for t, is_beat, e in items:
+        ts = base + timedelta(seconds=t)
+        if is_beat:
+            ev.emit()  # settle windows (timers off) are over by the next heartbeat
+            d = ev.snapshot()
+            if d:
+                writer.submit_fpp(ts, d)  # what record_fpp_status does while events are fresh
+        else:
+            ev.handle(e['topic'], e['payload'], ts)
+    ev.emit()
+    writer.flush()
+    return db_segments(base), end, ev.stats
+
+
+def broker(events, url, speed):
+    import paho.mqtt.client as mqtt
+    stand_in = None
+    if url == 'embedded':
+        stand_in = StandinBroker()
+        url = f'mqtt://127.0.0.1:{stand_in.port}'
+    sent, lat = [], []
+
+    def submit(ts, d):
+        fut = fpp_events._record(ts, d)
+        cause = max((p for p in sent if p <= ts.timestamp()), default=None)
+        fut.add_done_callback(lambda _f: cause and lat.append(time.time() - cause))
+        return fut
+
+    ev = fpp_events.FppListener(url, submit=submit).start()
+    for _ in range(50):
+        if ev.connected:
+            break
+        time.sleep(0.1)
+    pub = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    host, port = url.split('//')[1].rsplit(':', 1)
+    pub.connect(host, int(port))
+    pub.loop_start()
+    t0 = time.time()
+    base = datetime.fromtimestamp(t0, timezone.utc)
+    for e in events:
+        delay = t0 + e['t'] / speed - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        sent.append(time.time())
+        pub.publish(e['topic'], e['payload'], retain=e.get('retain', False)).wait_for_publish()
+    time.sleep(ev.settle_s + 0.2)
+    ev.stop()
+    pub.loop_stop()
+    writer.flush()
+    lat.sort()
+    print(f'[replay] via {url} at {speed:g}x: {ev.stats}')
+    if lat:
+        print(f'[replay] publish -> committed: p50={lat[len(lat) // 2] * 1000:.0f} ms max={lat[-1] * 1000:.0f} ms '
+              f'over {len(lat)} transitions')
+    return db_segments(base, speed)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--fixture', default=FIXTURE)
+    ap.add_argument('--broker', help="'embedded' (stand-in broker) or mqtt://host:port")
+    ap.add_argument('--speed', type=float, default=10,
+                    help='replay speed-up in broker mode (gaps must stay above FPP_EVENTS_SETTLE_MS)')
+    args = ap.parse_args()
+    init_db()
+    events = load(args.fixture)
+    true_runs = runs(truth(events))
+    end = events[-1]['t'] + POLL_S
+    print(f'[replay] {len(events)} events, {len(true_runs)} distinct runs over {events[-1]["t"]:.0f}s; db={os.environ["DB_PATH"]}')
+    polled = runs([(t, next(k for tt, k in reversed(true_runs) if tt <= t)) for t in range(0, int(end), POLL_S)])
+    compare('poll 15s', true_runs, polled, end)
+    if args.broker:
+        pushed = broker(events, args.broker, args.speed)
+    else:
+        pushed, end, stats = direct(events)
+        print(f'[replay] listener {stats}')
+    compare('push', true_runs, runs(pushed), end)
+    writer.stop()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Replay recorded video (MP4/MJPEG/AVI) or synthetic frames through the camera counting engine.
+
+No camera, clock or DB: frames go through app.ingest.engine.CountEngine (the
+same Detector + tracker + bucketing the workers run) as fast as they decode,
+timestamped on a simulated clock (--start + frame / --fps). Reports
+frames/s, ms per frame per stage (decode, prep, mog2, contours, tracking)
+and the counts per bucket; --json writes the same report for regression
+checks. Without clips, --synthetic SECONDS of the street scene from
+bench_vision_roi.py are generated in memory (decode is then the generation
+time) and the true count is printed alongside; --gap MIN,MAX spaces the cars
+out (seconds) to get the idle road that motion_gate is for.
+Camera settings come from config.yaml (--camera NAME, or the top level),
+the synthetic scene's defaults, and --set key=value overrides
+(e.g. --set crop_to_roi=true --set downscale=2).
+Usage: python scripts/replay_vision.py [clip.mp4 ...] [--camera NAME] [--synthetic 90 --gap 20,40] [--fps 10] [--bucket-minutes 1] [--json out.json]
+"""
+import argparse, json, os, sys, time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+import cv2  # noqa: E402
+import yaml  # noqa: E402
+from app.ingest.capture import open_capture  # noqa: E402
+from app.ingest.engine import CountEngine  # noqa: E402
+from bench_vision_roi import SCENE, street_frames  # noqa: E402
+
+KEYS = ('roi_polygon', 'tripline', 'min_contour_area', 'crop_to_roi', 'downscale',
+        'tracker', 'track_gate', 'track_max_age', 'motion_gate', 'idle_fps', 'motion_hold_s',
+        'capture', 'capture_options', 'capture_pipeline', 'capture_skip', 'capture_width', 'capture_threads')
+
+
+def clip_frames(paths, fps=None, cfg=None):
+    """Yields (frame, seconds into the replay, decode seconds) over the clips back to back,
+    opened with the camera's capture settings."""
+    offset = 0.0
+    for path in paths:
+        cap = open_capture(dict(cfg or {}, rtsp_url=path, substream_url=None))
+        if not cap.isOpened():
+            raise SystemExit(f'[replay] cannot open {path}')
+        rate = fps or cap.get(cv2.CAP_PROP_FPS) or 10.0
+        i = 0
+        while True:
+            t0 = time.perf_counter()
+            ok, frame = cap.read()
+            dt = time.perf_counter() - t0
+            if not ok:
+                break
+            yield frame, offset + i / rate, dt
+            i += 1
+        cap.release()
+        offset += i / rate
+
+
+def synthetic(seconds, fps, box, gap=(2.5, 6)):
+    """Like clip_frames over the synthetic street; box['truth'] tracks the true count."""
+    frames = street_frames(seconds, fps, gap=gap)
+    i = 0
+    while True:
+        t0 = time.perf_counter()
+        item = next(frames, None)
+        dt = time.perf_counter() - t0
+        if item is None:
+            return
+        frame, box['truth'] = item
+        yield frame, i / fps, dt
+        i += 1
+
+
+def replay(frames, cfg, start, bucket_minutes=1):
+    """Run the engine over (frame, offset_s, decode_s); returns the report dict."""
+    buckets = {}
+    engine = CountEngine(cfg, bucket_minutes, emit=lambda b, n: buckets.__setitem__(b.isoformat(), n))
+    decode = 0.0
+    t0 = time.perf_counter()
+    for frame, offset, dt in frames:
+        decode += dt
+        engine.process(frame, start + timedelta(seconds=offset))
+    engine.flush()
+    wall = time.perf_counter() - t0
+    n = max(1, engine.ticks)
+    stages = dict(decode=decode, **engine.stage_s)
+    return {'frames': engine.ticks, 'processed': engine.frames, 'skipped': engine.skipped, 'duty': round(engine.duty, 3),
+            'seconds': round(wall, 3), 'fps': round(engine.ticks / wall, 1) if wall else 0.0,
+            'ms_per_frame': {k: round(v * 1000 / n, 3) for k, v in stages.items()},
+            'count': engine.counts, 'buckets': buckets}
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('clips', nargs='*', help='recorded clips, replayed back to back')
+    ap.add_argument('--camera', help='config.yaml camera to take roi/tripline/etc. from (default: top level)')
+    ap.add_argument('--synthetic', type=float, default=90, help='seconds of synthetic street when no clips are given')
+    ap.add_argument('--gap', default='2.5,6', help='synthetic: seconds between cars, MIN,MAX')
+    ap.add_argument('--fps', type=float, help='clip frame rate for the simulated clock (default: from the file; synthetic 10)')
+    ap.add_argument('--start', default='2025-12-06T00:00:00+00:00', help='simulated clock at the first frame (ISO)')
+    ap.add_argument('--bucket-minutes', type=int, default=1)
+    ap.add_argument('--set', action='append', default=[], metavar='KEY=VALUE', help='camera setting override (YAML value)')
+    ap.add_argument('--json', help='also write the report here')
+    args = ap.parse_args()
+
+    box = {}
+    if args.clips:
+        os.chdir(ROOT)
+        from app.config import load_config
+        vision = load_config()['vision']
+        cam = next((c for c in vision.get('cameras') or [] if c.get('name') == args.camera), None) if args.camera else vision
+        if cam is None:
+            raise SystemExit(f'[replay] no camera {args.camera!r} in config.yaml')
+        cfg = {k: cam[k] for k in KEYS if cam.get(k) is not None}
+        frames = clip_frames(args.clips, args.fps, cfg)
+    else:
+        cfg = dict(SCENE)
+        frames = synthetic(args.synthetic, args.fps or 10.0, box, tuple(float(x) for x in args.gap.split(',')))
+    for kv in args.set:
+        k, _, v = kv.partition('=')
+        cfg[k] = yaml.safe_load(v)
+    if not cfg.get('tripline'):
+        raise SystemExit('[replay] the camera needs a tripline')
+
+    report = replay(frames, cfg, datetime.fromisoformat(args.start).astimezone(timezone.utc), args.bucket_minutes)
+    report['source'] = args.clips or f'synthetic {args.synthetic:g}s'
+    report['settings'] = cfg
+    if 'truth' in box:
+        report['truth'] = box['truth']
+    ms = report['ms_per_frame']
+    print(f"[replay] {report['frames']} frames in {report['seconds']}s = {report['fps']} fps")
+    if cfg.get('motion_gate'):
+        print(f"[replay] motion gate: processed={report['processed']} skipped={report['skipped']} active={report['duty'] * 100:.0f}%")
+    print('[replay] ms/frame ' + '  '.join(f'{k}={v:.2f}' for k, v in ms.items()) + f'  total={sum(ms.values()):.2f}')
+    for b, n in report['buckets'].items():
+        print(f'[replay] {b} {n}')
+    print(f"[replay] count={report['count']}" + (f" truth={report['truth']}" if 'truth' in report else ''))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
-import os, io, csv, sqlite3, datetime as dt, pathlib, requests, sys
+import os, pathlib, sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
 
 envp = pathlib.Path.home()/ "glowsync" / ".env"
 url = os.getenv('BALDRICK_CSV_URL','').strip()
@@ -15,51 +17,13 @@ if envp.exists():
 if not url:
     print("[baldrick] skipped: no url configured"); sys.exit(0)
 
-db = pathlib.Path.home()/ "glowsync" / "data" / "tracker.db"
-con = sqlite3.connect(db)
-cur = con.cursor()
-
-# ensure table exists (idempotent)
-cur.executescript("""
-CREATE TABLE IF NOT EXISTS AutoCount (
-  id INTEGER PRIMARY KEY AUTOINCREMENT,
-  count_type   TEXT NOT NULL,
-  source       TEXT NOT NULL,
-  timestamp    TEXT NOT NULL,
-  count_value  INTEGER NOT NULL,
-  camera_name  TEXT,
-  season       TEXT
-);
-CREATE INDEX IF NOT EXISTS idx_autocount_ts ON AutoCount(timestamp);
-CREATE INDEX IF NOT EXISTS idx_autocount_src ON AutoCount(source, count_type);
-""")
-con.commit()
-
-r = requests.get(url, timeout=10, verify=verify)
-r.raise_for_status()
-rows = list(csv.reader(io.StringIO(r.text)))
-
-def is_int(s):
-    try: int(s); return True
-    except: return False
-start = 1 if rows and not (is_int(rows[0][0]) and is_int(rows[0][1])) else 0
-
-cur.execute("SELECT timestamp FROM AutoCount WHERE source='baldrick' ORDER BY timestamp DESC LIMIT 1")
-row = cur.fetchone(); last_iso = row[0] if row else None
+# same auto_counts table, ingest state and rollups as the scheduler job (app.storage)
+from app.db import init_db, DB_PATH
+from app.ingest.baldrick import run_once
 
-inserted = 0
-for rec in rows[start:]:
-    if len(rec) < 2: continue
-    try:
-        epoch = int(rec[0].strip()); count = int(rec[1].strip())
-    except: 
-        continue
-    ts_iso = dt.datetime.utcfromtimestamp(epoch).replace(tzinfo=dt.timezone.utc).isoformat()
-    if last_iso and ts_iso <= last_iso:
-        continue
-    cur.execute("""INSERT INTO AutoCount(count_type, source, timestamp, count_value, camera_name, season)
-                   VALUES(?,?,?,?,?,?)""",
-                ('device_seen', 'baldrick', ts_iso, count, None, None))
-    inserted += 1
-con.commit(); con.close()
-print(f"[baldrick] imported {inserted} new rows; latest={ts_iso if inserted else last_iso}")
+init_db()
+res = run_once(url, verify=verify)
+if res.get('unchanged'):
+    print(f"[baldrick] not modified; db={DB_PATH}")
+else:
+    print(f"[baldrick] scanned {res['scanned']} new lines, {res['upserts']} new/changed buckets; db={DB_PATH}")
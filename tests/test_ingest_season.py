@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+from datetime import datetime
+
+os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='glowsync-test-'), 'test.db')
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import seasons  # noqa: E402
+from app.db import init_db, get_session, AutoCount, Season  # noqa: E402
+from app.main import app  # noqa: E402
+
+init_db()
+s = get_session()
+s.add(Season(name='Halloween 2025', start_date=datetime(2025, 10, 1), end_date=datetime(2025, 11, 2),
+             show_start='17:00', show_end='23:00', bucket_minutes=1))
+s.commit()
+s.close()
+seasons.invalidate()
+
+
+def _season_of(source):
+    s = get_session()
+    try:
+        return [r.season for r in s.query(AutoCount).filter(AutoCount.source == source)]
+    finally:
+        s.close()
+
+
+def test_single_ingest_is_labelled_with_its_season():
+    with TestClient(app) as client:
+        r = client.post('/ingest/autocount', json={'timestamp': '2025-10-31T23:30:00Z', 'source': 'edge-single',
+                                                   'count_type': 'vehicle', 'count_value': 3})
+    assert r.status_code == 200 and r.json()['ok']
+    assert _season_of('edge-single') == ['Halloween 2025']
+
+
+def test_batch_ingest_is_labelled_per_record():
+    body = '\n'.join(json.dumps({'timestamp': ts, 'source': 'edge-batch', 'count_type': 'vehicle', 'count_value': 1})
+                     for ts in ('2025-10-31T23:30:00Z', '2025-12-15T23:30:00Z'))
+    with TestClient(app) as client:
+        r = client.post('/ingest/autocount/batch', content=body,
+                        headers={'Content-Type': 'application/x-ndjson'})
+    assert r.json()['inserted'] == 2
+    assert sorted(_season_of('edge-batch'), key=str) == ['Halloween 2025', None]